@@ -0,0 +1,65 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+POSITIVE = [
+    "Everyone here is so sweet! {name} did an amazing job on my {service} and the salon was spotless.",
+    "Best {service} I've had in years. Friendly staff, fair prices, and they got me in without an appointment.",
+    "I come here every two weeks for a {service}. Always consistent, always clean, always welcoming.",
+]
+NEGATIVE = [
+    "Horrible service. {name} was rude and rushed my {service}. I waited 45 minutes past my appointment.",
+    "My {service} started lifting after two days and they refused to fix it. Overpriced for what you get.",
+    "The tools did not look sanitized and I got a cut during my {service}. I want a refund.",
+]
+SHORT = ["Love it!", "Great job", "Amazing!!", "So cute 💅", "Best salon"]
+SERVICES = ["pedicure", "gel manicure", "acrylic full set", "dip powder", "nail art"]
+NAMES = ["Anna", "Kim", "Zoie", "Tina", "Lily", "Mai"]
+AUTHORS = ["Cricket Davis", "Jordan Lee", "Sam Patel", "Alex Kim", "Taylor Nguyen", "Morgan Smith"]
+
+
+def make_salons(count: int, seed: int = 1) -> list[dict]:
+    rng = random.Random(seed)
+    return [{
+        "cid": str(10**18 + rng.randrange(10**17)),
+        "title": f"Bench Nails #{i + 1}",
+        "address": f"{100 + i} Main St",
+        "rating": {"value": round(rng.uniform(3.5, 5.0), 1)}
+    } for i in range(count)]
+
+
+def make_reviews(count: int, seed: int = 1, star_only: float = 0.2, short: float = 0.2,
+                 answered: float = 0.3) -> list[dict]:
+    """
+    Synthetic DataForSEO review items, newest first. Mix of star-only ratings,
+    short 5-star reviews and longer positive/negative reviews.
+    """
+    rng = random.Random(seed)
+    now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    items = []
+    for i in range(count):
+        kind = rng.random()
+        if kind < star_only:
+            rating, text = rng.choice([1, 3, 4, 5, 5, 5]), ""
+        elif kind < star_only + short:
+            rating, text = 5, rng.choice(SHORT)
+        elif rng.random() < 0.75:
+            rating = rng.choice([4, 5, 5])
+            text = rng.choice(POSITIVE).format(name=rng.choice(NAMES), service=rng.choice(SERVICES))
+        else:
+            rating = rng.choice([1, 2])
+            text = rng.choice(NEGATIVE).format(name=rng.choice(NAMES), service=rng.choice(SERVICES))
+
+        timestamp = now - timedelta(hours=i * 7 + rng.randrange(6))
+        items.append({
+            "type": "google_reviews_search",
+            "review_id": f"bench-{seed}-{i:06d}",
+            "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S +00:00"),
+            "rating": {"value": rating, "rating_max": 5},
+            "review_text": text,
+            "profile_name": rng.choice(AUTHORS),
+            "reviews_count": rng.randrange(1, 200),
+            "review_url": f"https://example.invalid/review/{seed}/{i}",
+            "profile_image_url": "",
+            "owner_answer": "Thank you!" if rng.random() < answered else None
+        })
+    return items
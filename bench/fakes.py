@@ -0,0 +1,452 @@
+"""
+Offline stand-ins for DataForSEO, Gemini and Supabase/PostgREST.
+
+They plug in where the real clients would (DataForSEOClient(transport=...),
+IntelligenceRouter(client=...), get_store().client = ...) so the production code paths
+run unchanged, with simulated latency, task queueing and rate limiting.
+"""
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import threading
+from datetime import datetime, timezone
+
+
+def _sleep_ms(rng, mean_ms: float, jitter: float = 0.5):
+    if mean_ms > 0:
+        time.sleep(max(0.0, rng.gauss(mean_ms, mean_ms * jitter)) / 1000)
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# --- DataForSEO ---
+
+class FakeResponse:
+    def __init__(self, payload: dict, status_code: int = 200):
+        self._payload = payload
+        self.status_code = status_code
+        self.text = json.dumps(payload)
+        self.headers = {}
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeDataForSEO:
+    """
+    Transport for DataForSEOClient that emulates task_post / tasks_ready /
+    task_get and the Maps live search. Each posted task becomes ready after a
+    random queueing delay; every HTTP call costs `http_ms` of latency.
+    """
+
+    def __init__(self, salons: list[dict], reviews_by_cid: dict, http_ms: float = 80,
+                 task_delay: tuple = (1.0, 4.0), seed: int = 1):
+        self.salons = salons
+        self.reviews_by_cid = reviews_by_cid
+        self.http_ms = http_ms
+        self.task_delay = task_delay
+        self.rng = random.Random(seed)
+        self.tasks = {}
+        self.requests = 0
+        self.tasks_posted = 0
+        self.reviews_returned = 0
+        self._lock = threading.Lock()
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method: str, url: str, data=None, **kwargs):
+        with self._lock:
+            self.requests += 1
+        _sleep_ms(self.rng, self.http_ms)
+        if url.endswith("/task_post"):
+            return self._task_post(json.loads(data))
+        if url.endswith("/tasks_ready"):
+            return self._tasks_ready()
+        if "/task_get/" in url:
+            return self._task_get(url.rsplit("/", 1)[-1])
+        if "/maps/live/" in url:
+            return FakeResponse({"status_code": 20000, "tasks": [{
+                "status_code": 20000, "result": [{"items": self.salons}]
+            }]})
+        return FakeResponse({"status_code": 40400, "status_message": "Not Found"}, 404)
+
+    def close(self):
+        pass
+
+    def _task_post(self, payload: list):
+        tasks = []
+        now = time.monotonic()
+        with self._lock:
+            for task in payload:
+                task_id = str(uuid.uuid4())
+                self.tasks[task_id] = {"data": task, "ready_at": now + self.rng.uniform(*self.task_delay), "collected": False}
+                self.tasks_posted += 1
+                tasks.append({"id": task_id, "status_code": 20100, "data": task})
+        return FakeResponse({"status_code": 20000, "tasks": tasks})
+
+    def _tasks_ready(self):
+        now = time.monotonic()
+        with self._lock:
+            ready = [{"id": task_id} for task_id, task in self.tasks.items()
+                     if not task["collected"] and task["ready_at"] <= now]
+        return FakeResponse({"status_code": 20000, "tasks": [{"status_code": 20000, "result": ready}]})
+
+    def _task_get(self, task_id: str):
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return FakeResponse({"status_code": 20000, "tasks": [{"status_code": 40400}]})
+            if task["ready_at"] > time.monotonic():
+                return FakeResponse({"status_code": 20000, "tasks": [{"status_code": 10200}]})
+            task["collected"] = True
+
+        data = task["data"]
+        items = self.reviews_by_cid.get(data["cid"], [])[:data.get("depth", 100)]
+        with self._lock:
+            self.reviews_returned += len(items)
+        title = next((s["title"] for s in self.salons if s["cid"] == data["cid"]), None)
+        return FakeResponse({"status_code": 20000, "tasks": [{
+            "status_code": 20000, "data": data, "result": [{"title": title, "items": items}]
+        }]})
+
+
+# --- Gemini ---
+
+class FakeRateLimitError(Exception):
+    code = 429
+
+
+class _Usage:
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class _FakeGenaiResponse:
+    def __init__(self, text: str, prompt: str):
+        self.text = text
+        self.usage_metadata = _Usage(len(prompt) // 4, len(text) // 4)
+
+
+class _FakeModels:
+    def __init__(self, fake):
+        self._fake = fake
+
+    def generate_content(self, model, contents, config=None):
+        delay = self._fake._before_call()
+        time.sleep(delay)
+        return self._fake._respond(contents, config)
+
+
+class _FakeAsyncModels:
+    def __init__(self, fake):
+        self._fake = fake
+
+    async def generate_content(self, model, contents, config=None):
+        delay = self._fake._before_call()
+        await asyncio.sleep(delay)
+        return self._fake._respond(contents, config)
+
+
+class _FakeAio:
+    def __init__(self, fake):
+        self.models = _FakeAsyncModels(fake)
+
+
+class FakeGemini:
+    """
+    Stand-in for genai.Client. Answers every router prompt shape (scout,
+    translate, consult, draft, fused and the batch variants) with plausible
+    output after `latency_ms`, and raises a 429 with probability `rate_limit_prob`.
+    """
+
+    def __init__(self, latency_ms: float = 600, rate_limit_prob: float = 0.0, seed: int = 1):
+        self.latency_ms = latency_ms
+        self.rate_limit_prob = rate_limit_prob
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+        self.models = _FakeModels(self)
+        self.aio = _FakeAio(self)
+
+    def _before_call(self) -> float:
+        with self._lock:
+            self.calls += 1
+            if self.rng.random() < self.rate_limit_prob:
+                self.rate_limited += 1
+                raise FakeRateLimitError("429 RESOURCE_EXHAUSTED (simulated)")
+            return max(0.0, self.rng.gauss(self.latency_ms, self.latency_ms * 0.3)) / 1000
+
+    def _respond(self, prompt: str, config: dict = None) -> _FakeGenaiResponse:
+        config = config or {}
+        schema = config.get('response_schema') or {}
+        if schema.get('type') == 'ARRAY':
+            entries = self._embedded_reviews(prompt)
+            fields = schema['items']['properties']
+            if 'sentiment_score' in fields:
+                output = [dict(id=e['id'], **self._scout(e.get('rating'), e.get('text'))) for e in entries]
+            else:
+                output = [{"id": e['id'], "vietnamese_summary": "Khách hài lòng với dịch vụ."} for e in entries]
+            text = json.dumps(output, ensure_ascii=False)
+        elif 'draft_response' in schema.get('properties', {}):
+            text = json.dumps(dict(
+                self._scout(self._rating(prompt), self._review_text(prompt)),
+                vietnamese_summary="Khách hài lòng với dịch vụ.",
+                consult=None,
+                draft_response="Thanks so much for the love! Can't wait to see you again at @BenchNails."
+            ), ensure_ascii=False)
+        elif config.get('response_mime_type') == 'application/json':
+            if 'crisis consultant' in prompt:
+                text = json.dumps({"root_cause": "Rushed service quality", "recommended_action": "Retrain staff on timing"})
+            else:
+                text = json.dumps(self._scout(self._rating(prompt), self._review_text(prompt)))
+        elif 'Vietnamese' in prompt:
+            text = "Khách khen nhân viên nhiệt tình, móng đẹp."
+        else:
+            text = "Thank you for visiting! We're so glad you enjoyed your service. Stay shining! ✨"
+        return _FakeGenaiResponse(text, prompt)
+
+    def _scout(self, rating, text) -> dict:
+        rating = int(rating or 3)
+        risky = bool(text) and ('refund' in text.lower() or 'sanitized' in text.lower())
+        return {"sentiment_score": rating * 2, "risk_flag": risky, "category": "Service Quality"}
+
+    def _rating(self, prompt: str):
+        match = re.search(r"Rating: (\d)", prompt)
+        return int(match.group(1)) if match else 3
+
+    def _review_text(self, prompt: str) -> str:
+        match = re.search(r'(?:Text|Review): "(.*?)"', prompt, re.S)
+        return match.group(1) if match else ""
+
+    def _embedded_reviews(self, prompt: str) -> list[dict]:
+        start = prompt.find('[', prompt.find('Reviews (JSON'))
+        try:
+            entries, _ = json.JSONDecoder().raw_decode(prompt[start:])
+            return entries
+        except ValueError:
+            return []
+
+
+# --- Supabase / PostgREST ---
+
+class _Result:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+# Primary keys of the tables the agent writes to
+PRIMARY_KEYS = {"reviews": "review_id", "review_payloads": "review_id", "ingestion_state": "cid", "salons": "cid"}
+
+_TERM = re.compile(r'(\w+)\.(eq|neq|gt|gte|lt|lte)\."?([^",)]*)"?')
+
+
+class _Query:
+    def __init__(self, db, table: str):
+        self.db = db
+        self.table = table
+        self.action = "select"
+        self.payload = None
+        self.on_conflict = None
+        self.columns = "*"
+        self.count = None
+        self.filters = []
+        self.orders = []
+        self.limit_n = None
+
+    # Actions
+    def select(self, columns: str = "*", count: str = None):
+        self.action, self.columns, self.count = "select", columns, count
+        return self
+
+    def insert(self, rows):
+        self.action, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict: str = None, **kwargs):
+        self.action, self.payload, self.on_conflict = "upsert", rows, on_conflict
+        return self
+
+    def update(self, payload: dict):
+        self.action, self.payload = "update", payload
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    # Filters
+    def eq(self, column, value):
+        self.filters.append(lambda r: _cmp(r.get(column), "eq", value))
+        return self
+
+    def neq(self, column, value):
+        self.filters.append(lambda r: _cmp(r.get(column), "neq", value))
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda r: _cmp(r.get(column), "gte", value))
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda r: _cmp(r.get(column), "lt", value))
+        return self
+
+    def in_(self, column, values):
+        allowed = set(values)
+        self.filters.append(lambda r: r.get(column) in allowed)
+        return self
+
+    def or_(self, expression: str):
+        """Supports the `a.op.v,and(b.op.v,c.op.v)` shapes the agent uses."""
+        groups = []
+        for part in re.findall(r'and\([^)]*\)|[^,]+', expression):
+            terms = _TERM.findall(part)
+            if terms:
+                groups.append(terms)
+        self.filters.append(lambda r: any(all(_cmp(r.get(c), op, v) for c, op, v in g) for g in groups))
+        return self
+
+    def order(self, column, desc: bool = False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, n: int):
+        self.limit_n = n
+        return self
+
+    def execute(self):
+        return self.db._execute(self)
+
+
+def _cmp(left, op, right):
+    if right == "null":
+        right = None
+    if op == "eq":
+        return left == right
+    if op == "neq":
+        return left != right
+    if left is None or right is None:
+        return False
+    left, right = str(left), str(right)
+    return {"gt": left > right, "gte": left >= right, "lt": left < right, "lte": left <= right}[op]
+
+
+class _Rpc:
+    def __init__(self, db, name, params):
+        self.db, self.name, self.params = db, name, params
+
+    def execute(self):
+        self.db._simulate(len(self.params.get("p_rows") or []))
+        if self.name == "update_reviews":
+            return _Result(self.db._update_reviews(self.params["p_rows"]))
+        return _Result([])
+
+
+class FakePostgrest:
+    """
+    In-memory PostgREST stand-in for SupabaseClient.client. Supports the query
+    builder calls the agent makes, with `request_ms` latency per request plus
+    `row_us` per row sent or returned.
+    """
+
+    def __init__(self, request_ms: float = 40, row_us: float = 50, seed: int = 1):
+        self.request_ms = request_ms
+        self.row_us = row_us
+        self.rng = random.Random(seed)
+        self.tables = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def rpc(self, name: str, params: dict) -> _Rpc:
+        return _Rpc(self, name, params)
+
+    def seed(self, table: str, rows: list[dict]):
+        key = PRIMARY_KEYS.get(table, "id")
+        store = self.tables.setdefault(table, {})
+        for row in rows:
+            store[row[key]] = self._stamp(dict(row))
+
+    def _stamp(self, row: dict) -> dict:
+        for column, value in row.items():
+            if value == "now()":
+                row[column] = _now_iso()
+        return row
+
+    def _simulate(self, rows: int):
+        with self._lock:
+            self.requests += 1
+        _sleep_ms(self.rng, self.request_ms, jitter=0.2)
+        time.sleep(rows * self.row_us / 1e6)
+
+    def _execute(self, q: _Query) -> _Result:
+        key = PRIMARY_KEYS.get(q.table, "id")
+        with self._lock:
+            store = self.tables.setdefault(q.table, {})
+
+            if q.action in ("insert", "upsert"):
+                rows = q.payload if isinstance(q.payload, list) else [q.payload]
+                for row in rows:
+                    pk = row[q.on_conflict or key]
+                    if q.action == "insert" and pk in store:
+                        raise RuntimeError(f"duplicate key value violates unique constraint ({pk})")
+                    merged = dict(store.get(pk, {}))
+                    merged.update(self._stamp(dict(row)))
+                    store[pk] = merged
+                result, touched = _Result(rows), len(rows)
+            else:
+                matched = [r for r in store.values() if all(f(r) for f in q.filters)]
+                if q.action == "update":
+                    for row in matched:
+                        row.update(self._stamp(dict(q.payload)))
+                    result, touched = _Result(matched), len(matched)
+                elif q.action == "delete":
+                    for row in matched:
+                        store.pop(row[key], None)
+                    result, touched = _Result(matched), len(matched)
+                else:
+                    total = len(matched)
+                    for column, desc in reversed(q.orders):
+                        matched.sort(key=lambda r: (r.get(column) is None, str(r.get(column))), reverse=desc)
+                    if q.limit_n is not None:
+                        matched = matched[:q.limit_n]
+                    if q.columns != "*":
+                        wanted = [c.strip() for c in q.columns.split(",")]
+                        matched = [{c: r.get(c) for c in wanted} for r in matched]
+                    else:
+                        matched = [dict(r) for r in matched]
+                    result, touched = _Result(matched, total if q.count else None), len(matched)
+
+        self._simulate(touched)
+        return result
+
+    def _update_reviews(self, rows: list[dict]) -> list[dict]:
+        """The update_reviews RPC: updates existing reviews, skips unknown review_ids."""
+        with self._lock:
+            store = self.tables.setdefault("reviews", {})
+            updated = []
+            for row in rows:
+                existing = store.get(row["review_id"])
+                if existing is not None:
+                    existing.update(self._stamp(dict(row, updated_at="now()")))
+                    updated.append({"review_id": row["review_id"]})
+            return updated
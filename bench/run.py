@@ -0,0 +1,244 @@
+"""
+Offline benchmark for the ingestion and reprocessing paths.
+
+Runs the real agent code against the fakes in bench/fakes.py (no network, no
+credentials, no quota) and reports throughput, per-operation latency
+percentiles, token usage and peak memory.
+
+    python -m bench.run ingest --salons 20 --reviews 200
+    python -m bench.run reprocess --reviews 2000 --workers 4
+    python -m bench.run router --reviews 500 --gemini-ms 300 --rate-limit 0.05
+    python -m bench.run ingest --store sqlite
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Must be in place before config.settings is imported
+os.environ.setdefault("SUPABASE_URL", "https://bench.invalid")
+os.environ.setdefault("SUPABASE_KEY", "bench.bench.bench")
+os.environ.setdefault("DATAFORSEO_LOGIN", "bench")
+os.environ.setdefault("DATAFORSEO_PASSWORD", "bench")
+os.environ.setdefault("GEMINI_RPM", "100000")
+os.environ.setdefault("GEMINI_TPM", "1000000000")
+os.environ.setdefault("LLM_CACHE_ENABLED", "False")
+os.environ.setdefault("DATAFORSEO_ARCHIVE_ENABLED", "False")
+os.environ.setdefault("METRICS_EXPORT_INTERVAL", "0")
+
+from bench.corpus import make_salons, make_reviews
+from bench.fakes import FakeDataForSEO, FakeGemini, FakePostgrest
+from config import settings
+from src.db.store import get_store
+from src.ingestion import dataforseo
+from src.ingestion.dataforseo import DataForSEOClient
+from src.db.payloads import PAYLOAD_TABLE, payload_row
+from src.processing.router import IntelligenceRouter, STAGE_KEYS
+from src.metrics import metrics
+
+
+def build_corpus(args):
+    salons = make_salons(args.salons, seed=args.seed)
+    reviews_by_cid = {
+        salon["cid"]: make_reviews(args.reviews, seed=args.seed + i)
+        for i, salon in enumerate(salons)
+    }
+    return salons, reviews_by_cid
+
+
+def review_record(cid, salon_name, review):
+    """Same shape main.py writes, minus the analysis."""
+    return {
+        "review_id": review["review_id"],
+        "cid": cid,
+        "salon_name": salon_name,
+        "author_name": review.get("profile_name", "Anonymous"),
+        "rating": review["rating"]["value"],
+        "original_text": review.get("review_text", ""),
+        "owner_response": review.get("owner_answer", ""),
+        "review_url": review.get("review_url", ""),
+        "review_date": review.get("timestamp"),
+        "profile_image_url": "",
+        "author_review_count": review.get("reviews_count", 0),
+        "status": "ANALYZED",
+        "created_at": review.get("timestamp")
+    }
+
+
+def previous_analysis(review):
+    """A stored analysis like an earlier full run would have saved, for partial re-runs to reuse."""
+    rating = review["rating"]["value"]
+    risky = rating <= 2
+    consult = {"root_cause": "Rushed service quality", "recommended_action": "Retrain staff on timing"}
+    return {
+        "scout": {"sentiment_score": rating * 2, "risk_flag": risky, "category": "Service Quality"},
+        "vietnamese_summary": "Khách hài lòng với dịch vụ.",
+        "consult": consult if risky else {},
+        "draft_response": None if review.get("owner_answer") else "Thank you for visiting! See you again soon.",
+        "processed_at": "now()"
+    }
+
+
+def scenario_ingest(args, salons, reviews_by_cid, gemini):
+    from src.main import SimpleIngestionAgent
+
+    transport = FakeDataForSEO(salons, reviews_by_cid, http_ms=args.http_ms,
+                               task_delay=(args.task_delay / 2, args.task_delay), seed=args.seed)
+    agent = SimpleIngestionAgent(dfs_client=DataForSEOClient(transport=transport),
+                                 router=IntelligenceRouter(client=gemini))
+    agent.ingest_targets([(s["cid"], s["title"]) for s in salons])
+    return get_store().count_reviews(), {
+        "dataforseo_requests": transport.requests,
+        "dataforseo_tasks": transport.tasks_posted
+    }
+
+
+def scenario_reprocess(args, salons, reviews_by_cid, gemini):
+    sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+    from reprocess_db import reprocess_reviews
+
+    for salon in salons:
+        reviews = reviews_by_cid[salon["cid"]]
+        seed_rows("reviews", [review_record(salon["cid"], salon["title"], r) for r in reviews])
+        if args.stages:
+            # Partial re-runs reuse the other stages from these
+            seed_rows(PAYLOAD_TABLE, [payload_row(r["review_id"], analysis_json=previous_analysis(r)) for r in reviews])
+    with tempfile.TemporaryDirectory() as tmp:
+        result = reprocess_reviews(page_size=args.page_size, workers=args.workers, stages=args.stages,
+                          checkpoint_path=os.path.join(tmp, "checkpoint.json"),
+                          router=IntelligenceRouter(client=gemini))
+    return result["saved"], {"failed": result["failed"], "write_failed": result["write_failed"]}
+
+
+def seed_rows(table, rows):
+    """Puts rows in the store directly, without the fake's request latency."""
+    store = get_store()
+    if isinstance(getattr(store, "client", None), FakePostgrest):
+        store.client.seed(table, rows)
+    else:
+        store.upsert_rows(table, rows)
+
+
+def scenario_router(args, salons, reviews_by_cid, gemini):
+    router = IntelligenceRouter(client=gemini)
+    records = [review_record(s["cid"], s["title"], r) for s in salons for r in reviews_by_cid[s["cid"]]]
+    analyses = router.process_reviews(records, [])
+    return sum(1 for a in analyses if a), {"failed": sum(1 for a in analyses if not a)}
+
+
+SCENARIOS = {
+    "ingest": scenario_ingest,
+    "reprocess": scenario_reprocess,
+    "router": scenario_router
+}
+
+
+def report(args, processed, elapsed, extra, gemini, peak_traced):
+    snapshot = metrics.snapshot()
+    ops = {
+        name: {"calls": op["calls"], "errors": op["errors"],
+               "p50_ms": round(op["p50_seconds"] * 1000, 1), "p99_ms": round(op["p99_seconds"] * 1000, 1)}
+        for name, op in sorted(snapshot["ops"].items())
+    }
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+    return {
+        "scenario": args.scenario,
+        "salons": args.salons,
+        "reviews_per_salon": args.reviews,
+        "processed": processed,
+        "elapsed_seconds": round(elapsed, 2),
+        "reviews_per_second": round(processed / elapsed, 2) if elapsed else 0.0,
+        "gemini_calls": gemini.calls,
+        "gemini_rate_limited": gemini.rate_limited,
+        "store": args.store,
+        "postgrest_requests": get_store().client.requests if args.store == "supabase" else None,
+        "tokens": snapshot["tokens"],
+        "peak_rss_mb": round(rss_mb, 1),
+        "peak_traced_mb": round(peak_traced / (1024 * 1024), 1) if peak_traced else None,
+        "operations": ops,
+        **extra
+    }
+
+
+def print_report(result):
+    print(f"\n--- Benchmark: {result['scenario']} ---")
+    print(f"Processed {result['processed']} reviews in {result['elapsed_seconds']}s "
+          f"({result['reviews_per_second']} reviews/s)")
+    print(f"Gemini calls: {result['gemini_calls']} ({result['gemini_rate_limited']} rate limited), "
+          + (f"PostgREST requests: {result['postgrest_requests']}" if result['store'] == "supabase"
+             else f"store: {result['store']}"))
+    print(f"Peak RSS: {result['peak_rss_mb']} MB" +
+          (f", peak traced: {result['peak_traced_mb']} MB" if result['peak_traced_mb'] is not None else ""))
+    for stage, usage in result["tokens"].items():
+        print(f"Tokens {stage}: {usage}")
+    print(f"{'operation':<40} {'calls':>7} {'errors':>7} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, op in result["operations"].items():
+        print(f"{name:<40} {op['calls']:>7} {op['errors']:>7} {op['p50_ms']:>9} {op['p99_ms']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark with fake DataForSEO, Gemini and Supabase.")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--salons", type=int, default=5)
+    parser.add_argument("--reviews", type=int, default=100, help="Reviews per salon")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--gemini-ms", type=float, default=600, help="Mean Gemini latency")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Probability a Gemini call gets a 429")
+    parser.add_argument("--http-ms", type=float, default=80, help="Mean DataForSEO HTTP latency")
+    parser.add_argument("--task-delay", type=float, default=3.0, help="Max DataForSEO task queueing delay (s)")
+    parser.add_argument("--store", choices=["supabase", "sqlite"], default="supabase",
+                        help="Fake PostgREST behind the Supabase client, or a throwaway SQLite file")
+    parser.add_argument("--db-ms", type=float, default=40, help="Mean PostgREST request latency")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--stages", help=f"Comma-separated stages for the reprocess scenario ({', '.join(STAGE_KEYS)})")
+    parser.add_argument("--trace-memory", action="store_true", help="Track Python allocations (slower)")
+    parser.add_argument("--json", help="Also write the report to this path")
+    args = parser.parse_args()
+    if args.stages:
+        args.stages = {stage.strip() for stage in args.stages.split(",") if stage.strip()}
+        unknown = args.stages - set(STAGE_KEYS)
+        if unknown:
+            parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    # Fake tasks are ready within seconds; don't wait the production poll interval
+    dataforseo.POLL_INTERVAL = min(dataforseo.POLL_INTERVAL, 0.25)
+    dataforseo.MAX_POLL_INTERVAL = min(dataforseo.MAX_POLL_INTERVAL, 1)
+    settings.DATAFORSEO_TASKS_READY_PER_MINUTE = 0
+    settings.STORAGE_BACKEND = args.store
+    if args.store == "sqlite":
+        settings.SQLITE_PATH = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+    else:
+        get_store().client = FakePostgrest(request_ms=args.db_ms, seed=args.seed)
+    gemini = FakeGemini(latency_ms=args.gemini_ms, rate_limit_prob=args.rate_limit, seed=args.seed)
+    salons, reviews_by_cid = build_corpus(args)
+    metrics.reset()
+
+    if args.trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    processed, extra = SCENARIOS[args.scenario](args, salons, reviews_by_cid, gemini)
+    elapsed = time.perf_counter() - start
+    peak_traced = None
+    if args.trace_memory:
+        peak_traced = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    result = report(args, processed, elapsed, extra, gemini, peak_traced)
+    print_report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,15 +7,85 @@ load_dotenv()
 DATAFORSEO_LOGIN = os.getenv("DATAFORSEO_LOGIN")
 DATAFORSEO_PASSWORD = os.getenv("DATAFORSEO_PASSWORD")
 DATAFORSEO_USE_SANDBOX = os.getenv("DATAFORSEO_USE_SANDBOX", "False").lower() == "true"
+DATAFORSEO_TIMEOUT = float(os.getenv("DATAFORSEO_TIMEOUT", "30"))  # seconds per request
+DATAFORSEO_MAX_RETRIES = int(os.getenv("DATAFORSEO_MAX_RETRIES", "3"))
+DATAFORSEO_ARCHIVE_ENABLED = os.getenv("DATAFORSEO_ARCHIVE_ENABLED", "True").lower() == "true"
+DATAFORSEO_ARCHIVE_DIR = os.getenv("DATAFORSEO_ARCHIVE_DIR")  # defaults to .cache/dataforseo_archive
+DATAFORSEO_ARCHIVE_COMPRESSION = os.getenv("DATAFORSEO_ARCHIVE_COMPRESSION", "gzip")  # gzip or zstd
+DATAFORSEO_REPLAY = os.getenv("DATAFORSEO_REPLAY", "False").lower() == "true"
+# Postback mode: DataForSEO reports finished tasks to a local receiver instead of being polled.
+# POSTBACK_PUBLIC_URL is how DataForSEO reaches the receiver (e.g. through a tunnel or proxy).
+POSTBACK_ENABLED = os.getenv("POSTBACK_ENABLED", "False").lower() == "true"
+POSTBACK_MODE = os.getenv("POSTBACK_MODE", "postback")  # postback (full result) or pingback (ready notice)
+POSTBACK_HOST = os.getenv("POSTBACK_HOST", "127.0.0.1")  # behind the tunnel/proxy of POSTBACK_PUBLIC_URL
+POSTBACK_PORT = int(os.getenv("POSTBACK_PORT", "8787"))
+POSTBACK_PUBLIC_URL = os.getenv("POSTBACK_PUBLIC_URL")
+POSTBACK_TOKEN = os.getenv("POSTBACK_TOKEN")  # required: reports without it are rejected
+POSTBACK_TIMEOUT = float(os.getenv("POSTBACK_TIMEOUT", "600"))  # seconds to wait per cycle
+# tasks_ready polls per minute shared by every process on this host (the account limit is 20;
+# split it between hosts when workers run on several). 0 disables the shared limit
+DATAFORSEO_TASKS_READY_PER_MINUTE = int(os.getenv("DATAFORSEO_TASKS_READY_PER_MINUTE", "18"))
+DATAFORSEO_TASKS_PER_HOUR = int(os.getenv("DATAFORSEO_TASKS_PER_HOUR", "100"))  # daemon mode budget
+
+# Storage: "supabase" (hosted) or "sqlite" (local file, see src/db/sqlite_store.py)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase")
+SQLITE_PATH = os.getenv("SQLITE_PATH")  # defaults to .cache/reviews.sqlite3
 
 # Supabase
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "200"))
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", "5"))
 
 # Project Settings
 SALON_CID = os.getenv("SALON_CID")
 SALON_NAME = os.getenv("SALON_NAME", "N/A")
 SEARCH_QUERY = os.getenv("SEARCH_QUERY")
+DISCOVERY_CACHE_TTL_HOURS = float(os.getenv("DISCOVERY_CACHE_TTL_HOURS", "24"))
+# Daemon mode: each salon is polled about once per SCHEDULER_TARGET_REVIEWS expected new reviews
+SCHEDULER_MIN_INTERVAL = float(os.getenv("SCHEDULER_MIN_INTERVAL", "900"))  # seconds
+SCHEDULER_MAX_INTERVAL = float(os.getenv("SCHEDULER_MAX_INTERVAL", "604800"))  # seconds (7 days)
+SCHEDULER_TARGET_REVIEWS = float(os.getenv("SCHEDULER_TARGET_REVIEWS", "1"))
+
+# Worker mode: salons are leased from the shared salons table
+WORKER_ID = os.getenv("WORKER_ID")  # defaults to hostname-pid
+WORKER_BATCH_SIZE = int(os.getenv("WORKER_BATCH_SIZE", "10"))
+WORKER_LEASE_SECONDS = int(os.getenv("WORKER_LEASE_SECONDS", "900"))
+WORKER_POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "60"))
+# Failed salons are held back this long, doubling per consecutive failure up to the max
+WORKER_RETRY_SECONDS = int(os.getenv("WORKER_RETRY_SECONDS", "300"))
+WORKER_MAX_RETRY_SECONDS = int(os.getenv("WORKER_MAX_RETRY_SECONDS", "3600"))
+
+# Ingestion depth: newest-first incremental fetches, full sweep on first sight/resync
+INCREMENTAL_DEPTH = int(os.getenv("INCREMENTAL_DEPTH", "20"))
+FULL_DEPTH = int(os.getenv("FULL_DEPTH", "700"))
 
 # Gemini
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# Shared Gemini budget (every router call goes through one token bucket)
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "60"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "1000000"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+# Draft context: recent responses from the same salon (True) or any salon (False)
+HISTORY_PER_SALON = os.getenv("HISTORY_PER_SALON", "True").lower() == "true"
+# Seconds before a salon's draft context is reloaded, to pick up other workers' drafts (0 = load once)
+HISTORY_TTL = float(os.getenv("HISTORY_TTL", "300"))
+# Local fast path for star-only and very short 5-star reviews (no Gemini calls)
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "True").lower() == "true"
+FAST_PATH_MAX_CHARS = int(os.getenv("FAST_PATH_MAX_CHARS", "40"))
+ROUTER_MODE = os.getenv("ROUTER_MODE", "staged").lower()  # staged, fused or shadow
+ROUTER_CONCURRENCY = int(os.getenv("ROUTER_CONCURRENCY", "8"))  # reviews analyzed in parallel
+ROUTER_DRAFT_CONCURRENCY = int(os.getenv("ROUTER_DRAFT_CONCURRENCY", "8"))  # drafts written in parallel; lower = less repetition, slower
+ROUTER_BATCH_SIZE = int(os.getenv("ROUTER_BATCH_SIZE", "1"))  # reviews per batched scout/translate call (1 = off)
+REPROCESS_WORKERS = int(os.getenv("REPROCESS_WORKERS", "4"))  # analyzer threads in reprocess_db.py
+
+# LLM response cache (local SQLite, keyed on model + stage + rendered prompt)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "True").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH")  # defaults to .cache/llm_cache.sqlite3
+LLM_CACHE_TTL_DAYS = float(os.getenv("LLM_CACHE_TTL_DAYS", "30"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+
+# Metrics export (Prometheus textfile and/or JSON snapshot lines); 0 = export once per cycle only
+METRICS_PROMETHEUS_PATH = os.getenv("METRICS_PROMETHEUS_PATH")
+METRICS_JSON_PATH = os.getenv("METRICS_JSON_PATH")
+METRICS_EXPORT_INTERVAL = float(os.getenv("METRICS_EXPORT_INTERVAL", "0"))
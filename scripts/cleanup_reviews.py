@@ -5,30 +5,42 @@ import os
 # Add project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from src.db.supabase_client import db
+from src.db.store import get_store
 
 def cleanup():
-    client = db.get_client()
+    db = get_store()
     
     print("Starting cleanup...")
+    deleted = []
     
     # 1. Delete rows with "Lỗi dịch thuật."
-    res1 = client.table("reviews").delete().eq("vietnamese_summary", "Lỗi dịch thuật.").execute()
-    count1 = len(res1.data) if res1.data else 0
-    print(f"Deleted {count1} rows with 'Lỗi dịch thuật.'")
+    rows = db.delete_reviews("vietnamese_summary", "Lỗi dịch thuật.")
+    print(f"Deleted {len(rows)} rows with 'Lỗi dịch thuật.'")
+    deleted += rows
 
     # 2. Delete rows with "Analysis Failed" category
-    res2 = client.table("reviews").delete().eq("category", "Analysis Failed").execute()
-    count2 = len(res2.data) if res2.data else 0
-    print(f"Deleted {count2} rows with 'Analysis Failed'")
+    rows = db.delete_reviews("category", "Analysis Failed")
+    print(f"Deleted {len(rows)} rows with 'Analysis Failed'")
+    deleted += rows
 
     # 3. Delete rows with "Lỗi phân tích (Rate Limit)."
-    res3 = client.table("reviews").delete().eq("vietnamese_summary", "Lỗi phân tích (Rate Limit).").execute()
-    count3 = len(res3.data) if res3.data else 0
-    print(f"Deleted {count3} rows with 'Lỗi phân tích (Rate Limit).'")
+    rows = db.delete_reviews("vietnamese_summary", "Lỗi phân tích (Rate Limit).")
+    print(f"Deleted {len(rows)} rows with 'Lỗi phân tích (Rate Limit).'")
+    deleted += rows
     
-    total = count1 + count2 + count3
-    print(f"\nTotal rows deleted: {total}")
+    print(f"\nTotal rows deleted: {len(deleted)} (and their payloads)")
+
+    # The deleted reviews are older than the salons' high-water marks, so an
+    # incremental fetch would never bring them back; forget the marks instead
+    cids = sorted({r['cid'] for r in deleted if r.get('cid')})
+    if not cids:
+        return
+    try:
+        db.delete_ingestion_states(cids)
+        print(f"Reset ingestion state for {len(cids)} salons; their next cycle refetches at full depth.")
+    except Exception as e:
+        print(f"Could not reset ingestion state ({e}). Run `python src/main.py --once --resync` "
+              f"to refetch the deleted reviews for: {', '.join(cids)}")
 
 if __name__ == "__main__":
     cleanup()
@@ -0,0 +1,38 @@
+import sys
+import os
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.db.batch_writer import BatchWriter
+from src.db.payloads import PAYLOAD_TABLE, payload_row
+from src.db.supabase_client import SupabaseClient
+
+def migrate(page_size=200):
+    """
+    Copies the inline raw_data/analysis_json columns of every review into the
+    compressed review_payloads table (sql/004_review_payloads.sql).
+    Supabase only, whatever STORAGE_BACKEND says: the SQLite schema never had
+    the inline columns.
+    """
+    print("--- Moving review blobs to review_payloads ---")
+    db = SupabaseClient()
+    writer = BatchWriter(db, table=PAYLOAD_TABLE)
+    moved = 0
+    for page in db.iter_reviews("review_id,created_at,raw_data,analysis_json", page_size=page_size):
+        for review in page:
+            if review.get('raw_data') is None and review.get('analysis_json') is None:
+                continue
+            writer.add(payload_row(review['review_id'], review.get('raw_data'), review.get('analysis_json')))
+            moved += 1
+        print(f"Queued {moved} payloads...")
+
+    writer.close()
+    print(f"Wrote {writer.rows_written} payloads in {writer.requests} requests.")
+    if writer.failed_rows:
+        print(f"{len(writer.failed_rows)} payloads failed to save; re-run before dropping the columns.")
+    else:
+        print("Done. The inline columns can now be dropped (see sql/004_review_payloads.sql).")
+
+if __name__ == "__main__":
+    migrate()
@@ -1,86 +1,369 @@
 
 import sys
 import os
+import json
 import time
+import argparse
+import threading
 
 # Add project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from config import settings
-from src.db.supabase_client import db
-from src.processing.router import IntelligenceRouter
+from src.db.store import get_store
+from src.db.batch_writer import BatchWriter
+from src.db.payloads import PAYLOAD_TABLE, payload_row
+from src.pipeline import Pipeline
+from src.metrics import metrics, instrument_services
+from src.processing.router import IntelligenceRouter, STAGE_KEYS
+from src.processing.history import HistoryProvider
 
-def reprocess_reviews():
+# Only the columns the router needs; raw_data/analysis_json live in review_payloads
+COLUMNS = "review_id,created_at,cid,salon_name,author_name,rating,original_text,owner_response"
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(__file__), 'data', 'reprocess_checkpoint.json')
+CHECKPOINT_INTERVAL = 5  # seconds between flush + checkpoint
+PROGRESS_INTERVAL = 10  # seconds between progress lines
+
+def load_checkpoint(path, filters):
+    """Returns the saved checkpoint dict if it was written for the same filters."""
+    try:
+        with open(path, 'r') as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return None
+    if checkpoint.get('filters') != filters:
+        print("Checkpoint was written for different filters, starting from the beginning.")
+        return None
+    return checkpoint
+
+def save_checkpoint(path, filters, cursor, processed, failed=()):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({"filters": filters, "cursor": list(cursor) if cursor else None,
+                   "processed": processed, "failed": sorted(failed)}, f)
+    os.replace(tmp_path, path)
+
+class CheckpointTracker:
+    """
+    Rows finish out of order when several workers run, so the checkpoint only
+    advances over the contiguous prefix of finished rows. Rows that failed to
+    analyze or write don't hold it back: their review_ids are saved with the
+    checkpoint, and --resume retries just those before continuing the scan.
+    """
+
+    def __init__(self, path, filters, processed=0, cursor=None, failed=()):
+        self.path = path
+        self.filters = filters
+        self.processed = processed
+        self.cursor = cursor
+        self.failed = set(failed)
+        self._rows = {}  # seq -> (cursor, review_id); cursor is None for retried rows
+        self._seqs = {}  # review_id -> seq, until the checkpoint passes it
+        self._done = set()
+        self._failed_seqs = set()
+        self._next = 1
+        self._lock = threading.Lock()
+
+    def register(self, seq, review_id, cursor=None):
+        with self._lock:
+            self._rows[seq] = (cursor, review_id)
+            self._seqs[review_id] = seq
+
+    def forget(self, review_ids):
+        """Drops failed review_ids that no longer exist, so they aren't retried forever."""
+        with self._lock:
+            self.failed.difference_update(review_ids)
+
+    def done(self, seq, ok=True):
+        with self._lock:
+            self._done.add(seq)
+            if not ok:
+                self._failed_seqs.add(seq)
+
+    def commit(self, failed_ids=()):
+        """
+        Call after the writers have flushed, with the review_ids whose rows failed
+        to write. Saves the furthest finished cursor and the failed review_ids.
+        """
+        with self._lock:
+            for review_id in failed_ids:
+                seq = self._seqs.get(review_id)
+                if seq is not None:
+                    self._failed_seqs.add(seq)
+                else:
+                    self.failed.add(review_id)
+            advanced = bool(failed_ids)
+            while self._next in self._done:
+                self._done.remove(self._next)
+                cursor, review_id = self._rows.pop(self._next)
+                self._seqs.pop(review_id, None)
+                if self._next in self._failed_seqs:
+                    self._failed_seqs.remove(self._next)
+                    self.failed.add(review_id)
+                else:
+                    self.failed.discard(review_id)
+                if cursor:
+                    self.cursor = cursor
+                    self.processed += 1
+                self._next += 1
+                advanced = True
+            if not advanced:
+                return
+            cursor, processed, failed = self.cursor, self.processed, list(self.failed)
+        save_checkpoint(self.path, self.filters, cursor, processed, failed)
+
+class Progress:
+    """Prints throughput and ETA every PROGRESS_INTERVAL seconds."""
+
+    def __init__(self, total):
+        self.total = total
+        self.count = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self._last_report = self.started
+        self._lock = threading.Lock()
+
+    def tick(self, ok=True):
+        with self._lock:
+            self.count += 1
+            if not ok:
+                self.failed += 1
+            now = time.monotonic()
+            if now - self._last_report < PROGRESS_INTERVAL:
+                return
+            self._last_report = now
+        self.report()
+
+    def report(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        rate = self.count / elapsed
+        remaining = max(self.total - self.count, 0)
+        eta = f"{remaining / rate / 60:.1f} min" if rate > 0 else "unknown"
+        print(f"Progress: {self.count}/{self.total} reviews ({self.failed} failed), "
+              f"{rate:.2f} reviews/s, ETA {eta}")
+
+def reprocess_reviews(cid=None, since=None, until=None, status=None, page_size=500,
+                      workers=None, stages=None, resume=False, checkpoint_path=DEFAULT_CHECKPOINT,
+                      router=None):
+    """Returns counts for this run: saved, failed (analysis) and write_failed."""
     print("--- Reprocessing All Reviews ---")
-    
-    # 1. Fetch all reviews
-    print("Fetching reviews from database...")
+    db = get_store()
+
+    filters = {"cid": cid, "since": since, "until": until, "status": status}
+    for key, value in filters.items():
+        if value:
+            print(f"Filtering by {key}: {value}")
+    if stages:
+        print(f"Re-running stages: {', '.join(sorted(stages))}")
+
+    checkpoint = load_checkpoint(checkpoint_path, filters) if resume else None
+    cursor = tuple(checkpoint['cursor']) if checkpoint and checkpoint.get('cursor') else None
+    already_done = checkpoint.get('processed', 0) if checkpoint else 0
+    retry_ids = checkpoint.get('failed', []) if checkpoint else []
+    if cursor:
+        print(f"Resuming after {cursor[1]} ({cursor[0]}), {already_done} reviews already done")
+    if retry_ids:
+        print(f"Retrying {len(retry_ids)} reviews that failed last time")
+
+    total = max(db.count_reviews(**filters) - already_done, 0) + len(retry_ids)
+    print(f"Found {total} reviews to process.")
+
+    # 1. Shared services (the router's rate limiter is process-wide)
+    router = router or IntelligenceRouter()
+    instrument_services(router=router, db=db)
+    payload_writer = BatchWriter(db, table=PAYLOAD_TABLE)
+    # Analysis traces waiting for their review row to be updated, review_id -> analysis
+    pending_payloads = {}
+    pending_lock = threading.Lock()
+
+    def update_reviews(rows):
+        # Updates only: a review deleted mid-run must not come back as a partial
+        # row, nor leave an orphan payload, so traces follow the rows that updated
+        updated = set(db.update_reviews(rows))
+        with pending_lock:
+            analyses = [(row['review_id'], pending_payloads.pop(row['review_id'], None)) for row in rows]
+        for review_id, analysis in analyses:
+            if review_id in updated and analysis is not None:
+                payload_writer.add(payload_row(review_id, analysis_json=analysis))
+
+    writer = BatchWriter(db, write=update_reviews)
+    history_provider = HistoryProvider(db, limit=5)
+    tracker = CheckpointTracker(checkpoint_path, filters, already_done, cursor, retry_ids)
+    progress = Progress(total)
+    workers = workers or settings.REPROCESS_WORKERS
+
+    # 2. Reader -> analyzers -> writer, connected by bounded queues
+    pipeline = Pipeline(queue_size=max(page_size, workers * 2))
+    to_analyze = pipeline.queue()
+    to_write = pipeline.queue()
+
+    def with_previous(page):
+        # Partial re-runs reuse the other stages from the stored analysis, one lookup per page
+        if stages:
+            payloads = db.get_review_payloads([r['review_id'] for r in page], fields=("analysis_json",))
+            for review in page:
+                review['analysis_json'] = payloads.get(review['review_id'], {}).get('analysis_json')
+        return page
+
+    def read(emit, stop_event):
+        seq = 0
+        # Failed rows from the last run first; they sit behind the cursor, so they don't move it
+        for start in range(0, len(retry_ids), page_size):
+            chunk = retry_ids[start:start + page_size]
+            rows = db.get_reviews(chunk, COLUMNS)
+            tracker.forget(set(chunk) - {r['review_id'] for r in rows})
+            for review in with_previous(rows):
+                if stop_event.is_set():
+                    return
+                seq += 1
+                tracker.register(seq, review['review_id'])
+                emit((seq, review))
+        for page in db.iter_reviews(COLUMNS, page_size=page_size, after=cursor, **filters):
+            for review in with_previous(page):
+                if stop_event.is_set():
+                    return
+                seq += 1
+                tracker.register(seq, review['review_id'], (review['created_at'], review['review_id']))
+                emit((seq, review))
+
+    def analyze(item):
+        seq, review = item
+        analysis = analyze_one(review, router, history_provider, stages)
+        return seq, review, analysis
+
+    write_failures = set()
+
+    def take_failed_ids():
+        """Review ids of rows either writer gave up on since the last call."""
+        failed = set()
+        for w in (writer, payload_writer):
+            failed.update(row['review_id'] for row in w.failed_rows)
+            w.failed_rows.clear()
+        with pending_lock:
+            for review_id in failed:
+                pending_payloads.pop(review_id, None)
+        write_failures.update(failed)
+        return failed
+
+    last_commit = [time.monotonic()]
+
+    def persist(item):
+        seq, review, analysis = item
+        if analysis:
+            with pending_lock:
+                pending_payloads[review['review_id']] = analysis
+            writer.add(update_payload(review['review_id'], analysis))
+            history_provider.record(analysis.get('draft_response'), review.get('cid'))
+        tracker.done(seq, ok=bool(analysis))
+        progress.tick(ok=bool(analysis))
+
+        if time.monotonic() - last_commit[0] >= CHECKPOINT_INTERVAL:
+            writer.flush()
+            payload_writer.flush()
+            tracker.commit(take_failed_ids())
+            last_commit[0] = time.monotonic()
+
+    pipeline.add_source(read, to_analyze, name="reader")
+    pipeline.add_stage(analyze, to_analyze, to_write, workers=workers, name="analyzer")
+    pipeline.add_stage(persist, to_write, name="writer")
+
+    print(f"Starting {workers} analyzer workers...")
+    pipeline.start()
     try:
-        query = db.client.table("reviews").select("*")
-        
-        if settings.SALON_CID:
-            print(f"Filtering by Salon CID: {settings.SALON_CID}")
-            query = query.eq("cid", settings.SALON_CID)
-            
-        response = query.order("created_at", desc=False).execute()
-        reviews = response.data
-        print(f"Found {len(reviews)} reviews.")
-    except Exception as e:
-        print(f"Error fetching reviews: {e}")
-        return
-
-    # 2. Initialize Router
-    router = IntelligenceRouter()
-    
-    # 3. Process Loop
-    for i, review in enumerate(reviews):
-        review_id = review.get('review_id')
-        author = review.get('author_name', 'Unknown')
-        print(f"\n[{i+1}/{len(reviews)}] Processing {author} ({review_id})...")
-        
-        # reconstruct review_data expected by router
-        review_data = {
-            "review_id": review_id,
-            "original_text": review.get('original_text'),
-            "rating": review.get('rating'),
-            "author_name": author,
-            "salon_name": review.get('salon_name')
-        }
-        
-        # Get Context
-        history = db.get_recent_responses(limit=5)
-        
-        # Run Analysis
-        try:
-            analysis = router.process_review(review_data, history)
-            
-            if not analysis:
-                print(" - Failed to analyze.")
-                continue
-
-            # Update Payload
-            update_payload = {
-                "sentiment_score": analysis.get('scout', {}).get('sentiment_score'),
-                "risk_flag": analysis.get('scout', {}).get('risk_flag', False),
-                "category": analysis.get('scout', {}).get('category'),
-                "vietnamese_summary": analysis.get('vietnamese_summary'),
-                "draft_response": analysis.get('draft_response'),
-                "analysis_json": analysis,
-                "status": "ANALYZED",
-                "updated_at": "now()"
-            }
-            
-            # Save to DB
-            db.client.table("reviews").update(update_payload).eq("review_id", review_id).execute()
-            print(f" - Updated: {analysis.get('draft_response')[:50]}...")
-            
-            # Sleep slightly to avoid rate limits if any
-            time.sleep(1)
-            
-        except Exception as e:
-            print(f" - Error updating: {e}")
+        pipeline.join()
+    except KeyboardInterrupt:
+        print("\nInterrupted. Finishing in-flight reviews, then saving the checkpoint...")
+        pipeline.stop()
+        pipeline.join()
 
+    writer.close()
+    payload_writer.close()
+    tracker.commit(take_failed_ids())
+    progress.report()
+    metrics.print_summary("Reprocess metrics")
+    metrics.export(settings.METRICS_PROMETHEUS_PATH, settings.METRICS_JSON_PATH)
+    print(f"Wrote {writer.rows_written} rows in {writer.requests} requests.")
+    if progress.failed:
+        print(f"{progress.failed} reviews failed to analyze and were left unchanged.")
+    if write_failures:
+        print(f"{len(write_failures)} reviews failed to save.")
+    if tracker.failed:
+        print(f"{len(tracker.failed)} failed reviews are listed in the checkpoint; "
+              "run again with --resume to retry just those.")
     print("\n✅ Reprocessing Complete.")
+    return {
+        "saved": progress.count - progress.failed - len(write_failures),
+        "failed": progress.failed,
+        "write_failed": len(write_failures)
+    }
+
+def analyze_one(review, router, history_provider, stages=None):
+    review_id = review.get('review_id')
+    author = review.get('author_name', 'Unknown')
+    print(f"Processing {author} ({review_id})...")
+
+    # reconstruct review_data expected by router
+    review_data = {
+        "review_id": review_id,
+        "original_text": review.get('original_text'),
+        "rating": review.get('rating'),
+        "author_name": author,
+        "salon_name": review.get('salon_name'),
+        "owner_response": review.get('owner_response')
+    }
+
+    # Get Context
+    history = history_provider.get(review.get('cid'))
+
+    # Run Analysis; fast-path results go back through the classifier instead of
+    # having single stages re-run by Gemini
+    previous = review.get('analysis_json')
+    if (previous or {}).get('fast_path'):
+        stages, previous = None, None
+    analysis = router.process_review(review_data, history, stages=stages, previous=previous)
+    if not analysis:
+        print(f" - Failed to analyze {review_id}.")
+    return analysis
+
+def update_payload(review_id, analysis):
+    return {
+        "review_id": review_id,
+        "sentiment_score": analysis.get('scout', {}).get('sentiment_score'),
+        "risk_flag": analysis.get('scout', {}).get('risk_flag', False),
+        "category": analysis.get('scout', {}).get('category'),
+        "vietnamese_summary": analysis.get('vietnamese_summary'),
+        "draft_response": analysis.get('draft_response'),
+        "status": "ANALYZED"
+    }
 
 if __name__ == "__main__":
-    reprocess_reviews()
+    parser = argparse.ArgumentParser(description="Re-run stored reviews through the router.")
+    parser.add_argument("--cid", default=settings.SALON_CID, help="Only reprocess this salon (defaults to SALON_CID).")
+    parser.add_argument("--since", help="Only reviews created at or after this date (ISO 8601).")
+    parser.add_argument("--until", help="Only reviews created before this date (ISO 8601).")
+    parser.add_argument("--status", help="Only reviews with this status, e.g. ANALYZED.")
+    parser.add_argument("--page-size", type=int, default=500, help="Rows fetched per page.")
+    parser.add_argument("--workers", type=int, default=settings.REPROCESS_WORKERS, help="Parallel analyzer workers.")
+    parser.add_argument("--stages", help=f"Comma-separated stages to re-run ({', '.join(STAGE_KEYS)}). Default: all.")
+    parser.add_argument("--resume", action="store_true", help="Continue from the last checkpoint.")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Checkpoint file path.")
+    args = parser.parse_args()
+
+    stages = None
+    if args.stages:
+        stages = {stage.strip() for stage in args.stages.split(",") if stage.strip()}
+        unknown = stages - set(STAGE_KEYS)
+        if unknown:
+            parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    reprocess_reviews(
+        cid=args.cid,
+        since=args.since,
+        until=args.until,
+        status=args.status,
+        page_size=args.page_size,
+        workers=args.workers,
+        stages=stages,
+        resume=args.resume,
+        checkpoint_path=args.checkpoint
+    )
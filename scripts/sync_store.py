@@ -0,0 +1,61 @@
+import sys
+import os
+import argparse
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import settings
+from src.db.batch_writer import BatchWriter
+from src.db.payloads import PAYLOAD_TABLE, payload_row
+from src.db.sqlite_store import SQLiteStore
+from src.db.supabase_client import SupabaseClient
+
+def sync(path=None, cid=None, since=None, page_size=500):
+    """
+    Pushes reviews, payloads, salons and ingestion state from a local SQLite
+    store to Supabase as bulk upserts, e.g. after a backfill run with
+    STORAGE_BACKEND=sqlite.
+    """
+    source = SQLiteStore(path or settings.SQLITE_PATH)
+    target = SupabaseClient()
+    print(f"--- Syncing {source.path} to Supabase ---")
+
+    writer = BatchWriter(target)
+    payload_writer = BatchWriter(target, table=PAYLOAD_TABLE)
+    cids = set()
+    synced = 0
+    for page in source.iter_reviews("*", page_size=page_size, cid=cid, since=since):
+        payloads = source.get_review_payloads([r['review_id'] for r in page])
+        for review in page:
+            if review.get('risk_flag') is not None:
+                review['risk_flag'] = bool(review['risk_flag'])
+            writer.add(review)
+            payload = payloads.get(review['review_id'])
+            if payload:
+                payload_writer.add(payload_row(review['review_id'], payload.get('raw_data'), payload.get('analysis_json')))
+            cids.add(review['cid'])
+        synced += len(page)
+        print(f"Queued {synced} reviews...")
+
+    writer.close()
+    payload_writer.close()
+
+    # High-water marks go last, so upstream never skips reviews that failed to sync
+    if writer.failed_rows or payload_writer.failed_rows:
+        print(f"{len(writer.failed_rows)} reviews and {len(payload_writer.failed_rows)} payloads failed; "
+              "ingestion state was not synced. Re-run to retry.")
+        return
+    salons = [s for s in source.get_salons() if not cid or s['cid'] == cid]
+    target.upsert_salons([{k: v for k, v in s.items() if v is not None} for s in salons])
+    target.save_ingestion_states(list(source.get_ingestion_states(cids).values()))
+    print(f"Done. Synced {writer.rows_written} reviews in {writer.requests} requests.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Push a local SQLite store to Supabase.")
+    parser.add_argument("--path", help="SQLite file (defaults to SQLITE_PATH).")
+    parser.add_argument("--cid", help="Only sync this salon.")
+    parser.add_argument("--since", help="Only reviews created at or after this date (ISO 8601).")
+    parser.add_argument("--page-size", type=int, default=500, help="Rows read per page.")
+    args = parser.parse_args()
+    sync(path=args.path, cid=args.cid, since=args.since, page_size=args.page_size)
@@ -0,0 +1,8 @@
+-- Per-CID ingestion high-water marks (see src/ingestion/incremental.py)
+create table if not exists ingestion_state (
+    cid text primary key,
+    last_review_date timestamptz,
+    last_review_id text,
+    last_full_sync_at timestamptz,
+    updated_at timestamptz default now()
+);
@@ -0,0 +1,11 @@
+-- Known salons, filled by discovery and by fetched review titles
+create table if not exists salons (
+    cid text primary key,
+    name text,
+    search_query text,
+    address text,
+    rating numeric,
+    last_seen_at timestamptz default now()
+);
+
+create index if not exists salons_search_query_idx on salons (search_query);
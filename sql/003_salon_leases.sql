@@ -0,0 +1,61 @@
+-- Time-limited leases so many workers can share the salons table
+-- without two of them fetching (and paying for) the same CID.
+alter table salons add column if not exists active boolean default true;
+alter table salons add column if not exists lease_owner text;
+alter table salons add column if not exists lease_expires_at timestamptz;
+alter table salons add column if not exists last_processed_at timestamptz;
+
+create index if not exists salons_claim_idx on salons (last_processed_at nulls first) where active;
+
+-- Claims up to p_limit due salons whose lease is free or expired.
+-- SKIP LOCKED lets concurrent workers claim disjoint sets without waiting.
+create or replace function claim_salons(
+    p_worker text,
+    p_limit int,
+    p_lease_seconds int,
+    p_min_interval_seconds int default 0
+)
+returns setof salons
+language plpgsql
+as $$
+begin
+    return query
+    update salons s
+       set lease_owner = p_worker,
+           lease_expires_at = now() + make_interval(secs => p_lease_seconds)
+     where s.cid in (
+        select c.cid
+          from salons c
+         where c.active
+           and (c.lease_expires_at is null or c.lease_expires_at < now())
+           and (c.last_processed_at is null
+                or c.last_processed_at < now() - make_interval(secs => p_min_interval_seconds))
+         order by c.last_processed_at nulls first
+         limit p_limit
+           for update skip locked
+     )
+    returning s.*;
+end;
+$$;
+
+-- Extends leases still held by this worker (heartbeat during long runs).
+create or replace function renew_salon_leases(p_worker text, p_cids text[], p_lease_seconds int)
+returns void
+language sql
+as $$
+    update salons
+       set lease_expires_at = now() + make_interval(secs => p_lease_seconds)
+     where lease_owner = p_worker and cid = any(p_cids);
+$$;
+
+-- Releases leases and records when the salons were processed.
+create or replace function release_salons(p_worker text, p_cids text[])
+returns void
+language sql
+as $$
+    update salons
+       set lease_owner = null,
+           lease_expires_at = null,
+           last_processed_at = now()
+     where lease_owner = p_worker and cid = any(p_cids);
+$$;
@@ -0,0 +1,13 @@
+-- Raw DataForSEO items and full analysis traces, kept out of the hot reviews table.
+-- Values are gzip-compressed JSON, base64-encoded (see src/db/payloads.py) and
+-- only loaded on demand. No foreign key: payloads are written by their own
+-- buffered writer and may land before the review row.
+create table if not exists review_payloads (
+    review_id text primary key,
+    raw_data_gz text,
+    analysis_gz text,
+    updated_at timestamptz default now()
+);
+
+-- After scripts/migrate_payloads.py has copied the existing blobs over:
+-- alter table reviews drop column raw_data, drop column analysis_json;
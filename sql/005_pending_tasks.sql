@@ -0,0 +1,14 @@
+-- DataForSEO review tasks posted in postback/pingback mode and not yet consumed.
+-- Lets results that arrive late, or after a restart, still reach ingestion
+-- instead of being paid for and dropped (see src/ingestion/postback.py).
+create table if not exists pending_tasks (
+    task_id text primary key,
+    cid text not null,
+    depth int,
+    sort_by text,
+    status text not null default 'POSTED',  -- POSTED, READY or RECEIVED
+    posted_at timestamptz default now(),
+    updated_at timestamptz default now()
+);
+
+create index if not exists pending_tasks_cid_idx on pending_tasks (cid);
@@ -0,0 +1,6 @@
+-- Content fingerprint of each review's text, rating and owner answer
+-- ('<text hash>.<rating>.<answer hash>', see src/ingestion/fingerprint.py).
+-- Ingestion compares it against every fetch to catch edited reviews and new
+-- owner answers. Rows saved before this column existed are backfilled the
+-- first time ingestion sees them again.
+alter table reviews add column if not exists content_fingerprint text;
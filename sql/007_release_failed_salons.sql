@@ -0,0 +1,15 @@
+-- Lets a worker hand back salons it failed to ingest without stamping
+-- last_processed_at, so another worker can claim them right away instead of
+-- waiting out the check interval.
+drop function if exists release_salons(text, text[]);
+
+create or replace function release_salons(p_worker text, p_cids text[], p_processed boolean default true)
+returns void
+language sql
+as $$
+    update salons
+       set lease_owner = null,
+           lease_expires_at = null,
+           last_processed_at = case when p_processed then now() else last_processed_at end
+     where lease_owner = p_worker and cid = any(p_cids);
+$$;
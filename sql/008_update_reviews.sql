@@ -0,0 +1,23 @@
+-- Bulk update of existing reviews, used by scripts/reprocess_db.py and the
+-- ingest's content_fingerprint backfill instead of an upsert of partial rows.
+-- An upsert would re-create a review deleted mid-run (e.g. by
+-- cleanup_reviews.py) as a row holding only the updated columns, and fails
+-- outright if reviews has a NOT NULL column without a default. Here
+-- review_ids that no longer exist are simply skipped.
+-- Only keys present in a row are changed; updated_at is always set to now().
+-- Returns the review_ids that were updated.
+create or replace function update_reviews(p_rows jsonb)
+returns table (review_id text)
+language sql
+as $$
+    update reviews r
+       set (sentiment_score, risk_flag, category, vietnamese_summary, draft_response, status,
+            content_fingerprint) =
+           (select p.sentiment_score, p.risk_flag, p.category, p.vietnamese_summary, p.draft_response, p.status,
+                   p.content_fingerprint
+              from jsonb_populate_record(r, x.item - 'updated_at') p),
+           updated_at = now()
+      from jsonb_array_elements(p_rows) as x(item)
+     where r.review_id = x.item->>'review_id'
+    returning r.review_id;
+$$;
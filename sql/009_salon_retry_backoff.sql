@@ -0,0 +1,62 @@
+-- Backoff for salons a worker failed to ingest. release_salons(p_processed =>
+-- false) used to leave them due right away, and claim_salons hands out the
+-- oldest last_processed_at first, so a Gemini outage or a review that always
+-- fails had workers re-claiming (and re-posting paid tasks for) the same CID
+-- back to back. Each consecutive failure now holds the salon back for
+-- p_retry_seconds, doubling up to p_max_retry_seconds; a success resets it.
+alter table salons add column if not exists retry_after timestamptz;
+alter table salons add column if not exists failures int not null default 0;
+
+create or replace function claim_salons(
+    p_worker text,
+    p_limit int,
+    p_lease_seconds int,
+    p_min_interval_seconds int default 0
+)
+returns setof salons
+language plpgsql
+as $$
+begin
+    return query
+    update salons s
+       set lease_owner = p_worker,
+           lease_expires_at = now() + make_interval(secs => p_lease_seconds)
+     where s.cid in (
+        select c.cid
+          from salons c
+         where c.active
+           and (c.lease_expires_at is null or c.lease_expires_at < now())
+           and (c.retry_after is null or c.retry_after < now())
+           and (c.last_processed_at is null
+                or c.last_processed_at < now() - make_interval(secs => p_min_interval_seconds))
+         order by c.last_processed_at nulls first
+         limit p_limit
+           for update skip locked
+     )
+    returning s.*;
+end;
+$$;
+
+drop function if exists release_salons(text, text[], boolean);
+
+create or replace function release_salons(
+    p_worker text,
+    p_cids text[],
+    p_processed boolean default true,
+    p_retry_seconds int default 0,
+    p_max_retry_seconds int default 0
+)
+returns void
+language sql
+as $$
+    update salons
+       set lease_owner = null,
+           lease_expires_at = null,
+           last_processed_at = case when p_processed then now() else last_processed_at end,
+           retry_after = case when p_processed then null
+                              else now() + make_interval(secs => least(p_retry_seconds * power(2, least(failures, 20)),
+                                                                       greatest(p_max_retry_seconds, p_retry_seconds)))
+                         end,
+           failures = case when p_processed then 0 else failures + 1 end
+     where lease_owner = p_worker and cid = any(p_cids);
+$$;
@@ -0,0 +1,110 @@
+import atexit
+import threading
+import time
+from config import settings
+
+
+class BatchWriter:
+    """
+    Buffers rows and writes them to Supabase as chunked bulk upserts.
+    `write` replaces the upsert, e.g. db.update_reviews for rows that must
+    only update existing reviews.
+
+    Flushes when the buffer reaches `batch_size`, when `flush_interval` seconds
+    have passed since the last flush, and at interpreter shutdown. If a chunk
+    fails, its rows are retried one by one so a single bad row doesn't drop
+    the whole batch.
+    """
+
+    def __init__(self, db, table: str = "reviews", on_conflict: str = "review_id",
+                 batch_size: int = None, flush_interval: float = None, write=None):
+        self.db = db
+        self.table = table
+        self.on_conflict = on_conflict
+        self.write = write or self._upsert
+        self.batch_size = batch_size or settings.WRITE_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else settings.WRITE_FLUSH_INTERVAL
+
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._closed = threading.Event()
+
+        # Stats
+        self.requests = 0
+        self.rows_written = 0
+        self.failed_rows = []
+
+        self._timer = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._timer.start()
+        atexit.register(self.close)
+
+    def add(self, row: dict):
+        """Queues a row for writing. Flushes immediately if the buffer is full."""
+        with self._lock:
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Writes everything currently buffered."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+                self._last_flush = time.monotonic()
+            if not rows:
+                return
+
+            # Bulk writes need uniform keys, so group rows by their column set
+            groups = {}
+            for row in rows:
+                groups.setdefault(tuple(sorted(row.keys())), []).append(row)
+
+            for group in groups.values():
+                for start in range(0, len(group), self.batch_size):
+                    self._write_chunk(group[start:start + self.batch_size])
+
+    def close(self):
+        """Stops the background flusher and writes any remaining rows."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self.flush()
+        if self.failed_rows:
+            print(f"BatchWriter: {len(self.failed_rows)} rows could not be written to {self.table}.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _write_chunk(self, chunk: list[dict]):
+        try:
+            self.requests += 1
+            self.write(chunk)
+            self.rows_written += len(chunk)
+            print(f"Flushed {len(chunk)} rows to {self.table}")
+        except Exception as e:
+            print(f"Batch write failed ({e}). Retrying {len(chunk)} rows individually...")
+            for row in chunk:
+                try:
+                    self.requests += 1
+                    self.write([row])
+                    self.rows_written += 1
+                except Exception as row_error:
+                    print(f"Failed to write row {row.get(self.on_conflict)}: {row_error}")
+                    self.failed_rows.append(row)
+
+    def _upsert(self, rows: list[dict]):
+        self.db.upsert_rows(self.table, rows, on_conflict=self.on_conflict)
+
+    def _flush_periodically(self):
+        while not self._closed.wait(min(self.flush_interval, 1.0)):
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"Background flush error: {e}")
@@ -0,0 +1,32 @@
+import gzip
+import json
+import base64
+
+# Side table for the bulky per-review blobs (see sql/004_review_payloads.sql)
+PAYLOAD_TABLE = "review_payloads"
+# Logical field -> compressed column in PAYLOAD_TABLE
+PAYLOAD_COLUMNS = {"raw_data": "raw_data_gz", "analysis_json": "analysis_gz"}
+
+
+def encode_payload(value) -> str:
+    """JSON -> gzip -> base64 text, so it travels through PostgREST as a plain string."""
+    if value is None:
+        return None
+    data = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.b64encode(gzip.compress(data)).decode('ascii')
+
+
+def decode_payload(text: str):
+    if not text:
+        return None
+    return json.loads(gzip.decompress(base64.b64decode(text)))
+
+
+def payload_row(review_id: str, raw_data=None, analysis_json=None) -> dict:
+    """Builds a review_payloads row with only the fields that were given."""
+    row = {"review_id": review_id, "updated_at": "now()"}
+    if raw_data is not None:
+        row[PAYLOAD_COLUMNS["raw_data"]] = encode_payload(raw_data)
+    if analysis_json is not None:
+        row[PAYLOAD_COLUMNS["analysis_json"]] = encode_payload(analysis_json)
+    return row
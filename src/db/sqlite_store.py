@@ -0,0 +1,443 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+from src.db.payloads import PAYLOAD_TABLE, PAYLOAD_COLUMNS, decode_payload
+from src.db.store import ReviewStore
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+DEFAULT_PATH = os.path.join(BASE_DIR, '.cache', 'reviews.sqlite3')
+
+# Same tables as the Supabase project (sql/*.sql), in SQLite types. Timestamps are
+# ISO-8601 UTC text, so they sort and compare like timestamptz. review_id is
+# indexed through its primary key.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    review_id TEXT PRIMARY KEY,
+    cid TEXT,
+    salon_name TEXT,
+    author_name TEXT,
+    rating INTEGER,
+    original_text TEXT,
+    owner_response TEXT,
+    review_url TEXT,
+    review_date TEXT,
+    profile_image_url TEXT,
+    author_review_count INTEGER,
+    sentiment_score REAL,
+    risk_flag INTEGER,
+    category TEXT,
+    vietnamese_summary TEXT,
+    draft_response TEXT,
+    status TEXT,
+    content_fingerprint TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_reviews_cid ON reviews (cid, created_at);
+CREATE INDEX IF NOT EXISTS idx_reviews_created_at ON reviews (created_at, review_id);
+
+CREATE TABLE IF NOT EXISTS review_payloads (
+    review_id TEXT PRIMARY KEY,
+    raw_data_gz TEXT,
+    analysis_gz TEXT,
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS ingestion_state (
+    cid TEXT PRIMARY KEY,
+    last_review_date TEXT,
+    last_review_id TEXT,
+    last_full_sync_at TEXT,
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS salons (
+    cid TEXT PRIMARY KEY,
+    name TEXT,
+    search_query TEXT,
+    address TEXT,
+    rating REAL,
+    last_seen_at TEXT,
+    active INTEGER DEFAULT 1,
+    lease_owner TEXT,
+    lease_expires_at TEXT,
+    last_processed_at TEXT,
+    retry_after TEXT,
+    failures INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_salons_search_query ON salons (search_query);
+
+CREATE TABLE IF NOT EXISTS pending_tasks (
+    task_id TEXT PRIMARY KEY,
+    cid TEXT NOT NULL,
+    depth INTEGER,
+    sort_by TEXT,
+    status TEXT NOT NULL DEFAULT 'POSTED',
+    posted_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_pending_tasks_cid ON pending_tasks (cid);
+"""
+
+# Columns added after a table was first shipped, for files created by older versions
+ADDED_COLUMNS = {
+    "salons": {"retry_after": "TEXT", "failures": "INTEGER NOT NULL DEFAULT 0"},
+}
+
+
+def _now(offset_seconds: float = 0) -> str:
+    return (datetime.now(timezone.utc) + timedelta(seconds=offset_seconds)).isoformat()
+
+
+class SQLiteStore(ReviewStore):
+    """
+    ReviewStore in a local SQLite file, for backfills, benchmarks and offline
+    runs. WAL mode lets readers (e.g. a dashboard) keep going while the agent
+    writes; scripts/sync_store.py pushes the results to Supabase in bulk.
+
+    One connection is shared by all threads behind a lock, like the LLM
+    response cache. Salon leases work across processes on the same file.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str = None):
+        self.path = path or DEFAULT_PATH
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            for column, definition in columns.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def _query(self, sql: str, params=()) -> list[dict]:
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def _execute(self, sql: str, params=()) -> int:
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount
+
+    @staticmethod
+    def _value(value):
+        if value == "now()":
+            return _now()
+        if isinstance(value, bool):
+            return int(value)
+        return value
+
+    @staticmethod
+    def _placeholders(values) -> str:
+        return ",".join("?" * len(values))
+
+    # Reviews
+
+    def review_exists(self, review_id: str) -> bool:
+        return bool(self._query("SELECT 1 FROM reviews WHERE review_id = ?", (review_id,)))
+
+    def get_review_fingerprints(self, review_ids: list[str], chunk_size: int = 500) -> dict:
+        unique_ids = list(dict.fromkeys(rid for rid in review_ids if rid))
+        found = {}
+        for start in range(0, len(unique_ids), chunk_size):
+            chunk = unique_ids[start:start + chunk_size]
+            rows = self._query(
+                "SELECT review_id, content_fingerprint, original_text, rating, owner_response "
+                f"FROM reviews WHERE review_id IN ({self._placeholders(chunk)})", chunk
+            )
+            for r in rows:
+                found[r['review_id']] = r['content_fingerprint'] or r
+        return found
+
+    def insert_review(self, review_data: dict):
+        columns = list(review_data)
+        try:
+            self._execute(
+                f"INSERT INTO reviews ({','.join(columns)}) VALUES ({self._placeholders(columns)})",
+                [self._value(review_data[c]) for c in columns]
+            )
+            print(f"Inserted review {review_data.get('review_id')}")
+        except Exception as e:
+            print(f"Error inserting review: {e}")
+            raise
+
+    def upsert_rows(self, table: str, rows: list[dict], on_conflict: str = "review_id"):
+        """Upserts rows in one transaction; only the given columns are updated on conflict."""
+        if not rows:
+            return
+        columns = list(rows[0])
+        keys = [c.strip() for c in on_conflict.split(",")]
+        updates = ",".join(f"{c}=excluded.{c}" for c in columns if c not in keys)
+        sql = (f"INSERT INTO {table} ({','.join(columns)}) VALUES ({self._placeholders(columns)}) "
+               f"ON CONFLICT ({','.join(keys)}) DO " + (f"UPDATE SET {updates}" if updates else "NOTHING"))
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN")
+                try:
+                    self._conn.executemany(sql, [[self._value(row[c]) for c in columns] for row in rows])
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        except Exception as e:
+            print(f"Error upserting {len(rows)} rows into {table}: {e}")
+            raise
+
+    def update_reviews(self, rows: list[dict]):
+        """Updates rows in one transaction; review_ids that don't exist are left alone."""
+        if not rows:
+            return []
+        columns = [c for c in rows[0] if c not in ("review_id", "updated_at")]
+        sql = (f"UPDATE reviews SET {','.join(f'{c} = ?' for c in columns)}, updated_at = ? "
+               f"WHERE review_id = ?")
+        now = _now()
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN")
+                try:
+                    ids = [row['review_id'] for row in rows]
+                    existing = {r[0] for r in self._conn.execute(
+                        f"SELECT review_id FROM reviews WHERE review_id IN ({self._placeholders(ids)})", ids)}
+                    self._conn.executemany(sql, [[self._value(row[c]) for c in columns] + [now, row['review_id']]
+                                                 for row in rows if row['review_id'] in existing])
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        except Exception as e:
+            print(f"Error updating {len(rows)} reviews: {e}")
+            raise
+        return [rid for rid in ids if rid in existing]
+
+    def iter_reviews(self, columns: str = "*", page_size: int = 500, after: tuple = None,
+                     cid: str = None, since: str = None, until: str = None, status: str = None):
+        cursor = after
+        while True:
+            where, params = self._filter_reviews(cid, since, until, status)
+            if cursor:
+                where.append("(created_at, review_id) > (?, ?)")
+                params.extend(cursor)
+            sql = (f"SELECT {columns} FROM reviews" + (" WHERE " + " AND ".join(where) if where else "")
+                   + " ORDER BY created_at, review_id LIMIT ?")
+            try:
+                rows = self._query(sql, params + [page_size])
+            except Exception as e:
+                print(f"Error fetching reviews page: {e}")
+                raise
+
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+            cursor = (rows[-1]['created_at'], rows[-1]['review_id'])
+
+    def get_reviews(self, review_ids: list[str], columns: str = "*", chunk_size: int = 500) -> list[dict]:
+        unique_ids = list(dict.fromkeys(rid for rid in review_ids if rid))
+        rows = []
+        for start in range(0, len(unique_ids), chunk_size):
+            chunk = unique_ids[start:start + chunk_size]
+            rows.extend(self._query(
+                f"SELECT {columns} FROM reviews WHERE review_id IN ({self._placeholders(chunk)})", chunk
+            ))
+        return rows
+
+    def count_reviews(self, cid: str = None, since: str = None, until: str = None, status: str = None) -> int:
+        where, params = self._filter_reviews(cid, since, until, status)
+        sql = "SELECT COUNT(*) AS n FROM reviews" + (" WHERE " + " AND ".join(where) if where else "")
+        return self._query(sql, params)[0]['n']
+
+    def delete_reviews(self, column: str, value) -> list[dict]:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                rows = [dict(r) for r in self._conn.execute(
+                    f"SELECT review_id, cid FROM reviews WHERE {column} = ?", (value,)).fetchall()]
+                self._conn.execute(f"DELETE FROM {PAYLOAD_TABLE} WHERE review_id IN "
+                                   f"(SELECT review_id FROM reviews WHERE {column} = ?)", (value,))
+                self._conn.execute(f"DELETE FROM reviews WHERE {column} = ?", (value,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return rows
+
+    def _filter_reviews(self, cid=None, since=None, until=None, status=None):
+        where, params = [], []
+        for clause, value in (("cid = ?", cid), ("created_at >= ?", since),
+                              ("created_at < ?", until), ("status = ?", status)):
+            if value:
+                where.append(clause)
+                params.append(value)
+        return where, params
+
+    def update_status(self, review_id: str, status: str, extra_data: dict = None):
+        update_payload = {"status": status, "updated_at": "now()"}
+        if extra_data:
+            update_payload.update(extra_data)
+        try:
+            self._execute(
+                f"UPDATE reviews SET {','.join(f'{c} = ?' for c in update_payload)} WHERE review_id = ?",
+                [self._value(v) for v in update_payload.values()] + [review_id]
+            )
+            print(f"Updated review {review_id} status to {status}")
+        except Exception as e:
+            print(f"Error updating review status: {e}")
+            raise
+
+    def get_recent_responses(self, limit: int = 5, cid: str = None) -> list[str]:
+        sql = "SELECT draft_response FROM reviews WHERE draft_response IS NOT NULL AND draft_response != ''"
+        params = []
+        if cid:
+            sql += " AND cid = ?"
+            params.append(cid)
+        rows = self._query(sql + " ORDER BY created_at DESC LIMIT ?", params + [limit])
+        return [r['draft_response'] for r in rows]
+
+    # Review payloads
+
+    def get_review_payloads(self, review_ids: list[str], fields=("raw_data", "analysis_json"),
+                            chunk_size: int = 500) -> dict:
+        unique_ids = list(dict.fromkeys(rid for rid in review_ids if rid))
+        columns = ",".join(["review_id"] + [PAYLOAD_COLUMNS[field] for field in fields])
+        payloads = {}
+        for start in range(0, len(unique_ids), chunk_size):
+            chunk = unique_ids[start:start + chunk_size]
+            rows = self._query(f"SELECT {columns} FROM {PAYLOAD_TABLE} WHERE review_id IN ({self._placeholders(chunk)})", chunk)
+            for row in rows:
+                payloads[row['review_id']] = {field: decode_payload(row.get(PAYLOAD_COLUMNS[field])) for field in fields}
+        return payloads
+
+    # Ingestion state and salons
+
+    def get_ingestion_states(self, cids: list[str]) -> dict:
+        cids = list(cids)
+        if not cids:
+            return {}
+        rows = self._query(f"SELECT * FROM ingestion_state WHERE cid IN ({self._placeholders(cids)})", cids)
+        return {r['cid']: r for r in rows}
+
+    def delete_ingestion_states(self, cids: list[str]):
+        cids = list(cids)
+        if cids:
+            self._execute(f"DELETE FROM ingestion_state WHERE cid IN ({self._placeholders(cids)})", cids)
+
+    def get_salons(self, search_query: str = None) -> list[dict]:
+        if search_query:
+            return self._query("SELECT cid, name, search_query FROM salons WHERE search_query = ?", (search_query,))
+        return self._query("SELECT cid, name, search_query FROM salons")
+
+    def get_salon_names(self, cids: list[str]) -> dict:
+        cids = list(cids)
+        if not cids:
+            return {}
+        rows = self._query(f"SELECT cid, name FROM salons WHERE cid IN ({self._placeholders(cids)})", cids)
+        return {r['cid']: r['name'] for r in rows if r.get('name')}
+
+    # Salon leases: same rules as the claim_salons/renew/release functions in sql/003_salon_leases.sql
+    # and sql/009_salon_retry_backoff.sql
+
+    def claim_salons(self, worker_id: str, limit: int, lease_seconds: int, min_interval_seconds: int = 0) -> list[dict]:
+        now = _now()
+        try:
+            with self._lock:
+                # IMMEDIATE takes the write lock up front, so two processes can't claim the same rows
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    cids = [r[0] for r in self._conn.execute(
+                        "SELECT cid FROM salons WHERE active "
+                        "AND (lease_expires_at IS NULL OR lease_expires_at < ?) "
+                        "AND (retry_after IS NULL OR retry_after < ?) "
+                        "AND (last_processed_at IS NULL OR last_processed_at < ?) "
+                        "ORDER BY last_processed_at IS NOT NULL, last_processed_at LIMIT ?",
+                        (now, now, _now(-min_interval_seconds), limit)
+                    ).fetchall()]
+                    self._conn.execute(
+                        f"UPDATE salons SET lease_owner = ?, lease_expires_at = ? WHERE cid IN ({self._placeholders(cids)})",
+                        [worker_id, _now(lease_seconds)] + cids
+                    )
+                    rows = self._conn.execute(f"SELECT * FROM salons WHERE cid IN ({self._placeholders(cids)})", cids).fetchall()
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            return [dict(row) for row in rows]
+        except Exception as e:
+            print(f"Error claiming salons: {e}")
+            return []
+
+    def renew_salon_leases(self, worker_id: str, cids: list[str], lease_seconds: int):
+        cids = list(cids)
+        try:
+            self._execute(
+                f"UPDATE salons SET lease_expires_at = ? WHERE lease_owner = ? AND cid IN ({self._placeholders(cids)})",
+                [_now(lease_seconds), worker_id] + cids
+            )
+        except Exception as e:
+            print(f"Error renewing salon leases: {e}")
+
+    def release_salons(self, worker_id: str, cids: list[str], processed: bool = True,
+                       retry_seconds: int = 0, max_retry_seconds: int = 0):
+        cids = list(cids)
+        try:
+            if processed:
+                self._execute(
+                    "UPDATE salons SET lease_owner = NULL, lease_expires_at = NULL, last_processed_at = ?, "
+                    f"retry_after = NULL, failures = 0 WHERE lease_owner = ? AND cid IN ({self._placeholders(cids)})",
+                    [_now(), worker_id] + cids
+                )
+                return
+            cap = max(max_retry_seconds, retry_seconds)
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    rows = self._conn.execute(
+                        f"SELECT cid, failures FROM salons WHERE lease_owner = ? AND cid IN ({self._placeholders(cids)})",
+                        [worker_id] + cids
+                    ).fetchall()
+                    self._conn.executemany(
+                        "UPDATE salons SET lease_owner = NULL, lease_expires_at = NULL, retry_after = ?, "
+                        "failures = failures + 1 WHERE cid = ?",
+                        [(_now(min(retry_seconds * 2 ** min(failures or 0, 20), cap)), cid) for cid, failures in rows]
+                    )
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        except Exception as e:
+            print(f"Error releasing salons: {e}")
+
+    # Pending DataForSEO tasks
+
+    def get_pending_tasks(self, cids: list[str]) -> list[dict]:
+        cids = list(cids)
+        if not cids:
+            return []
+        return self._query(f"SELECT * FROM pending_tasks WHERE cid IN ({self._placeholders(cids)}) ORDER BY posted_at", cids)
+
+    def get_pending_task(self, task_id: str):
+        rows = self._query("SELECT * FROM pending_tasks WHERE task_id = ?", (task_id,))
+        return rows[0] if rows else None
+
+    def mark_pending_tasks(self, task_ids: list[str], status: str):
+        task_ids = list(task_ids)
+        self._execute(
+            f"UPDATE pending_tasks SET status = ?, updated_at = ? WHERE task_id IN ({self._placeholders(task_ids)})",
+            [status, _now()] + task_ids
+        )
+
+    def delete_pending_tasks(self, task_ids: list[str]):
+        task_ids = list(task_ids)
+        if task_ids:
+            self._execute(f"DELETE FROM pending_tasks WHERE task_id IN ({self._placeholders(task_ids)})", task_ids)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,197 @@
+import threading
+from abc import ABC, abstractmethod
+
+from config import settings
+
+
+class ReviewStore(ABC):
+    """
+    Storage interface for reviews, their payloads, salons, ingestion state and
+    pending DataForSEO tasks. Implemented by SupabaseClient (hosted) and
+    SQLiteStore (local file); get_store() picks one from settings.
+
+    Row dicts use the column names of the Supabase tables, and the string
+    "now()" as a value means the current time on every backend.
+    """
+
+    # Backend name, used as the metrics label
+    backend = None
+
+    # Reviews
+
+    @abstractmethod
+    def review_exists(self, review_id: str) -> bool:
+        """Checks if a review ID already exists in the database."""
+
+    @abstractmethod
+    def get_review_fingerprints(self, review_ids: list[str], chunk_size: int = 100) -> dict:
+        """
+        Returns {review_id: content_fingerprint} for the review_ids that already exist.
+        Rows stored before fingerprints existed come back with the columns the
+        fingerprint is derived from instead (as a dict), so callers can compute it.
+        """
+
+    @abstractmethod
+    def insert_review(self, review_data: dict):
+        """Inserts a new review into the database."""
+
+    @abstractmethod
+    def upsert_rows(self, table: str, rows: list[dict], on_conflict: str = "review_id"):
+        """Upserts many rows in a single request. Every row must share the same keys."""
+
+    @abstractmethod
+    def update_reviews(self, rows: list[dict]):
+        """
+        Updates existing reviews in bulk, matched on review_id. Only the analysis
+        columns, status and content_fingerprint are changed (see sql/008_update_reviews.sql) and
+        updated_at is set to now. Rows whose review no longer exists are skipped,
+        never inserted. Every row must share the same keys. Returns the
+        review_ids that were updated.
+        """
+
+    @abstractmethod
+    def iter_reviews(self, columns: str = "*", page_size: int = 500, after: tuple = None,
+                     cid: str = None, since: str = None, until: str = None, status: str = None):
+        """
+        Streams reviews ordered by (created_at, review_id), one page (list of rows)
+        at a time. `after` is a (created_at, review_id) cursor to resume from.
+        """
+
+    @abstractmethod
+    def get_reviews(self, review_ids: list[str], columns: str = "*", chunk_size: int = 100) -> list[dict]:
+        """Returns the rows of the given reviews that exist, in no particular order."""
+
+    @abstractmethod
+    def count_reviews(self, cid: str = None, since: str = None, until: str = None, status: str = None) -> int:
+        """Counts reviews matching the same filters as iter_reviews."""
+
+    @abstractmethod
+    def delete_reviews(self, column: str, value) -> list[dict]:
+        """
+        Deletes the reviews where `column` equals `value`, and their review_payloads
+        rows. Returns the deleted reviews as {review_id, cid} dicts.
+        """
+
+    @abstractmethod
+    def update_status(self, review_id: str, status: str, extra_data: dict = None):
+        """Updates the status of a review."""
+
+    @abstractmethod
+    def get_recent_responses(self, limit: int = 5, cid: str = None) -> list[str]:
+        """Fetches the last 'limit' draft responses to provide context, optionally for one salon."""
+
+    # Review payloads (see src/db/payloads.py)
+
+    @abstractmethod
+    def get_review_payloads(self, review_ids: list[str], fields=("raw_data", "analysis_json"),
+                            chunk_size: int = 100) -> dict:
+        """
+        Loads the compressed raw_data/analysis_json blobs for the given reviews.
+        Returns {review_id: {field: value}} for the reviews that have a payload.
+        """
+
+    def get_review_payload(self, review_id: str, field: str = "analysis_json"):
+        """Lazily loads one blob for one review, or None."""
+        return self.get_review_payloads([review_id], fields=(field,)).get(review_id, {}).get(field)
+
+    # Ingestion state and salons
+
+    @abstractmethod
+    def get_ingestion_states(self, cids: list[str]) -> dict:
+        """Returns {cid: state_row} for the CIDs that have been ingested before."""
+
+    @abstractmethod
+    def delete_ingestion_states(self, cids: list[str]):
+        """Forgets the high-water marks of these CIDs, so their next fetch is a FULL_DEPTH sweep."""
+
+    def save_ingestion_states(self, states: list[dict]):
+        """Upserts per-CID high-water marks."""
+        # Rows may carry different columns (e.g. last_full_sync_at), bulk upserts need uniform keys
+        for rows in _group_by_keys(states):
+            self.upsert_rows("ingestion_state", rows, on_conflict="cid")
+
+    def upsert_salons(self, salons: list[dict]):
+        """Upserts rows into the salons table, keyed by CID."""
+        for rows in _group_by_keys(salons):
+            self.upsert_rows("salons", rows, on_conflict="cid")
+
+    @abstractmethod
+    def get_salons(self, search_query: str = None) -> list[dict]:
+        """Returns known salons, optionally only those found by a given search query."""
+
+    @abstractmethod
+    def get_salon_names(self, cids: list[str]) -> dict:
+        """Returns {cid: name} for the given CIDs."""
+
+    # Salon leases (see sql/003_salon_leases.sql)
+
+    @abstractmethod
+    def claim_salons(self, worker_id: str, limit: int, lease_seconds: int, min_interval_seconds: int = 0) -> list[dict]:
+        """Leases up to `limit` due salons to this worker."""
+
+    @abstractmethod
+    def renew_salon_leases(self, worker_id: str, cids: list[str], lease_seconds: int):
+        """Extends leases still held by this worker."""
+
+    @abstractmethod
+    def release_salons(self, worker_id: str, cids: list[str], processed: bool = True,
+                       retry_seconds: int = 0, max_retry_seconds: int = 0):
+        """
+        Releases leases and records when the salons were processed. With
+        processed=False (the ingest failed) they are not claimed again for
+        `retry_seconds`, doubling with each consecutive failure up to
+        `max_retry_seconds`.
+        """
+
+    # Pending DataForSEO tasks (see sql/005_pending_tasks.sql)
+
+    def add_pending_tasks(self, tasks: list[dict]):
+        """Records posted DataForSEO tasks."""
+        self.upsert_rows("pending_tasks", tasks, on_conflict="task_id")
+
+    @abstractmethod
+    def get_pending_tasks(self, cids: list[str]) -> list[dict]:
+        """Unconsumed tasks for these CIDs, oldest first."""
+
+    @abstractmethod
+    def get_pending_task(self, task_id: str):
+        """The pending_tasks row for this task id, or None."""
+
+    @abstractmethod
+    def mark_pending_tasks(self, task_ids: list[str], status: str):
+        """Sets the status of these tasks (POSTED, READY or RECEIVED)."""
+
+    @abstractmethod
+    def delete_pending_tasks(self, task_ids: list[str]):
+        """Forgets tasks whose results were consumed."""
+
+
+def _group_by_keys(rows: list[dict]) -> list[list[dict]]:
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    return list(groups.values())
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ReviewStore:
+    """
+    Returns the process-wide store for settings.STORAGE_BACKEND ("supabase" or
+    "sqlite"), creating it on first use so importing a module never connects.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            backend = (settings.STORAGE_BACKEND or "supabase").lower()
+            if backend == "supabase":
+                from src.db.supabase_client import SupabaseClient
+                _store = SupabaseClient()
+            elif backend == "sqlite":
+                from src.db.sqlite_store import SQLiteStore
+                _store = SQLiteStore(settings.SQLITE_PATH)
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+        return _store
@@ -1,7 +1,10 @@
 from supabase import create_client, Client
 from config import settings
+from src.db.payloads import PAYLOAD_TABLE, PAYLOAD_COLUMNS, decode_payload
+from src.db.store import ReviewStore
 
-class SupabaseClient:
+class SupabaseClient(ReviewStore):
+    backend = "supabase"
     _instance = None
 
     def __new__(cls):
@@ -27,6 +30,30 @@ class SupabaseClient:
             print(f"Error checking review existence: {e}")
             return False
 
+    def get_review_fingerprints(self, review_ids: list[str], chunk_size: int = 100) -> dict:
+        """
+        Returns {review_id: content_fingerprint} for the review_ids that already exist.
+        Rows stored before fingerprints existed come back with the columns the
+        fingerprint is derived from instead (as a dict), so callers can compute it.
+        """
+        unique_ids = list(dict.fromkeys(rid for rid in review_ids if rid))
+        found = {}
+        try:
+            for start in range(0, len(unique_ids), chunk_size):
+                chunk = unique_ids[start:start + chunk_size]
+                response = self.client.table("reviews").select("review_id,content_fingerprint").in_("review_id", chunk).execute()
+                found.update({r['review_id']: r.get('content_fingerprint') for r in response.data})
+
+            legacy = [rid for rid, fp in found.items() if not fp]
+            for start in range(0, len(legacy), chunk_size):
+                chunk = legacy[start:start + chunk_size]
+                response = self.client.table("reviews").select("review_id,original_text,rating,owner_response").in_("review_id", chunk).execute()
+                found.update({r['review_id']: r for r in response.data})
+            return found
+        except Exception as e:
+            print(f"Error fetching review fingerprints: {e}")
+            raise
+
     def insert_review(self, review_data: dict):
         """Inserts a new review into the database."""
         try:
@@ -36,6 +63,244 @@ class SupabaseClient:
             print(f"Error inserting review: {e}")
             raise
 
+    def get_review_payloads(self, review_ids: list[str], fields=("raw_data", "analysis_json"),
+                            chunk_size: int = 100) -> dict:
+        """
+        Loads the compressed raw_data/analysis_json blobs for the given reviews.
+        Returns {review_id: {field: value}} for the reviews that have a payload.
+        """
+        unique_ids = list(dict.fromkeys(rid for rid in review_ids if rid))
+        columns = ",".join(["review_id"] + [PAYLOAD_COLUMNS[field] for field in fields])
+        payloads = {}
+        try:
+            for start in range(0, len(unique_ids), chunk_size):
+                chunk = unique_ids[start:start + chunk_size]
+                response = self.client.table(PAYLOAD_TABLE).select(columns).in_("review_id", chunk).execute()
+                for row in response.data:
+                    payloads[row['review_id']] = {field: decode_payload(row.get(PAYLOAD_COLUMNS[field])) for field in fields}
+            return payloads
+        except Exception as e:
+            print(f"Error fetching review payloads: {e}")
+            raise
+
+    def upsert_rows(self, table: str, rows: list[dict], on_conflict: str = "review_id"):
+        """
+        Upserts many rows in a single request. Every row must share the same keys
+        (PostgREST builds the column list from the payload).
+        """
+        if not rows:
+            return
+        try:
+            self.client.table(table).upsert(rows, on_conflict=on_conflict).execute()
+        except Exception as e:
+            print(f"Error upserting {len(rows)} rows into {table}: {e}")
+            raise
+
+    def update_reviews(self, rows: list[dict]):
+        """Bulk update of existing reviews in one request (see sql/008_update_reviews.sql)."""
+        if not rows:
+            return []
+        try:
+            response = self.client.rpc("update_reviews", {"p_rows": rows}).execute()
+            return [r['review_id'] for r in response.data or []]
+        except Exception as e:
+            print(f"Error updating {len(rows)} reviews: {e}")
+            raise
+
+    def iter_reviews(self, columns: str = "*", page_size: int = 500, after: tuple = None,
+                     cid: str = None, since: str = None, until: str = None, status: str = None):
+        """
+        Streams reviews ordered by (created_at, review_id) using keyset pagination,
+        so memory stays flat and PostgREST's row cap never truncates the scan.
+        `after` is a (created_at, review_id) cursor to resume from.
+        Yields one page (list of rows) at a time.
+        """
+        cursor = after
+        while True:
+            query = self._filter_reviews(self.client.table("reviews").select(columns), cid, since, until, status)
+            if cursor:
+                created_at, review_id = cursor
+                # Values are quoted: timestamps contain '.' and ':' which PostgREST treats as syntax
+                query = query.or_(
+                    f'created_at.gt."{created_at}",'
+                    f'and(created_at.eq."{created_at}",review_id.gt."{review_id}")'
+                )
+
+            try:
+                response = query.order("created_at").order("review_id").limit(page_size).execute()
+            except Exception as e:
+                print(f"Error fetching reviews page: {e}")
+                raise
+
+            rows = response.data
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+            cursor = (rows[-1]['created_at'], rows[-1]['review_id'])
+
+    def get_reviews(self, review_ids: list[str], columns: str = "*", chunk_size: int = 100) -> list[dict]:
+        """Returns the rows of the given reviews that exist, in no particular order."""
+        unique_ids = list(dict.fromkeys(rid for rid in review_ids if rid))
+        rows = []
+        try:
+            for start in range(0, len(unique_ids), chunk_size):
+                chunk = unique_ids[start:start + chunk_size]
+                rows.extend(self.client.table("reviews").select(columns).in_("review_id", chunk).execute().data)
+            return rows
+        except Exception as e:
+            print(f"Error fetching reviews: {e}")
+            raise
+
+    def count_reviews(self, cid: str = None, since: str = None, until: str = None, status: str = None) -> int:
+        """Counts reviews matching the same filters as iter_reviews."""
+        try:
+            query = self.client.table("reviews").select("review_id", count="exact")
+            response = self._filter_reviews(query, cid, since, until, status).limit(1).execute()
+            return response.count or 0
+        except Exception as e:
+            print(f"Error counting reviews: {e}")
+            return 0
+
+    def delete_reviews(self, column: str, value, chunk_size: int = 100) -> list[dict]:
+        """
+        Deletes the reviews where `column` equals `value`, and their review_payloads
+        rows. Returns the deleted reviews as {review_id, cid} dicts.
+        Payloads go first, so a failure part way never leaves orphan payloads;
+        re-running picks up the reviews that are left.
+        """
+        try:
+            rows = self.client.table("reviews").select("review_id,cid").eq(column, value).execute().data
+            review_ids = [r['review_id'] for r in rows]
+            for start in range(0, len(review_ids), chunk_size):
+                chunk = review_ids[start:start + chunk_size]
+                self.client.table(PAYLOAD_TABLE).delete().in_("review_id", chunk).execute()
+                self.client.table("reviews").delete().in_("review_id", chunk).execute()
+            return rows
+        except Exception as e:
+            print(f"Error deleting reviews: {e}")
+            raise
+
+    def _filter_reviews(self, query, cid=None, since=None, until=None, status=None):
+        if cid:
+            query = query.eq("cid", cid)
+        if since:
+            query = query.gte("created_at", since)
+        if until:
+            query = query.lt("created_at", until)
+        if status:
+            query = query.eq("status", status)
+        return query
+
+    def get_ingestion_states(self, cids: list[str]) -> dict:
+        """Returns {cid: state_row} for the CIDs that have been ingested before."""
+        if not cids:
+            return {}
+        try:
+            response = self.client.table("ingestion_state").select("*").in_("cid", list(cids)).execute()
+            return {r['cid']: r for r in response.data}
+        except Exception as e:
+            print(f"Error fetching ingestion state: {e}")
+            raise
+
+    def delete_ingestion_states(self, cids: list[str]):
+        if not cids:
+            return
+        try:
+            self.client.table("ingestion_state").delete().in_("cid", list(cids)).execute()
+        except Exception as e:
+            print(f"Error deleting ingestion state: {e}")
+            raise
+
+    def get_salons(self, search_query: str = None) -> list[dict]:
+        """Returns known salons, optionally only those found by a given search query."""
+        try:
+            query = self.client.table("salons").select("cid,name,search_query")
+            if search_query:
+                query = query.eq("search_query", search_query)
+            return query.execute().data
+        except Exception as e:
+            print(f"Error fetching salons: {e}")
+            return []
+
+    def get_salon_names(self, cids: list[str]) -> dict:
+        """Returns {cid: name} for the given CIDs."""
+        if not cids:
+            return {}
+        try:
+            response = self.client.table("salons").select("cid,name").in_("cid", list(cids)).execute()
+            return {r['cid']: r['name'] for r in response.data if r.get('name')}
+        except Exception as e:
+            print(f"Error fetching salon names: {e}")
+            return {}
+
+    def claim_salons(self, worker_id: str, limit: int, lease_seconds: int, min_interval_seconds: int = 0) -> list[dict]:
+        """Leases up to `limit` due salons to this worker (see sql/009_salon_retry_backoff.sql)."""
+        try:
+            response = self.client.rpc("claim_salons", {
+                "p_worker": worker_id,
+                "p_limit": limit,
+                "p_lease_seconds": lease_seconds,
+                "p_min_interval_seconds": min_interval_seconds
+            }).execute()
+            return response.data or []
+        except Exception as e:
+            print(f"Error claiming salons: {e}")
+            return []
+
+    def renew_salon_leases(self, worker_id: str, cids: list[str], lease_seconds: int):
+        try:
+            self.client.rpc("renew_salon_leases", {
+                "p_worker": worker_id, "p_cids": list(cids), "p_lease_seconds": lease_seconds
+            }).execute()
+        except Exception as e:
+            print(f"Error renewing salon leases: {e}")
+
+    def release_salons(self, worker_id: str, cids: list[str], processed: bool = True,
+                       retry_seconds: int = 0, max_retry_seconds: int = 0):
+        """Releases leases (see sql/009_salon_retry_backoff.sql)."""
+        try:
+            self.client.rpc("release_salons", {
+                "p_worker": worker_id, "p_cids": list(cids), "p_processed": processed,
+                "p_retry_seconds": int(retry_seconds), "p_max_retry_seconds": int(max_retry_seconds)
+            }).execute()
+        except Exception as e:
+            print(f"Error releasing salons: {e}")
+
+    def get_pending_tasks(self, cids: list[str]) -> list[dict]:
+        """Unconsumed tasks for these CIDs, oldest first."""
+        if not cids:
+            return []
+        try:
+            response = self.client.table("pending_tasks").select("*").in_("cid", list(cids)).order("posted_at").execute()
+            return response.data
+        except Exception as e:
+            print(f"Error fetching pending tasks: {e}")
+            raise
+
+    def get_pending_task(self, task_id: str):
+        try:
+            response = self.client.table("pending_tasks").select("*").eq("task_id", task_id).limit(1).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            print(f"Error fetching pending task: {e}")
+            raise
+
+    def mark_pending_tasks(self, task_ids: list[str], status: str):
+        try:
+            self.client.table("pending_tasks").update({"status": status, "updated_at": "now()"}).in_("task_id", list(task_ids)).execute()
+        except Exception as e:
+            print(f"Error updating pending tasks: {e}")
+            raise
+
+    def delete_pending_tasks(self, task_ids: list[str]):
+        if not task_ids:
+            return
+        try:
+            self.client.table("pending_tasks").delete().in_("task_id", list(task_ids)).execute()
+        except Exception as e:
+            print(f"Error deleting pending tasks: {e}")
+
     def update_status(self, review_id: str, status: str, extra_data: dict = None):
         """Updates the status of a review."""
         update_payload = {"status": status, "updated_at": "now()"}
@@ -51,12 +316,15 @@ class SupabaseClient:
             print(f"Error updating review status: {e}")
             raise
 
-    def get_recent_responses(self, limit: int = 5) -> list[str]:
-        """Fetches the last 'limit' draft responses to provide context."""
+    def get_recent_responses(self, limit: int = 5, cid: str = None) -> list[str]:
+        """Fetches the last 'limit' draft responses to provide context, optionally for one salon."""
         try:
-            response = self.client.table("reviews") \
+            query = self.client.table("reviews") \
                 .select("draft_response") \
-                .neq("draft_response", "null") \
+                .neq("draft_response", "null")
+            if cid:
+                query = query.eq("cid", cid)
+            response = query \
                 .order("created_at", desc=True) \
                 .limit(limit) \
                 .execute()
@@ -65,6 +333,3 @@ class SupabaseClient:
         except Exception as e:
             print(f"Error fetching recent responses: {e}")
             return []
-
-# Global instance for easy access
-db = SupabaseClient()
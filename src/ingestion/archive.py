@@ -0,0 +1,137 @@
+import os
+import gzip
+import json
+import time
+import socket
+import threading
+from datetime import datetime, timezone
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single-process use only
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+DEFAULT_DIR = os.path.join(BASE_DIR, '.cache', 'dataforseo_archive')
+INDEX_FILE = 'index.jsonl'
+
+
+class ResponseArchive:
+    """
+    Append-only local archive of raw DataForSEO task_get responses.
+
+    Each response is written as its own compressed frame (gzip member or zstd
+    frame) appended to a daily segment file, so segments stay valid streams and
+    any single response can be read back by seeking to its offset. A plain
+    JSONL sidecar index maps task IDs and CIDs to (segment, offset, length).
+
+    Several processes (e.g. --worker replicas) can share one archive: each
+    writes its own segments, so offsets never interleave, and appends to the
+    shared index hold an exclusive file lock.
+    """
+
+    def __init__(self, path: str = None, compression: str = "gzip"):
+        self.path = path or DEFAULT_DIR
+        if compression == "zstd" and zstandard is None:
+            print("Warning: zstandard is not installed, archiving with gzip instead.")
+            compression = "gzip"
+        self.compression = compression
+        self._lock = threading.Lock()
+        self._by_task = None
+        self._by_cid = None
+
+    def record(self, task_id: str, cid: str, response: dict):
+        """Appends one task response and indexes it under its task ID and CID."""
+        line = json.dumps({"task_id": task_id, "cid": cid, "archived_at": time.time(), "response": response},
+                          ensure_ascii=False)
+        frame = self._compress((line + "\n").encode('utf-8'))
+        segment = (f"reviews-{datetime.now(timezone.utc):%Y-%m-%d}-{socket.gethostname()}-{os.getpid()}"
+                   f".jsonl.{'zst' if self.compression == 'zstd' else 'gz'}")
+
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, segment), 'ab') as f:
+                offset = f.tell()
+                f.write(frame)
+            entry = {"task_id": task_id, "cid": cid, "segment": segment, "offset": offset,
+                     "length": len(frame), "archived_at": time.time()}
+            with open(os.path.join(self.path, INDEX_FILE), 'a') as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                # One write per line, flushed before the lock is released
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+            if self._by_task is not None:
+                self._add_to_index(entry)
+
+    def get(self, task_id: str):
+        """Returns the archived response for a task, or None."""
+        entry = self._index()[0].get(task_id)
+        if entry is None:
+            # Another process may have archived it since the index was loaded
+            entry = self._index(reload=True)[0].get(task_id)
+        return self._read(entry) if entry else None
+
+    def latest(self, cid: str):
+        """Returns the most recently archived response for a CID, or None."""
+        entries = self._index()[1].get(cid)
+        return self._read(entries[-1]) if entries else None
+
+    def cids(self) -> list[str]:
+        return list(self._index()[1])
+
+    def iter_responses(self, cid: str = None):
+        """Yields (task_id, cid, response) in archive order, optionally for one CID."""
+        by_task, by_cid = self._index()
+        entries = by_cid.get(cid, []) if cid else sorted(by_task.values(), key=lambda e: e['archived_at'])
+        for entry in entries:
+            response = self._read(entry)
+            if response is not None:
+                yield entry['task_id'], entry['cid'], response
+
+    def _index(self, reload=False):
+        with self._lock:
+            if self._by_task is None or reload:
+                self._by_task, self._by_cid = {}, {}
+                try:
+                    with open(os.path.join(self.path, INDEX_FILE), 'r') as f:
+                        for line in f:
+                            try:
+                                self._add_to_index(json.loads(line))
+                            except json.JSONDecodeError:
+                                # A torn last line from a crash mid-append
+                                continue
+                except FileNotFoundError:
+                    pass
+            return self._by_task, self._by_cid
+
+    def _add_to_index(self, entry: dict):
+        self._by_task[entry['task_id']] = entry
+        self._by_cid.setdefault(entry['cid'], []).append(entry)
+
+    def _read(self, entry: dict):
+        try:
+            with open(os.path.join(self.path, entry['segment']), 'rb') as f:
+                f.seek(entry['offset'])
+                frame = f.read(entry['length'])
+            return json.loads(self._decompress(frame, entry['segment']))['response']
+        except Exception as e:
+            print(f"Error reading archived task {entry.get('task_id')}: {e}")
+            return None
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor().compress(data)
+        return gzip.compress(data)
+
+    def _decompress(self, frame: bytes, segment: str) -> bytes:
+        if segment.endswith('.zst'):
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read .zst segments")
+            return zstandard.ZstdDecompressor().decompress(frame)
+        return gzip.decompress(frame)
@@ -1,11 +1,34 @@
-import requests
 import json
 import time
+from datetime import datetime, timezone
 from base64 import b64encode
 from config import settings
+from src.ingestion.transport import HttpTransport
+from src.ingestion.archive import ResponseArchive
+from src.ingestion.postback import RECEIVED
+from src.ingestion.poll_limiter import SharedPollLimiter
+from src.ingestion.incremental import parse_review_time, review_id_of
+
+# DataForSEO accepts at most 100 tasks per task_post call
+TASK_POST_LIMIT = 100
+# tasks_ready is limited to 20 calls a minute per account. Every process on
+# this host takes its polls from one SharedPollLimiter budget
+# (DATAFORSEO_TASKS_READY_PER_MINUTE); on top of that each polls every 5s,
+# backing off while nothing of ours is ready
+POLL_INTERVAL = 5  # seconds before the first tasks_ready poll
+MAX_POLL_INTERVAL = 30
+POLL_BACKOFF = 1.5
+# Sorts replayed reviews without a timestamp last
+EPOCH = datetime.min.replace(tzinfo=timezone.utc)
+# task_get statuses for tasks that are queued or still running
+RUNNING_STATUSES = {10100, 10200, 40601, 40602}
+
+def _requested_depth(depth, cid: str) -> int:
+    """`depth` is either one depth for every CID or a {cid: depth} dict."""
+    return depth.get(cid, 100) if isinstance(depth, dict) else depth
 
 class DataForSEOClient:
-    def __init__(self):
+    def __init__(self, transport=None, archive=None, replay=None, receiver=None, poll_limiter=None):
         self.login = settings.DATAFORSEO_LOGIN
         self.password = settings.DATAFORSEO_PASSWORD
         
@@ -18,96 +41,381 @@ class DataForSEOClient:
 
         if not self.login or not self.password:
             print("Warning: DataForSEO credentials missing.")
-        
-    def _get_headers(self):
-        return {
+
+        # Built once; the transport reuses pooled keep-alive connections for every call
+        self._headers = {
             'Authorization': 'Basic ' + b64encode(f"{self.login}:{self.password}".encode('utf-8')).decode('utf-8'),
             'Content-Type': 'application/json'
         }
+        # A transport can be injected (e.g. the offline fakes in bench/)
+        self.http = transport or HttpTransport(
+            headers=self._headers,
+            read_timeout=settings.DATAFORSEO_TIMEOUT,
+            max_retries=settings.DATAFORSEO_MAX_RETRIES
+        )
+        # Raw task responses are archived locally so they can be re-parsed or
+        # replayed later; in replay mode reviews are served from the archive only
+        self.replay = settings.DATAFORSEO_REPLAY if replay is None else replay
+        if archive is None and (settings.DATAFORSEO_ARCHIVE_ENABLED or self.replay):
+            archive = ResponseArchive(settings.DATAFORSEO_ARCHIVE_DIR, settings.DATAFORSEO_ARCHIVE_COMPRESSION)
+        self.archive = archive
+        # Tasks accepted by task_post over the client's lifetime (for budgeting)
+        self.tasks_posted = 0
+        # With a PostbackReceiver, finished tasks are reported to us instead of polled
+        self.receiver = receiver
+        # tasks_ready budget shared with other processes polling the same account
+        self.poll_limiter = poll_limiter
+        if poll_limiter is None and settings.DATAFORSEO_TASKS_READY_PER_MINUTE > 0:
+            self.poll_limiter = SharedPollLimiter(self.login, settings.DATAFORSEO_TASKS_READY_PER_MINUTE)
 
-    def fetch_reviews(self, cid: str, depth: int = 100):
+    def fetch_reviews(self, cid: str, depth: int = 100, sort_by: str = None):
         """
         Fetches reviews using the Task Post/Get (Async) method.
         This handles cases where data is not in 'Live' cache.
         """
-        # 1. Post Task
+        return self.fetch_reviews_batch([cid], depth=depth, sort_by=sort_by).get(cid, ([], None))
+
+    def fetch_reviews_batch(self, cids: list[str], depth=100, sort_by: str = None, timeout: int = 120):
+        """
+        Fetches reviews for many businesses at once.
+        Posts up to TASK_POST_LIMIT tasks per `task_post` call, then collects finished
+        tasks from `tasks_ready` as they complete, so total wait is roughly the
+        slowest task rather than the sum of all of them.
+
+        `depth` is either one depth for every CID or a {cid: depth} dict.
+        `sort_by` is passed through to the API (e.g. "newest").
+
+        Returns {cid: (items, title)}. CIDs whose task failed or timed out map to ([], None).
+        """
+        results = {cid: ([], None) for cid in cids}
+        for cid, items, title in self.iter_reviews_batch(cids, depth, sort_by, timeout):
+            results[cid] = (items, title)
+        return results
+
+    def iter_reviews_batch(self, cids: list[str], depth=100, sort_by: str = None, timeout: int = 120,
+                           stop_event=None):
+        """
+        Streaming form of fetch_reviews_batch: yields (cid, items, title) as each
+        task finishes, so callers can start on one salon while the rest are still
+        queued. CIDs whose task failed or timed out are yielded last with ([], None).
+        Setting `stop_event` abandons tasks that are still running.
+        """
+        if not cids:
+            return
+        if self.replay:
+            for cid, (items, title) in self._replay_batch(cids, depth).items():
+                yield cid, items, title
+            return
+        if self.receiver:
+            yield from self._iter_postback_batch(cids, depth, sort_by, timeout, stop_event)
+            return
+        unreported = dict.fromkeys(cids)
+
+        # 1. Post Tasks (chunked to the per-call limit)
+        pending = self._post_review_tasks(list(unreported), depth, sort_by)
+
+        if not pending:
+            print("DEBUG: Task Post failed.")
+            for cid in unreported:
+                yield cid, [], None
+            return
+
+        print(f"DEBUG: {len(pending)} tasks started. Waiting for results...")
+
+        # 2. Collect finished tasks via tasks_ready
+        ready_endpoint = f"{self.base_domain}/business_data/google/reviews/tasks_ready"
+        deadline = time.monotonic() + timeout
+        polls = 0
+        interval = POLL_INTERVAL
+        while pending and time.monotonic() < deadline:
+            wait = min(interval, max(deadline - time.monotonic(), 0))
+            if stop_event is None:
+                time.sleep(wait)
+            elif stop_event.wait(wait):
+                print(f"DEBUG: Stopping, abandoning {len(pending)} running tasks.")
+                break
+            if self.poll_limiter and not self.poll_limiter.acquire(stop_event):
+                print(f"DEBUG: Stopping, abandoning {len(pending)} running tasks.")
+                break
+            polls += 1
+            # Failed and empty polls count against the limit too
+            interval = min(interval * POLL_BACKOFF, MAX_POLL_INTERVAL)
+            try:
+                # Not retried: a retry would spend another poll outside the shared budget,
+                # and a failed poll is simply repeated on the next round
+                response = self.http.get(ready_endpoint, max_retries=0)
+                result = response.json()
+            except Exception as e:
+                print(f"Error polling tasks_ready: {e}")
+                continue
+
+            if result.get('status_code') != 20000:
+                print(f"DataForSEO Error: {result.get('status_message')}")
+                continue
+
+            # tasks_ready lists every finished task on the account; keep only ours
+            ready_ids = []
+            for task in result.get('tasks', []):
+                for ready in task.get('result') or []:
+                    if ready.get('id') in pending:
+                        ready_ids.append(ready['id'])
+            if ready_ids:
+                interval = POLL_INTERVAL
+
+            for task_id in ready_ids:
+                cid = pending.pop(task_id)
+                items, title = self._get_task_result(task_id, cid)
+                unreported.pop(cid, None)
+                yield cid, items, title
+
+            if pending and polls % 5 == 0:
+                print(f"DEBUG: {len(pending)} tasks still running...")
+
+        # 3. Last chance: tasks collected by another process never show up in
+        # tasks_ready, so ask for the stragglers directly before giving up
+        stopped = stop_event is not None and stop_event.is_set()
+        for task_id, cid in list(pending.items()):
+            if stopped:
+                break
+            items, title = self._get_task_result(task_id, cid)
+            if items or title:
+                unreported.pop(cid, None)
+                pending.pop(task_id)
+                yield cid, items, title
+
+        for task_id in pending:
+            print(f"DEBUG: Task {task_id} timed out.")
+
+        # Whatever is left failed, timed out or was abandoned
+        for cid in unreported:
+            yield cid, [], None
+
+    def _post_tasks(self, url: str, payload: list) -> dict:
+        """Posts a task array. Returns {task_id: tag} for every task that was accepted."""
+        try:
+            print(f"DEBUG: Requesting {url}")
+            # Not retried after a read timeout or 5xx: the tasks may already be created and billed
+            response = self.http.post(url, data=json.dumps(payload), idempotent=False)
+            response.raise_for_status()
+            result = response.json()
+        except Exception as e:
+            print(f"Error making request to {url}: {e}")
+            return {}
+
+        if result.get('status_code') != 20000:
+            print(f"DataForSEO Error: {result.get('status_message')}")
+            return {}
+
+        accepted = {}
+        for task in result.get('tasks', []):
+            status = task.get('status_code')
+            if status != 20000 and status != 20100:
+                print(f"DataForSEO Task Error: {task.get('status_message')} (Code: {status})")
+                continue
+            accepted[task.get('id')] = (task.get('data') or {}).get('tag')
+        self.tasks_posted += len(accepted)
+        return accepted
+
+    def _iter_postback_batch(self, cids: list[str], depth, sort_by: str, timeout: int, stop_event=None):
+        """
+        Postback form of iter_reviews_batch, with no tasks_ready polling. Tasks left
+        unconsumed by earlier cycles (or a previous run) are reused; the rest are
+        posted with a postback/pingback URL and yielded as the receiver reports
+        them. Tasks that outlive `timeout` stay in pending_tasks for the next cycle.
+        """
+        unreported = dict.fromkeys(cids)
+        waiting = {}  # task_id -> cid
+
+        # 1. Results we already paid for
+        try:
+            leftovers = self.receiver.pending_for(list(unreported))
+        except Exception as e:
+            print(f"Error loading pending tasks: {e}")
+            leftovers = []
+        superseded = []
+        for row in leftovers:
+            task_id, cid = row['task_id'], row['cid']
+            # Only one task per CID is needed; older duplicates are dropped
+            if cid not in unreported or cid in waiting.values():
+                superseded.append(task_id)
+                continue
+            if (row.get('depth') or 0) < _requested_depth(depth, cid) or row.get('sort_by') != sort_by:
+                superseded.append(task_id)
+                continue
+            response = self.archive.get(task_id) if self.archive and row.get('status') == RECEIVED else None
+            if response is None:
+                # Pingback, lost postback or result that landed while we were down: one direct look
+                response = self._get_task_response(task_id, cid)
+            if self._task_finished(response):
+                items, title = self._parse_task_result(task_id, response)
+                unreported.pop(cid, None)
+                yield cid, items, title
+                self.receiver.consumed([task_id])
+            else:
+                waiting[task_id] = cid
+        if superseded:
+            self.receiver.consumed(superseded)
+        if waiting:
+            print(f"DEBUG: Reusing {len(waiting)} tasks posted earlier.")
+
+        # 2. Post the rest with a report-back URL
+        new_cids = [cid for cid in unreported if cid not in waiting.values()]
+        def expect(accepted):
+            # Saved per chunk, before the next task_post: a small task can report
+            # back within seconds, and the receiver rejects ids it doesn't know
+            try:
+                self.receiver.expect([{"task_id": task_id, "cid": cid,
+                                       "depth": _requested_depth(depth, cid), "sort_by": sort_by}
+                                      for task_id, cid in accepted.items()])
+            except Exception as e:
+                print(f"Error saving pending tasks: {e}")
+
+        if new_cids:
+            waiting.update(self._post_review_tasks(new_cids, depth, sort_by, self.receiver.task_fields(),
+                                                   on_accepted=expect))
+
+        # 3. Wait for reports instead of polling
+        print(f"DEBUG: Waiting for {len(waiting)} task reports...")
+        for task_id, response in self.receiver.wait(list(waiting), self.receiver.timeout or timeout, stop_event):
+            cid = waiting.pop(task_id)
+            if response is None:
+                response = self._get_task_response(task_id, cid)
+            items, title = self._parse_task_result(task_id, response or {})
+            unreported.pop(cid, None)
+            yield cid, items, title
+            self.receiver.consumed([task_id])
+
+        if waiting:
+            print(f"DEBUG: {len(waiting)} tasks still running; they will be collected next cycle.")
+        for cid in unreported:
+            yield cid, [], None
+
+    def _post_review_tasks(self, cids: list[str], depth, sort_by: str = None, extra: dict = None,
+                           on_accepted=None) -> dict:
+        """
+        Posts one review task per CID, chunked to the per-call limit. Returns {task_id: cid}.
+        `on_accepted` is called with each chunk's {task_id: cid} as soon as it is accepted.
+        """
         post_endpoint = f"{self.base_domain}/business_data/google/reviews/task_post"
-        payload = [{
-            "language_name": "English",
-            "language_code": "en",
-            "location_name": "United States",
-            "location_code": 2840,
-            "cid": cid, # Use the ID from search
-            "depth": depth
-        }]
-        
-        print(f"DEBUG: Posting review task for {cid}...")
-        post_response = self._make_request(post_endpoint, payload, is_task_post=True)
-        if not post_response:
-             # Fallback: Try sending it as 'data_id' if 'cid' failed logic? 
-             # But let's assume cid works or we rely on the error.
-             print("DEBUG: Task Post failed.")
-             return [], None
-
-        task_id = post_response
-        print(f"DEBUG: Task {task_id} started. Waiting for results...")
-        
-        # 2. Poll for Results
+        pending = {}
+        unique_cids = list(dict.fromkeys(cids))
+        for start in range(0, len(unique_cids), TASK_POST_LIMIT):
+            chunk = unique_cids[start:start + TASK_POST_LIMIT]
+            payload = []
+            for cid in chunk:
+                task = {
+                    "language_name": "English",
+                    "language_code": "en",
+                    "location_name": "United States",
+                    "location_code": 2840,
+                    "cid": cid, # Use the ID from search
+                    "depth": _requested_depth(depth, cid),
+                    "tag": cid # Echoed back so results can be matched to the CID
+                }
+                if sort_by:
+                    task["sort_by"] = sort_by
+                if extra:
+                    task.update(extra)
+                payload.append(task)
+
+            print(f"DEBUG: Posting {len(payload)} review tasks...")
+            accepted = self._post_tasks(post_endpoint, payload)
+            if accepted and on_accepted:
+                on_accepted(accepted)
+            pending.update(accepted)
+        return pending
+
+    def _replay_batch(self, cids: list[str], depth=100):
+        """
+        Serves fetch_reviews_batch from the archive. Every archived task for a CID
+        is merged, since incremental fetches only hold the newest few reviews:
+        one item per review_id (the most recently archived copy), newest first,
+        cut to depth.
+        """
+        if self.archive is None:
+            self.archive = ResponseArchive(settings.DATAFORSEO_ARCHIVE_DIR, settings.DATAFORSEO_ARCHIVE_COMPRESSION)
+        results = {}
+        for cid in cids:
+            merged, title = {}, None
+            for task_id, _, response in self.archive.iter_responses(cid):
+                items, task_title = self._parse_task_result(task_id, response)
+                for item in items:
+                    merged[review_id_of(item) or id(item)] = item
+                title = task_title or title
+            items = sorted(merged.values(), key=lambda i: parse_review_time(i.get('timestamp')) or EPOCH, reverse=True)
+            results[cid] = (items[:_requested_depth(depth, cid)], title)
+        replayed = sum(1 for items, title in results.values() if items or title)
+        print(f"DEBUG: Replayed {replayed}/{len(results)} salons from the archive.")
+        return results
+
+    def _get_task_result(self, task_id: str, cid: str = None):
+        """Fetches a finished review task and archives the raw response. Returns (items, title)."""
+        result = self._get_task_response(task_id, cid)
+        return self._parse_task_result(task_id, result) if result else ([], None)
+
+    def _get_task_response(self, task_id: str, cid: str = None):
+        """Raw task_get response (archived when the task succeeded), or None on error."""
         get_endpoint = f"{self.base_domain}/business_data/google/reviews/task_get/{task_id}"
-        
-        for i in range(30): # Try for 60 seconds (30 * 2s)
-            time.sleep(2)
+        try:
+            response = self.http.get(get_endpoint)
+            result = response.json()
+        except Exception as e:
+            print(f"Error fetching task {task_id}: {e}")
+            return None
+
+        tasks = result.get('tasks') or []
+        if self.archive and result.get('status_code') == 20000 and tasks and tasks[0].get('status_code') == 20000:
             try:
-                response = requests.get(get_endpoint, headers=self._get_headers())
-                result = response.json()
-                
-                if result.get('status_code') == 20000:
-                    tasks = result.get('tasks', [])
-                    if tasks:
-                        task_status = tasks[0].get('status_code')
-                        
-                        if task_status == 20000:
-                            # Task Complete!
-                            items = tasks[0].get('result', [])
-                            if items:
-                                return items[0].get('items', []), items[0].get('title')
-                            return [], None
-                        elif task_status == 40400:
-                            print(f"DEBUG: Task {task_id} returned Not Found.")
-                            return [], None
-                        else:
-                            # Still running (10100 is queue, 10200 is running)
-                            if i % 5 == 0:
-                                print(f"DEBUG: Task {task_id} is running (Status: {task_status})...")
+                self.archive.record(task_id, (tasks[0].get('data') or {}).get('tag') or cid, result)
             except Exception as e:
-                print(f"Error polling task {task_id}: {e}")
-                
-        print(f"DEBUG: Task {task_id} timed out.")
+                print(f"Could not archive task {task_id}: {e}")
+        return result
+
+    @staticmethod
+    def _task_finished(result) -> bool:
+        tasks = (result or {}).get('tasks') or []
+        return bool(tasks) and tasks[0].get('status_code') not in RUNNING_STATUSES
+
+    def _parse_task_result(self, task_id: str, result: dict):
+        """Extracts (items, title) from a task_get response, live or archived."""
+        if result.get('status_code') == 20000:
+            tasks = result.get('tasks', [])
+            if tasks:
+                task_status = tasks[0].get('status_code')
+
+                if task_status == 20000:
+                    items = tasks[0].get('result', [])
+                    if items:
+                        return items[0].get('items', []) or [], items[0].get('title')
+                elif task_status == 40400:
+                    print(f"DEBUG: Task {task_id} returned Not Found.")
+                else:
+                    # Still running (10100 is queue, 10200 is running)
+                    print(f"DEBUG: Task {task_id} is not finished (Status: {task_status}).")
         return [], None
 
-    def search_businesses(self, keyword: str):
+    def search_businesses(self, keyword: str, location_code: int = 2840):
         """
         Searches for businesses on Google Maps.
         Endpoint: serp/google/maps/live/advanced
         """
+        if self.replay:
+            print("DEBUG: Replay mode, skipping live business search.")
+            return []
         endpoint = f"{self.base_domain}/serp/google/maps/live/advanced"
         
         payload = [{
             "keyword": keyword,
             "language_code": "en",
-            "location_code": 2840 # USA
+            "location_code": location_code # 2840 = USA
         }]
         
         return self._make_request(endpoint, payload)
 
-    def _make_request(self, url: str, payload: list, is_task_post: bool = False):
+    def _make_request(self, url: str, payload: list):
         try:
             print(f"DEBUG: Requesting {url}") # Make this visible
-            response = requests.post(
-                url,
-                headers=self._get_headers(),
-                data=json.dumps(payload)
-            )
+            response = self.http.post(url, data=json.dumps(payload), idempotent=False)
             # print(f"DEBUG: Request to {url} status: {response.status_code}") 
             response.raise_for_status()
             result = response.json()
@@ -122,13 +430,7 @@ class DataForSEOClient:
                         status = task.get('status_code')
                         if status != 20000 and status != 20100:
                             print(f"DataForSEO Task Error: {task.get('status_message')} (Code: {status})")
-                            if is_task_post:
-                                return None
 
-                        # If posting a task, we just want the ID
-                        if is_task_post:
-                            return task.get('id')
-                            
                         # If getting results
                         if task.get('result'):
                              # Debug: Print structure if fetching reviews
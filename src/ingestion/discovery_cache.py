@@ -0,0 +1,50 @@
+import os
+import json
+import time
+import threading
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+DEFAULT_PATH = os.path.join(BASE_DIR, '.cache', 'discovery.json')
+
+
+class DiscoveryCache:
+    """
+    Local JSON cache of search_businesses results, keyed by query and location.
+    The business list for a zip code rarely changes within a day, so a fresh
+    entry saves a paid live search on every cycle.
+    """
+
+    def __init__(self, path: str = None, ttl_seconds: float = 86400):
+        self.path = path or DEFAULT_PATH
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query: str, location_code: int) -> str:
+        return f"{query.strip().lower()}|{location_code}"
+
+    def get(self, query: str, location_code: int, allow_stale: bool = False):
+        """Returns the cached business list, or None if missing or expired."""
+        entry = self._load().get(self.make_key(query, location_code))
+        if not entry:
+            return None
+        if not allow_stale and time.time() - entry.get('fetched_at', 0) > self.ttl_seconds:
+            return None
+        return entry.get('businesses')
+
+    def set(self, query: str, location_code: int, businesses: list):
+        with self._lock:
+            data = self._load()
+            data[self.make_key(query, location_code)] = {"fetched_at": time.time(), "businesses": businesses}
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
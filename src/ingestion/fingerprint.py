@@ -0,0 +1,53 @@
+import hashlib
+
+# What a change invalidates. Text feeds every stage; the rating feeds scout (and
+# so the draft's context); an owner answer only decides whether a draft is needed.
+STAGES_FOR_CHANGE = {
+    "text": {"scout", "translate", "consult", "draft"},
+    "rating": {"scout", "draft"},
+    "owner_answer": {"draft"},
+}
+PARTS = ("text", "rating", "owner_answer")
+
+
+def _digest(value) -> str:
+    normalized = " ".join(str(value or "").split())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=6).hexdigest()
+
+
+def fingerprint(text, rating, owner_answer) -> str:
+    """
+    Compact content fingerprint, e.g. '3f9a0c1d2e4b.5.5f0e1a2b3c4d'. Each part is
+    kept separately so a change can be traced to the text, rating or owner answer.
+    """
+    try:
+        rating = int(rating or 0)
+    except (TypeError, ValueError):
+        rating = 0
+    return f"{_digest(text)}.{rating}.{_digest(owner_answer)}"
+
+
+def item_fingerprint(item: dict) -> str:
+    """Fingerprint of a raw DataForSEO review item."""
+    return fingerprint(item.get('review_text'), (item.get('rating') or {}).get('value'), item.get('owner_answer'))
+
+
+def row_fingerprint(row: dict) -> str:
+    """Fingerprint of a stored reviews row."""
+    return fingerprint(row.get('original_text'), row.get('rating'), row.get('owner_response'))
+
+
+def changed_parts(old: str, new: str) -> set:
+    """Which parts differ between two fingerprints; everything if `old` is unusable."""
+    old_parts, new_parts = (old or "").split("."), new.split(".")
+    if len(old_parts) != len(PARTS):
+        return set(PARTS)
+    return {part for part, a, b in zip(PARTS, old_parts, new_parts) if a != b}
+
+
+def stages_for(changes: set) -> set:
+    """Router stages to re-run for a set of changed parts."""
+    stages = set()
+    for part in changes:
+        stages |= STAGES_FOR_CHANGE[part]
+    return stages
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+
+def parse_review_time(value):
+    """
+    Parses a review timestamp. DataForSEO returns '2026-01-19 04:06:28 +00:00',
+    Postgres returns ISO 8601; both come back as aware datetimes (or None).
+    """
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S %z")
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def review_id_of(item: dict):
+    return item.get('id_review') or item.get('review_id')
+
+
+def newest_review(items: list[dict]):
+    """Returns (timestamp_string, review_id) of the newest item, or (None, None)."""
+    newest, newest_time = None, None
+    for item in items:
+        item_time = parse_review_time(item.get('timestamp'))
+        if item_time and (newest_time is None or item_time > newest_time):
+            newest, newest_time = item, item_time
+    if newest is None:
+        return None, None
+    return newest.get('timestamp'), review_id_of(newest)
+
+
+def reached_high_water(items: list[dict], state: dict) -> bool:
+    """
+    True if the fetched page overlaps what we already ingested, i.e. it contains
+    the last seen review or anything at/older than the last seen review date.
+    If it doesn't, there may be more new reviews beyond the requested depth.
+    """
+    last_id = state.get('last_review_id')
+    last_time = parse_review_time(state.get('last_review_date'))
+    for item in items:
+        if last_id and review_id_of(item) == last_id:
+            return True
+        item_time = parse_review_time(item.get('timestamp'))
+        if last_time and item_time and item_time <= last_time:
+            return True
+    return False
@@ -0,0 +1,66 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, limits this process only
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+DEFAULT_DIR = os.path.join(BASE_DIR, '.cache')
+
+
+class SharedPollLimiter:
+    """
+    Sliding-window call limit shared by every process on this host that uses
+    the same account (e.g. several --worker replicas). Call times live in a
+    small JSON file keyed on the account login, read and rewritten under an
+    exclusive file lock, so each process sees the others' calls.
+
+    Processes on other hosts can't see the file: give each host its share of
+    the account budget instead.
+    """
+
+    def __init__(self, account: str, calls_per_minute: int, path: str = None):
+        self.calls = max(1, calls_per_minute)
+        key = hashlib.sha1((account or "").encode('utf-8')).hexdigest()[:12]
+        self.path = path or os.path.join(DEFAULT_DIR, f"tasks_ready-{key}.json")
+        self._lock = threading.Lock()
+
+    def acquire(self, stop_event=None) -> bool:
+        """Waits for a free slot and takes it. Returns False if `stop_event` was set first."""
+        while True:
+            wait = self._reserve()
+            if wait <= 0:
+                return True
+            if stop_event is None:
+                time.sleep(wait)
+            elif stop_event.wait(wait):
+                return False
+
+    def _reserve(self) -> float:
+        """Takes a slot if one is free (returns 0), else returns seconds until the oldest call expires."""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a+') as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                try:
+                    calls = json.loads(f.read() or "[]")
+                except ValueError:
+                    calls = []
+                # Wall-clock time, since the other processes' monotonic clocks aren't comparable
+                now = time.time()
+                calls = [t for t in calls if t > now - 60]
+                if len(calls) >= self.calls:
+                    return max(min(calls) + 60 - now, 0.01)
+                calls.append(now)
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(calls))
+                f.flush()
+                return 0.0
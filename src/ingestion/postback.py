@@ -0,0 +1,180 @@
+import json
+import time
+import zlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# pending_tasks.status values (see sql/005_pending_tasks.sql)
+POSTED = "POSTED"      # task accepted, nothing heard back yet
+READY = "READY"        # pingback arrived, result still on DataForSEO
+RECEIVED = "RECEIVED"  # full result arrived and is in the archive
+
+# A FULL_DEPTH task result is a few MB of JSON; anything far bigger is not from DataForSEO
+MAX_BODY_BYTES = 20 * 1024 * 1024
+MAX_DECOMPRESSED_BYTES = 100 * 1024 * 1024
+
+
+class PostbackReceiver:
+    """
+    Small local HTTP endpoint that DataForSEO calls when a task finishes.
+
+    POST /postback carries the full task_get response (often gzip-compressed);
+    GET /pingback only says the task is ready. Either way the task is marked in
+    the persisted pending_tasks table (and postback bodies are archived) before
+    answering 200, so a result that lands while nothing is waiting for it, or
+    after a restart, is still picked up by the next fetch of that CID.
+
+    Reports must carry the shared token and name a task we posted; the body is
+    archived under the CID recorded for that task, never the one in the request.
+    """
+
+    def __init__(self, store, archive=None, host: str = "127.0.0.1", port: int = 8787,
+                 public_url: str = None, token: str = None, mode: str = "postback", timeout: float = 600):
+        if not token:
+            raise ValueError("POSTBACK_TOKEN must be set to receive DataForSEO reports")
+        self.store = store
+        self.archive = archive
+        self.host = host
+        self.port = port
+        self.public_url = (public_url or f"http://{host}:{port}").rstrip("/")
+        self.token = token
+        self.mode = mode
+        # How long a fetch waits for reports before leaving them to the next cycle
+        self.timeout = timeout
+        self._arrived = {}  # task_id -> (arrived_at, response dict or None for a pingback)
+        self._cond = threading.Condition()
+        self._server = None
+
+    def start(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                receiver._handle(self, "/postback")
+
+            def do_GET(self):
+                receiver._handle(self, "/pingback")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="postback-receiver", daemon=True).start()
+        print(f"Postback receiver listening on {self.host}:{self.port} ({self.mode} mode)")
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def task_fields(self) -> dict:
+        """Extra task_post fields telling DataForSEO where to report back ($id/$tag are filled in by them)."""
+        query = f"id=$id&tag=$tag&token={self.token}"
+        if self.mode == "pingback":
+            return {"pingback_url": f"{self.public_url}/pingback?{query}"}
+        return {"postback_url": f"{self.public_url}/postback?{query}"}
+
+    def expect(self, tasks: list[dict]):
+        """Persists freshly posted tasks ({task_id, cid, depth, sort_by}) as POSTED."""
+        self.store.add_pending_tasks([dict(task, status=POSTED, posted_at="now()") for task in tasks])
+
+    def pending_for(self, cids: list[str]) -> list[dict]:
+        """Tasks posted earlier (possibly by a previous run) for these CIDs that were never consumed."""
+        return self.store.get_pending_tasks(cids)
+
+    def consumed(self, task_ids: list[str]):
+        with self._cond:
+            for task_id in task_ids:
+                self._arrived.pop(task_id, None)
+        self.store.delete_pending_tasks(task_ids)
+
+    def wait(self, task_ids, timeout: float, stop_event=None):
+        """
+        Yields (task_id, response) as reports for `task_ids` arrive; response is
+        None for a pingback. Stops at `timeout` or when stop_event is set.
+        """
+        waiting = set(task_ids)
+        deadline = time.monotonic() + timeout
+        while waiting and time.monotonic() < deadline:
+            if stop_event is not None and stop_event.is_set():
+                return
+            with self._cond:
+                arrived = [task_id for task_id in waiting if task_id in self._arrived]
+                if not arrived:
+                    self._cond.wait(min(0.5, max(deadline - time.monotonic(), 0)))
+                    continue
+                ready = [(task_id, self._arrived[task_id][1]) for task_id in arrived]
+            for task_id, response in ready:
+                waiting.discard(task_id)
+                yield task_id, response
+
+    def _handle(self, request, expected_path: str):
+        url = urlparse(request.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path != expected_path or params.get("token") != self.token:
+            self._reply(request, 404)
+            return
+
+        try:
+            task_id, response = params.get("id"), None
+            if request.command == "POST":
+                length = int(request.headers.get("Content-Length") or 0)
+                if length > MAX_BODY_BYTES:
+                    self._reply(request, 413)
+                    return
+                body = request.rfile.read(length)
+                # Postbacks are gzip-compressed unless the account turned it off
+                if request.headers.get("Content-Encoding") == "gzip" or body[:2] == b"\x1f\x8b":
+                    body = self._gunzip(body)
+                    if body is None:
+                        self._reply(request, 413)
+                        return
+                response = json.loads(body)
+                task = (response.get("tasks") or [{}])[0]
+                task_id = task.get("id") or task_id
+            if not task_id:
+                raise ValueError("report without a task id")
+
+            # Only tasks we posted are accepted, and they are filed under the CID we posted them for
+            pending = self.store.get_pending_task(task_id)
+            if pending is None:
+                self._reply(request, 404)
+                return
+
+            # Durable first: archive the body and mark the task, then acknowledge
+            if response is not None and self.archive:
+                self.archive.record(task_id, pending['cid'], response)
+            self.store.mark_pending_tasks([task_id], RECEIVED if response is not None and self.archive else READY)
+        except Exception as e:
+            print(f"Error handling DataForSEO report: {e}")
+            self._reply(request, 500)
+            return
+
+        with self._cond:
+            now = time.monotonic()
+            # Reports nobody picked up are still in pending_tasks/the archive; don't hold them in memory
+            for stale in [t for t, (arrived_at, _) in self._arrived.items() if now - arrived_at > 2 * self.timeout]:
+                del self._arrived[stale]
+            self._arrived[task_id] = (now, response)
+            self._cond.notify_all()
+        request.send_response(200)
+        request.send_header("Content-Type", "application/json")
+        request.end_headers()
+        request.wfile.write(b'{"status":"ok"}')
+
+    @staticmethod
+    def _reply(request, status: int):
+        request.send_response(status)
+        request.end_headers()
+
+    @staticmethod
+    def _gunzip(body: bytes):
+        """Decompresses a gzip body, or returns None if it would exceed MAX_DECOMPRESSED_BYTES."""
+        decompressor = zlib.decompressobj(wbits=31)
+        data = decompressor.decompress(body, MAX_DECOMPRESSED_BYTES)
+        if decompressor.unconsumed_tail:
+            return None
+        return data
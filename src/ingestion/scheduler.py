@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import heapq
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+from src.ingestion.incremental import parse_review_time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+DEFAULT_PATH = os.path.join(BASE_DIR, '.cache', 'scheduler.json')
+# Weight of the newest observation in the arrival-rate EWMA
+RATE_ALPHA = 0.3
+BUDGET_WINDOW = 3600  # seconds
+
+
+class SalonScheduler:
+    """
+    Decides when each salon is fetched next.
+
+    Keeps a heap of next-due times per CID. Each salon's review arrival rate
+    (reviews/second) is an EWMA of what every fetch found, and the next fetch is
+    scheduled when about `target_reviews` new reviews are expected, clamped to
+    [min_interval, max_interval]. A rolling budget caps DataForSEO tasks per
+    hour; when it runs out, the most overdue salons go first once it refills.
+    """
+
+    def __init__(self, min_interval: float, max_interval: float, tasks_per_hour: int,
+                 target_reviews: float = 1, path: str = None):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.tasks_per_hour = tasks_per_hour
+        self.target_reviews = target_reviews
+        self.path = path or DEFAULT_PATH
+        self._lock = threading.Lock()
+        self._spent = deque()  # (time, tasks)
+        self._state = self._load()
+        self._heap = [(s['next_due'], cid) for cid, s in self._state.items()]
+        heapq.heapify(self._heap)
+
+    def sync(self, cids: list[str]):
+        """Tracks exactly these CIDs; new ones are due immediately."""
+        with self._lock:
+            wanted = set(cids)
+            for cid in cids:
+                if cid not in self._state:
+                    self._state[cid] = {"rate": None, "newest": None, "last_fetch": None, "next_due": 0}
+                    heapq.heappush(self._heap, (0, cid))
+            for cid in list(self._state):
+                if cid not in wanted:
+                    del self._state[cid]
+
+    def due(self, now: float = None) -> list[str]:
+        """Pops the CIDs that are due, most overdue first, up to the remaining task budget."""
+        now = now or time.time()
+        with self._lock:
+            remaining = self._remaining(now)
+            due = []
+            while self._heap and len(due) < remaining:
+                next_due, cid = self._heap[0]
+                if next_due > now:
+                    break
+                heapq.heappop(self._heap)
+                state = self._state.get(cid)
+                # Stale heap entries (salon removed or rescheduled) are skipped
+                if state is None or state['next_due'] != next_due:
+                    continue
+                due.append(cid)
+                # Provisional retry in case the fetch never reports back
+                self._schedule(cid, now + self.min_interval)
+            return due
+
+    def spend(self, tasks: int, now: float = None):
+        """Records DataForSEO tasks posted against the hourly budget."""
+        if tasks > 0:
+            with self._lock:
+                self._spent.append((now or time.time(), tasks))
+
+    def observe(self, cid: str, items: list[dict], ok: bool = True, now: float = None):
+        """
+        Updates the salon's arrival rate from a fetch and schedules its next one.
+        A failed fetch is retried after min_interval without touching the rate.
+        """
+        now = now or time.time()
+        with self._lock:
+            state = self._state.get(cid)
+            if state is None:
+                return
+            if not ok:
+                self._schedule(cid, now + self.min_interval)
+                return
+
+            times = [t.timestamp() for t in (parse_review_time(i.get('timestamp')) for i in items) if t]
+            if state['rate'] is None:
+                # First sight: estimate from the span the fetched reviews cover
+                state['rate'] = len(times) / max(now - min(times), 1) if times else 0.0
+            else:
+                new = sum(1 for t in times if state['newest'] is None or t > state['newest'])
+                observed = new / max(now - state['last_fetch'], 1)
+                state['rate'] = RATE_ALPHA * observed + (1 - RATE_ALPHA) * state['rate']
+            if times:
+                state['newest'] = max(times + [state['newest'] or 0])
+            state['last_fetch'] = now
+            self._schedule(cid, now + self.interval(state['rate']))
+
+    def interval(self, rate: float) -> float:
+        if not rate:
+            return self.max_interval
+        return min(max(self.target_reviews / rate, self.min_interval), self.max_interval)
+
+    def seconds_until_next(self, now: float = None) -> float:
+        """How long the caller can sleep before something is due (or budget frees up)."""
+        now = now or time.time()
+        with self._lock:
+            while self._heap and self._state.get(self._heap[0][1], {}).get('next_due') != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            wait = self._heap[0][0] - now if self._heap else self.max_interval
+            if self._remaining(now) <= 0 and self._spent:
+                wait = max(wait, self._spent[0][0] + BUDGET_WINDOW - now)
+            return max(wait, 0)
+
+    def save(self):
+        with self._lock:
+            data = dict(self._state)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def describe(self, cid: str) -> str:
+        state = self._state.get(cid) or {}
+        rate = (state.get('rate') or 0) * 86400
+        due = datetime.fromtimestamp(state.get('next_due') or 0, timezone.utc)
+        return f"{rate:.2f} reviews/day, next fetch {due:%Y-%m-%d %H:%M} UTC"
+
+    def _schedule(self, cid: str, when: float):
+        self._state[cid]['next_due'] = when
+        heapq.heappush(self._heap, (when, cid))
+
+    def _remaining(self, now: float) -> int:
+        while self._spent and self._spent[0][0] <= now - BUDGET_WINDOW:
+            self._spent.popleft()
+        return self.tasks_per_hour - sum(tasks for _, tasks in self._spent)
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
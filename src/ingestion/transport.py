@@ -0,0 +1,100 @@
+import random
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# Statuses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# A non-idempotent request may already have been processed after a 5xx; a 429 was rejected
+UNSENT_RETRY_STATUSES = {429}
+
+
+class HttpTransport:
+    """
+    Shared HTTP transport: one keep-alive session with a connection pool,
+    a timeout on every request, and retries with jittered exponential backoff
+    on connection errors, 429 and 5xx responses.
+
+    Non-idempotent requests (POSTs by default, e.g. a paid task_post) are only
+    retried when they cannot have been processed: the connection was never
+    made, or the server answered 429. A read timeout or 5xx may mean the
+    tasks were already created and billed, so those are not retried.
+    """
+
+    def __init__(self, headers: dict = None, connect_timeout: float = 5, read_timeout: float = 30,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 20,
+                 pool_size: int = 10):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        # Retries are handled below so they can honour Retry-After and add jitter
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method: str, url: str, idempotent: bool = None, max_retries: int = None,
+                **kwargs) -> requests.Response:
+        """
+        Sends a request, retrying transient failures. Returns the last response
+        (even if it is still a 429/5xx) or raises the last connection error.
+        `idempotent` defaults to True for GET/HEAD and False otherwise.
+        `max_retries` overrides the transport's default for this request.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in ("GET", "HEAD")
+        if max_retries is None:
+            max_retries = self.max_retries
+        retry_statuses = RETRY_STATUSES if idempotent else UNSENT_RETRY_STATUSES
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(max_retries + 1):
+            last_attempt = attempt == max_retries
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last_attempt or not (idempotent or self._not_sent(e)):
+                    raise
+                delay = self._backoff(attempt)
+                print(f"DEBUG: {method} {url} failed ({e}). Retrying in {delay:.1f}s...")
+                time.sleep(delay)
+                continue
+
+            if response.status_code not in retry_statuses or last_attempt:
+                return response
+
+            delay = self._retry_after(response) or self._backoff(attempt)
+            print(f"DEBUG: {method} {url} returned {response.status_code}. Retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+    def close(self):
+        self.session.close()
+
+    @staticmethod
+    def _not_sent(error: Exception) -> bool:
+        """True when the request never reached the server (connect timeout, refused, DNS)."""
+        if isinstance(error, requests.ConnectTimeout):
+            return True
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: spreads retries out so parallel callers don't stampede
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _retry_after(self, response: requests.Response):
+        value = response.headers.get("Retry-After")
+        try:
+            return min(self.backoff_max, float(value)) if value else None
+        except ValueError:
+            return None
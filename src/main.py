@@ -1,40 +1,208 @@
 import time
 import os
 import sys
+import signal
+import socket
+import threading
 
 # Add project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # imports configuration variables (like SALON_CID, GEMINI_API_KEY, etc.)
 from config import settings
-from src.db.supabase_client import db
+from src.db.store import get_store
+from src.db.batch_writer import BatchWriter
+from src.db.payloads import PAYLOAD_TABLE, payload_row
 from src.ingestion.dataforseo import DataForSEOClient
+from src.ingestion.incremental import newest_review, reached_high_water
+from src.ingestion.fingerprint import item_fingerprint, row_fingerprint, changed_parts, stages_for
+from src.ingestion.discovery_cache import DiscoveryCache
+from src.ingestion.scheduler import SalonScheduler
+from src.ingestion.postback import PostbackReceiver
+from src.pipeline import Pipeline
 from src.processing.router import IntelligenceRouter
+from src.processing.history import HistoryProvider
+from src.metrics import metrics, instrument_services
 
 # Configuration
 CHECK_INTERVAL = 3600  # 1 hour
+MAX_ERROR_BACKOFF = 900  # seconds
+# Salons buffered between pipeline stages (each can hold up to FULL_DEPTH reviews)
+PIPELINE_QUEUE_SIZE = 4
 
 class SimpleIngestionAgent:
-    def __init__(self):
+    def __init__(self, dfs_client=None, router=None, store=None):
         print("Initializing Simple Ingestion Agent...")
-        self.dfs_client = DataForSEOClient()
-        self.router = IntelligenceRouter()
+        self.db = store or get_store()
+        self.dfs_client = dfs_client or DataForSEOClient()
+        self.router = router or IntelligenceRouter()
+        if settings.POSTBACK_ENABLED and self.dfs_client.receiver is None:
+            # DataForSEO reports finished tasks here instead of being polled
+            self.dfs_client.receiver = PostbackReceiver(
+                self.db, self.dfs_client.archive,
+                host=settings.POSTBACK_HOST,
+                port=settings.POSTBACK_PORT,
+                public_url=settings.POSTBACK_PUBLIC_URL,
+                token=settings.POSTBACK_TOKEN,
+                mode=settings.POSTBACK_MODE,
+                timeout=settings.POSTBACK_TIMEOUT
+            ).start()
+        instrument_services(self.dfs_client, self.router, self.db)
+        if settings.METRICS_EXPORT_INTERVAL > 0:
+            metrics.start_exporter(settings.METRICS_EXPORT_INTERVAL, settings.METRICS_PROMETHEUS_PATH, settings.METRICS_JSON_PATH)
+        # review_id -> content fingerprint of what is in the DB. Lives as long as
+        # the agent, so in daemon mode an unchanged salon is deduplicated without
+        # touching the DB.
+        self.known_fingerprints = {}
+        self.writer = BatchWriter(self.db)
+        # Raw items and analysis traces go to the compressed side table
+        self.payload_writer = BatchWriter(self.db, table=PAYLOAD_TABLE)
+        # Fingerprint backfills for legacy rows only update existing reviews, never insert
+        self.update_writer = BatchWriter(self.db, write=self.db.update_reviews)
+        # (cid, payload row) pairs that failed to save, queued again next cycle
+        self.payload_retries = []
+        self.history = HistoryProvider(self.db, limit=5)
+        # When set, the next cycle ignores high-water marks and sweeps FULL_DEPTH
+        self.resync = False
+        # CIDs the last ingest_targets call could not fetch or fully save
+        self.failed_cids = set()
+        self.discovery_cache = DiscoveryCache(ttl_seconds=settings.DISCOVERY_CACHE_TTL_HOURS * 3600)
+        # When set, the next discovery ignores the cache and runs a live search
+        self.refresh_discovery = False
 
     def run(self):
+        """
+        Daemon mode: each salon is fetched when the scheduler says it is due,
+        based on how often it gets new reviews, within the hourly task budget.
+        """
         print("Ingestion Agent Started. Press Ctrl+C to stop.")
+        scheduler = SalonScheduler(
+            min_interval=settings.SCHEDULER_MIN_INTERVAL,
+            max_interval=settings.SCHEDULER_MAX_INTERVAL,
+            tasks_per_hour=settings.DATAFORSEO_TASKS_PER_HOUR,
+            target_reviews=settings.SCHEDULER_TARGET_REVIEWS
+        )
+        errors = 0
         while True:
             try:
-                self.ingest_reviews()
-                print(f"Sleeping for {CHECK_INTERVAL} seconds...")
-                time.sleep(CHECK_INTERVAL)
+                targets = self.resolve_targets()
+                # An empty target list (e.g. discovery down) must not wipe the schedule
+                if targets:
+                    scheduler.sync([cid for cid, _ in targets])
+
+                due = set(scheduler.due())
+                if due:
+                    print(f"{len(due)} of {len(targets)} salons due.")
+                    before = self.dfs_client.tasks_posted
+                    fetched = self.ingest_targets([(cid, name) for cid, name in targets if cid in due])
+                    scheduler.spend(self.dfs_client.tasks_posted - before)
+                    for cid in due:
+                        items, title = fetched.get(cid, ([], None))
+                        # Nothing at all back (not even a title) means the task failed; salons
+                        # whose reviews failed to analyze or save are retried soon as well
+                        ok = bool(items or title) and cid not in self.failed_cids
+                        scheduler.observe(cid, items, ok=ok)
+                        print(f" - {cid}: {scheduler.describe(cid)}")
+                    scheduler.save()
+                    metrics.print_summary()
+                    metrics.export(settings.METRICS_PROMETHEUS_PATH, settings.METRICS_JSON_PATH)
+                errors = 0
+
+                # Wake up at least hourly so newly discovered salons get picked up
+                wait = min(scheduler.seconds_until_next(), CHECK_INTERVAL)
+                print(f"Sleeping for {int(wait)} seconds...")
+                time.sleep(wait)
+            except KeyboardInterrupt:
+                print("Stopping...")
+                self.writer.close()
+                self.payload_writer.close()
+                self.update_writer.close()
+                break
+            except Exception as e:
+                errors += 1
+                wait = min(60 * 2 ** (errors - 1), MAX_ERROR_BACKOFF)
+                print(f"Error: {e} (retrying in {wait}s)")
+                time.sleep(wait)
+
+    def run_worker(self, once=False):
+        """
+        Worker mode: many processes share the salons table. Each one leases a
+        batch of due salons, ingests them, then releases the leases, so no CID
+        is fetched (or billed) twice in the same interval.
+        """
+        worker_id = settings.WORKER_ID or f"{socket.gethostname()}-{os.getpid()}"
+        print(f"Worker {worker_id} started. Press Ctrl+C to stop.")
+        while True:
+            try:
+                claimed = self.db.claim_salons(
+                    worker_id,
+                    settings.WORKER_BATCH_SIZE,
+                    settings.WORKER_LEASE_SECONDS,
+                    min_interval_seconds=CHECK_INTERVAL
+                )
+                all_failed = False
+                if claimed:
+                    print(f"Claimed {len(claimed)} salons.")
+                    all_failed = not self.process_claimed(worker_id, claimed)
+                    metrics.print_summary()
+                    metrics.export(settings.METRICS_PROMETHEUS_PATH, settings.METRICS_JSON_PATH)
+                if once:
+                    break
+                # Every salon failing usually means an outage (e.g. Gemini), so don't spin on the next batch
+                if not claimed or all_failed:
+                    time.sleep(settings.WORKER_POLL_INTERVAL)
             except KeyboardInterrupt:
                 print("Stopping...")
                 break
             except Exception as e:
                 print(f"Error: {e}")
                 time.sleep(60)
+        self.writer.close()
+        self.payload_writer.close()
+        self.update_writer.close()
+
+    def process_claimed(self, worker_id, claimed):
+        """Ingests the leased salons and releases them. Returns how many were processed."""
+        cids = [salon['cid'] for salon in claimed]
+
+        # Keep the leases alive while a long fetch/analysis is running
+        done = threading.Event()
+
+        def heartbeat():
+            while not done.wait(settings.WORKER_LEASE_SECONDS / 3):
+                self.db.renew_salon_leases(worker_id, cids, settings.WORKER_LEASE_SECONDS)
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+        try:
+            self.ingest_targets([(salon['cid'], salon.get('name') or "Unknown Salon") for salon in claimed])
+        finally:
+            done.set()
+            # Failed (or never reached) salons are handed back for a retry after a backoff
+            failed = [cid for cid in cids if cid in self.failed_cids]
+            processed = [cid for cid in cids if cid not in self.failed_cids]
+            if processed:
+                self.db.release_salons(worker_id, processed)
+            if failed:
+                print(f"Releasing {len(failed)} salons that failed; they will be retried after a backoff.")
+                self.db.release_salons(worker_id, failed, processed=False,
+                                       retry_seconds=settings.WORKER_RETRY_SECONDS,
+                                       max_retry_seconds=settings.WORKER_MAX_RETRY_SECONDS)
+        return len(processed)
 
     def ingest_reviews(self):
+        target_cids = self.resolve_targets()
+        if not target_cids:
+            return
+
+        # Fetch and ingest all targets
+        self.ingest_targets(target_cids)
+
+        # Per-cycle latency, error and token summary
+        metrics.print_summary()
+        metrics.export(settings.METRICS_PROMETHEUS_PATH, settings.METRICS_JSON_PATH)
+
+    def resolve_targets(self):
+        """Returns [(cid, salon_name)] from SALON_CID or a (cached) discovery search."""
         target_cids = []
 
         # 1. Targeted Mode (Single CID)
@@ -43,7 +211,7 @@ class SimpleIngestionAgent:
         # 2. Discovery Mode (Search Query)
         elif settings.SEARCH_QUERY:
             print(f"Running Discovery: '{settings.SEARCH_QUERY}'")
-            businesses = self.dfs_client.search_businesses(settings.SEARCH_QUERY)
+            businesses = self.discover(settings.SEARCH_QUERY)
             print(f"Found {len(businesses)} businesses.")
             for biz in businesses:
                 cid = biz.get('cid')
@@ -54,37 +222,251 @@ class SimpleIngestionAgent:
         
         else:
             print("Error: No SEARCH_QUERY or SALON_CID set.")
-            return
 
-        # 3. Ingest All Targets
-        for cid, salon_name in target_cids:
-            self.process_cid(cid, salon_name)
+        return target_cids
 
-    def process_cid(self, cid, salon_name):
-        print(f"Fetching reviews for {salon_name} ({cid})...")
-        reviews, fetched_name = self.dfs_client.fetch_reviews(cid, depth=700)
-        
+    def discover(self, query, location_code=2840):
+        """
+        Returns the businesses for a search query, from the discovery cache when
+        fresh, otherwise from a live search. Falls back to the stale cache or the
+        salons table if the live search fails.
+        """
+        if not self.refresh_discovery:
+            cached = self.discovery_cache.get(query, location_code)
+            if cached is not None:
+                print("Using cached discovery results.")
+                return cached
+        self.refresh_discovery = False
+
+        businesses = self.dfs_client.search_businesses(query, location_code)
+        if isinstance(businesses, list) and businesses:
+            self.discovery_cache.set(query, location_code, businesses)
+            try:
+                self.db.upsert_salons([{
+                    "cid": biz['cid'],
+                    "name": biz.get('title'),
+                    "search_query": query,
+                    "address": biz.get('address'),
+                    "rating": (biz.get('rating') or {}).get('value'),
+                    "last_seen_at": "now()"
+                } for biz in businesses if biz.get('cid')])
+            except Exception as e:
+                print(f"Could not save salons: {e}")
+            return businesses
+
+        print("Live discovery failed, falling back to known salons.")
+        stale = self.discovery_cache.get(query, location_code, allow_stale=True)
+        if stale:
+            return stale
+        return [{"cid": s['cid'], "title": s.get('name')} for s in self.db.get_salons(query)]
+
+    def ingest_targets(self, target_cids):
+        """
+        Fetches new reviews for every (cid, salon_name) target, analyzes and saves them.
+
+        Runs as a fetch -> analyze -> persist pipeline over bounded queues: a salon
+        is analyzed as soon as its task finishes while other tasks are still
+        queued, and its rows are saved while the next salon is analyzed. Ctrl+C or
+        SIGTERM stops fetching, drains the salons already in flight and saves their
+        high-water marks before re-raising.
+        Returns what was fetched, {cid: (items, title)}; the CIDs that failed are
+        left in self.failed_cids.
+        """
+        cids = [cid for cid, _ in target_cids]
+        self.failed_cids = set(cids)
+
+        # Resolve placeholder names from the salons table instead of waiting for a fetch
+        unnamed = [cid for cid, name in target_cids if self._is_placeholder_name(name)]
+        if unnamed:
+            names = self.db.get_salon_names(unnamed)
+            target_cids = [(cid, names.get(cid, name)) for cid, name in target_cids]
+        try:
+            states = {} if self.resync else self.db.get_ingestion_states(cids)
+        except Exception as e:
+            # Treating every salon as unseen would turn one DB hiccup into FULL_DEPTH
+            # paid fetches and reset last_full_sync_at, so wait for the next cycle
+            print(f"Skipping this cycle, could not load ingestion state: {e}")
+            return {}
+        self.resync = False
+
+        salon_names = dict(target_cids)
+        fetched = {}
+        new_states = []
+        ok_cids = set()
+        # review_id -> cid for every payload queued this cycle
+        payload_cids = {}
+        # Payload rows are self-contained, so earlier failures are simply written again
+        for cid, row in self.payload_retries:
+            payload_cids[row['review_id']] = cid
+            self.payload_writer.add(row)
+        self.payload_retries = []
+
+        pipeline = Pipeline(queue_size=PIPELINE_QUEUE_SIZE)
+        to_analyze = pipeline.queue()
+        to_persist = pipeline.queue()
+
+        def fetch(emit, stop_event):
+            for cid, items, title in self.iter_incremental(cids, states, stop_event):
+                fetched[cid] = (items, title)
+                emit((cid, items, title))
+
+        def analyze(item):
+            cid, items, title = item
+            # No state means a full sweep (first sight, --resync or a cleanup reset):
+            # check every review against the DB, since rows may have been deleted
+            return (cid, items) + self.analyze_reviews(cid, salon_names.get(cid), items, title,
+                                                       full_sweep=cid not in states)
+
+        def persist(item):
+            cid, items, records, analyses, raw_items, skipped = item
+            failures = skipped + self.save_reviews(cid, records, analyses, raw_items)
+            payload_cids.update((record['review_id'], cid) for record in records)
+
+            # Nothing at all back (not even a title) means the task failed
+            if failures == 0 and (items or fetched[cid][1]):
+                ok_cids.add(cid)
+
+            # Only advance the high-water mark once everything up to it is saved
+            last_date, last_id = newest_review(items)
+            if last_date and failures == 0:
+                state = {"cid": cid, "last_review_date": last_date, "last_review_id": last_id, "updated_at": "now()"}
+                if cid not in states:
+                    state["last_full_sync_at"] = "now()"
+                new_states.append(state)
+
+        pipeline.add_source(fetch, to_analyze, name="fetch")
+        pipeline.add_stage(analyze, to_analyze, to_persist, name="analyze")
+        pipeline.add_stage(persist, to_persist, name="persist")
+
+        interrupted = False
+        pipeline.start()
+        try:
+            pipeline.join()
+        except KeyboardInterrupt:
+            print("\nStopping: no new fetches, finishing salons already in flight...")
+            interrupted = True
+            pipeline.stop()
+            pipeline.join()
+
+        # Write out anything still buffered before the cycle ends
+        self.writer.flush()
+        self.payload_writer.flush()
+        self.update_writer.flush()
+        # Rows that failed to save should be picked up again next cycle
+        for row in self.writer.failed_rows:
+            self.known_fingerprints.pop(row.get('review_id'), None)
+        failed_cids = {row.get('cid') for row in self.writer.failed_rows}
+        self.writer.failed_rows.clear()
+        # A failed fingerprint backfill doesn't hold the salon back; the row is simply backfilled next time
+        for row in self.update_writer.failed_rows:
+            self.known_fingerprints.pop(row.get('review_id'), None)
+        self.update_writer.failed_rows.clear()
+        # A saved review whose payload failed is not re-analyzed, so its payload is retried as is
+        for row in self.payload_writer.failed_rows:
+            cid = payload_cids.get(row['review_id'])
+            failed_cids.add(cid)
+            self.payload_retries.append((cid, row))
+        self.payload_writer.failed_rows.clear()
+
+        ok_cids -= failed_cids
+        new_states = [st for st in new_states if st['cid'] not in failed_cids]
+        if new_states:
+            try:
+                self.db.save_ingestion_states(new_states)
+            except Exception as e:
+                print(f"Could not save ingestion state: {e}")
+                ok_cids -= {st['cid'] for st in new_states}
+        self.failed_cids = set(cids) - ok_cids
+
+        if interrupted:
+            raise KeyboardInterrupt
+        return fetched
+
+    def iter_incremental(self, cids, states, stop_event=None):
+        """
+        Fetches newest-first with a small depth for salons we've seen before, and
+        widens the depth only while every returned review is new. Salons without
+        state (first sight or resync) get one FULL_DEPTH sweep.
+
+        Yields (cid, items, title) as each salon's final fetch completes. A salon
+        that still needs widening when `stop_event` is set is left out, so its
+        high-water mark never skips past reviews that were not fetched.
+        """
+        depths = {cid: settings.INCREMENTAL_DEPTH if cid in states else settings.FULL_DEPTH for cid in cids}
+        batch = list(cids)
+        while batch:
+            widen = {}
+            for cid, items, title in self.dfs_client.iter_reviews_batch(
+                    batch, depth={cid: depths[cid] for cid in batch}, sort_by="newest", stop_event=stop_event):
+                depth = depths[cid]
+                # Fewer items than asked for means we already have the full list
+                if (cid in states and len(items) >= depth and depth < settings.FULL_DEPTH
+                        and not reached_high_water(items, states[cid])):
+                    if not (stop_event and stop_event.is_set()):
+                        widen[cid] = min(depth * 4, settings.FULL_DEPTH)
+                    continue
+                yield cid, items, title
+            if widen:
+                print(f"DEBUG: Widening fetch depth for {len(widen)} salons...")
+                depths.update(widen)
+            batch = list(widen)
+
+    def analyze_reviews(self, cid, salon_name, reviews, fetched_name=None, full_sweep=False):
+        """
+        Runs the reviews not yet in the DB through the router, and re-runs the
+        affected stages for stored reviews whose text, rating or owner answer changed.
+        With full_sweep, reviews already seen by this process are checked again too.
+        Returns (records, analyses, raw_items, skipped); `skipped` counts reviews
+        that could not even be checked against the DB.
+        """
         # Update name if available and we are using default/fallback
         if fetched_name:
-            if salon_name in ["Unknown Salon", "My Salon", "N/A"] or not salon_name:
+            if self._is_placeholder_name(salon_name):
                 print(f"Auto-detected Salon Name: {fetched_name}")
                 salon_name = fetched_name
+                try:
+                    self.db.upsert_salons([{"cid": cid, "name": fetched_name, "last_seen_at": "now()"}])
+                except Exception as e:
+                    print(f"Could not save salon name: {e}")
                 
         print(f"Found {len(reviews)} reviews for {salon_name}.")
 
+        # Bulk dedup: only ask the DB about reviews we haven't already seen in this form
+        candidates = {}
         for review in reviews:
             review_id = review.get('id_review') or review.get('review_id')
             if not review_id:
                 continue
+            fingerprint = item_fingerprint(review)
+            if full_sweep or self.known_fingerprints.get(review_id) != fingerprint:
+                candidates[review_id] = (review, fingerprint)
 
-            if db.review_exists(review_id):
-                # print(f"Skipping existing review {review_id}")
+        stored = {}
+        if candidates:
+            try:
+                stored = self.db.get_review_fingerprints(list(candidates))
+            except Exception as e:
+                print(f"Skipping {salon_name} this cycle, dedup lookup failed: {e}")
+                return [], [], {}, len(candidates)
+
+        new_records = []
+        changed = {}  # review_id -> stages to re-run
+        raw_items = {}
+        for review_id, (review, fingerprint) in candidates.items():
+            stored_fingerprint = stored.get(review_id)
+            legacy = isinstance(stored_fingerprint, dict)
+            if legacy:
+                # Saved before fingerprints existed: derive it from the stored columns
+                stored_fingerprint = row_fingerprint(stored_fingerprint)
+
+            if stored_fingerprint == fingerprint:
+                self.known_fingerprints[review_id] = fingerprint
+                if legacy:
+                    self.update_writer.add({"review_id": review_id, "content_fingerprint": fingerprint})
                 continue
-            
-            print(f"New review found: {review_id}")
-            
+
             # 1. Create Base Record
-            review_record = {
+            record = {
                 "review_id": review_id,
                 "cid": cid,
                 "salon_name": salon_name,
@@ -96,16 +478,67 @@ class SimpleIngestionAgent:
                 "review_date": review.get('timestamp'), # Accurate review time
                 "profile_image_url": review.get('profile_image_url', ''),
                 "author_review_count": review.get('reviews_count', 0),
-                "raw_data": review,
-                "created_at": "now()"
+                "content_fingerprint": fingerprint
             }
+            if review_id in stored:
+                changes = changed_parts(stored_fingerprint, fingerprint)
+                print(f"Changed review found: {review_id} ({', '.join(sorted(changes))})")
+                record["updated_at"] = "now()"
+                changed[review_id] = stages_for(changes)
+            else:
+                print(f"New review found: {review_id}")
+                record["created_at"] = "now()"
+            new_records.append(record)
+            raw_items[review_id] = review
+
+        if not new_records:
+            return [], [], {}, 0
+
+        # 2. AI Analysis (The Brain), several reviews in parallel
+        print(f" - Analyzing {len(new_records) - len(changed)} new and {len(changed)} changed reviews...")
+        # Recent drafts for this salon, kept in memory between reviews
+        history = self.history.get(cid)
+        stages, previous = self._reanalysis_plan(new_records, changed)
+        analyses = self.router.process_reviews(new_records, history, stages=stages, previous=previous)
+        return new_records, analyses, raw_items, 0
+
+    def _reanalysis_plan(self, records, changed):
+        """
+        Per-record (stages, previous analysis) for the router: changed reviews
+        reuse their stored analysis for the stages the change doesn't touch.
+        Returns (None, None) when there is nothing to reuse.
+        """
+        if not changed:
+            return None, None
+        try:
+            payloads = self.db.get_review_payloads(list(changed), fields=("analysis_json",))
+        except Exception as e:
+            print(f"Could not load previous analyses, re-running all stages: {e}")
+            payloads = {}
+
+        stages, previous = [], []
+        for record in records:
+            analysis = payloads.get(record['review_id'], {}).get('analysis_json')
+            # Fast-path results go back through the classifier, which may now reject them
+            if record['review_id'] not in changed or not analysis or analysis.get('fast_path'):
+                stages.append(None)
+                previous.append(None)
+            else:
+                stages.append(changed[record['review_id']])
+                previous.append(analysis)
+        if all(review_stages is None for review_stages in stages):
+            return None, None
+        return stages, previous
+
+    def save_reviews(self, cid, new_records, analyses, raw_items):
+        """Queues analyzed reviews for bulk save. Returns how many failed analysis."""
+        saved = 0
+        for review_record, analysis in zip(new_records, analyses):
+            if not analysis:
+                # Analysis failed (e.g. rate limited). Leave it unseen so the next cycle retries.
+                print(f" - Skipping {review_record['review_id']}, analysis failed.")
+                continue
 
-            # 2. AI Analysis (The Brain)
-            print(f" - Analyzing review...")
-            # Fetch recent history for context
-            history = db.get_recent_responses(limit=5)
-            analysis = self.router.process_review(review_record, history)
-            
             # 3. Merge Analysis
             review_record.update({
                 "sentiment_score": analysis.get('scout', {}).get('sentiment_score'),
@@ -113,26 +546,56 @@ class SimpleIngestionAgent:
                 "category": analysis.get('scout', {}).get('category'),
                 "vietnamese_summary": analysis.get('vietnamese_summary'),
                 "draft_response": analysis.get('draft_response'),
-                "analysis_json": analysis, # Store full trace
                 "status": "ANALYZED"
             })
             
-            # 4. Save to DB
-            db.insert_review(review_record)
-            print(f" - Saved.")
+            # 4. Queue for bulk save; the raw item and full trace go to the side table
+            self.writer.add(review_record)
+            self.payload_writer.add(payload_row(review_record['review_id'], raw_items[review_record['review_id']], analysis))
+            self.history.record(review_record.get('draft_response'), cid)
+            self.known_fingerprints[review_record['review_id']] = review_record['content_fingerprint']
+            saved += 1
+        if new_records:
+            print(f" - Queued {saved} reviews for save.")
+        return len(new_records) - saved
+
+    @staticmethod
+    def _is_placeholder_name(salon_name):
+        return salon_name in ["Unknown Salon", "My Salon", "N/A"] or not salon_name
 
 if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description="Salon Reputation Agent")
     parser.add_argument("--once", action="store_true", help="Run a single ingestion cycle and exit.")
+    parser.add_argument("--resync", action="store_true", help="Ignore high-water marks and sweep every salon at full depth.")
+    parser.add_argument("--worker", action="store_true", help="Claim salons from the shared salons table instead of SALON_CID/SEARCH_QUERY.")
+    parser.add_argument("--refresh-discovery", action="store_true", help="Ignore the discovery cache and run a live search.")
+    parser.add_argument("--replay", action="store_true", help="Serve reviews from the local DataForSEO archive instead of the API.")
     args = parser.parse_args()
 
-    agent = SimpleIngestionAgent()
+    # SIGTERM (e.g. from a container stop) drains like Ctrl+C
+    def _interrupt(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, _interrupt)
+
+    # Replay has to be known when the client is built, so it opens the archive
+    agent = SimpleIngestionAgent(dfs_client=DataForSEOClient(replay=True if args.replay else None))
+    agent.resync = args.resync
+    agent.refresh_discovery = args.refresh_discovery
     
-    if args.once:
+    if args.worker:
+        print("Running in WORKER mode...")
+        agent.run_worker(once=args.once)
+    elif args.once:
         print("Running in SINGLE-SHOT mode...")
-        agent.ingest_reviews()
+        try:
+            agent.ingest_reviews()
+        except KeyboardInterrupt:
+            print("Stopped early.")
+        agent.writer.close()
+        agent.payload_writer.close()
+        agent.update_writer.close()
         print("Cycle complete. Exiting.")
     else:
         print("Running in DAEMON mode (Press Ctrl+C to stop)...")
@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import asyncio
+import inspect
+import functools
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# Latency histogram buckets, in seconds
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Recent raw latencies kept per operation for percentiles
+SAMPLE_SIZE = 10000
+
+
+class _Op:
+    """Call count, error count and latency histogram for one operation."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def observe(self, seconds: float, error: bool):
+        self.samples.append(seconds)
+        self.calls += 1
+        self.errors += int(error)
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_seconds": round(self.total_seconds, 4),
+            "max_seconds": round(self.max_seconds, 4),
+            "p50_seconds": round(self.percentile(0.50), 4),
+            "p99_seconds": round(self.percentile(0.99), 4),
+            "buckets": dict(zip([str(b) for b in BUCKETS], self.buckets))
+        }
+
+
+class MetricsRegistry:
+    """
+    In-process metrics: latency histograms, call/error counts per operation,
+    plain counters, and Gemini token usage per stage. Exports Prometheus text
+    format or JSON snapshots, and prints a per-cycle summary.
+    """
+
+    def __init__(self):
+        self._ops = {}
+        self._counters = {}
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self._last_summary = {}
+
+    def observe(self, name: str, seconds: float, error: bool = False):
+        with self._lock:
+            self._ops.setdefault(name, _Op()).observe(seconds, error)
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def add_usage(self, stage: str, usage):
+        """Records Gemini usage_metadata (prompt/output/total token counts) for a stage."""
+        if usage is None:
+            return
+        counts = {
+            "prompt": getattr(usage, 'prompt_token_count', None) or 0,
+            "output": getattr(usage, 'candidates_token_count', None) or 0,
+            "total": getattr(usage, 'total_token_count', None) or 0
+        }
+        with self._lock:
+            stage_tokens = self._tokens.setdefault(stage, {"prompt": 0, "output": 0, "total": 0})
+            for kind, count in counts.items():
+                stage_tokens[kind] += count
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, error)
+
+    def reset(self):
+        with self._lock:
+            self._ops.clear()
+            self._counters.clear()
+            self._tokens.clear()
+            self._last_summary = {}
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "timestamp": time.time(),
+                "ops": {name: op.to_dict() for name, op in self._ops.items()},
+                "counters": dict(self._counters),
+                "tokens": {stage: dict(t) for stage, t in self._tokens.items()}
+            }
+
+    def to_prometheus(self, prefix: str = "salon_agent") -> str:
+        snap = self.snapshot()
+        lines = [
+            f"# TYPE {prefix}_call_latency_seconds histogram",
+        ]
+        for name, op in sorted(snap["ops"].items()):
+            cumulative = 0
+            for bound, count in op["buckets"].items():
+                cumulative += count
+                lines.append(f'{prefix}_call_latency_seconds_bucket{{op="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_call_latency_seconds_bucket{{op="{name}",le="+Inf"}} {op["calls"]}')
+            lines.append(f'{prefix}_call_latency_seconds_sum{{op="{name}"}} {op["total_seconds"]}')
+            lines.append(f'{prefix}_call_latency_seconds_count{{op="{name}"}} {op["calls"]}')
+        lines.append(f"# TYPE {prefix}_call_errors_total counter")
+        for name, op in sorted(snap["ops"].items()):
+            lines.append(f'{prefix}_call_errors_total{{op="{name}"}} {op["errors"]}')
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for name, value in sorted(snap["counters"].items()):
+            lines.append(f'{prefix}_events_total{{event="{name}"}} {value}')
+        lines.append(f"# TYPE {prefix}_gemini_tokens_total counter")
+        for stage, tokens in sorted(snap["tokens"].items()):
+            for kind, value in tokens.items():
+                lines.append(f'{prefix}_gemini_tokens_total{{stage="{stage}",kind="{kind}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, prometheus_path: str = None, json_path: str = None):
+        """Writes a Prometheus textfile and/or appends a JSON snapshot line."""
+        if prometheus_path:
+            tmp_path = prometheus_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, prometheus_path)
+        if json_path:
+            with open(json_path, 'a') as f:
+                f.write(json.dumps(self.snapshot()) + "\n")
+
+    def start_exporter(self, interval: float, prometheus_path: str = None, json_path: str = None):
+        """Exports every `interval` seconds from a daemon thread."""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.export(prometheus_path, json_path)
+                except Exception as e:
+                    print(f"Metrics export error: {e}")
+
+        threading.Thread(target=loop, name="metrics-exporter", daemon=True).start()
+
+    def print_summary(self, title: str = "Cycle metrics"):
+        """Prints calls, errors and latency per operation since the previous summary."""
+        snap = self.snapshot()
+        previous, self._last_summary = self._last_summary, snap
+
+        print(f"--- {title} ---")
+        prev_ops = previous.get("ops", {})
+        for name, op in sorted(snap["ops"].items()):
+            before = prev_ops.get(name, {"calls": 0, "errors": 0, "total_seconds": 0})
+            calls = op["calls"] - before["calls"]
+            if not calls:
+                continue
+            errors = op["errors"] - before["errors"]
+            avg_ms = (op["total_seconds"] - before["total_seconds"]) / calls * 1000
+            print(f"{name:<40} {calls:>6} calls  {errors:>4} errors  avg {avg_ms:8.1f} ms")
+
+        prev_counters = previous.get("counters", {})
+        for name, value in sorted(snap["counters"].items()):
+            delta = value - prev_counters.get(name, 0)
+            if delta:
+                print(f"{name:<40} {delta:>6}")
+
+        prev_tokens = previous.get("tokens", {})
+        for stage, tokens in sorted(snap["tokens"].items()):
+            before = prev_tokens.get(stage, {})
+            total = tokens["total"] - before.get("total", 0)
+            if total:
+                prompt = tokens["prompt"] - before.get("prompt", 0)
+                output = tokens["output"] - before.get("output", 0)
+                print(f"gemini tokens [{stage}]{'':<22} {total:>6} total  ({prompt} prompt, {output} output)")
+
+
+def instrument(obj, prefix: str, methods: list[str]):
+    """
+    Wraps the named methods of `obj` in place so each call records its latency
+    and whether it raised. Works for sync, async and generator methods; safe to
+    call twice. Generators are timed over the whole iteration, counting only the
+    time spent inside the generator (not in the consumer between items).
+    """
+    for method_name in methods:
+        method = getattr(obj, method_name, None)
+        if method is None or getattr(method, '_instrumented', False):
+            continue
+        name = f"{prefix}.{method_name.lstrip('_')}"
+
+        if asyncio.iscoroutinefunction(method):
+            async def wrapper(*args, _method=method, _name=name, **kwargs):
+                start = time.perf_counter()
+                error = False
+                try:
+                    return await _method(*args, **kwargs)
+                except BaseException:
+                    error = True
+                    raise
+                finally:
+                    metrics.observe(_name, time.perf_counter() - start, error)
+        elif inspect.isgeneratorfunction(method):
+            def wrapper(*args, _method=method, _name=name, **kwargs):
+                generator = _method(*args, **kwargs)
+                elapsed = 0.0
+                error = False
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            item = next(generator)
+                        except StopIteration as stop:
+                            return stop.value
+                        except BaseException:
+                            error = True
+                            raise
+                        finally:
+                            elapsed += time.perf_counter() - start
+                        yield item
+                finally:
+                    # Also runs when the consumer stops early (close() / GeneratorExit)
+                    generator.close()
+                    metrics.observe(_name, elapsed, error)
+        else:
+            def wrapper(*args, _method=method, _name=name, **kwargs):
+                with metrics.timer(_name):
+                    return _method(*args, **kwargs)
+
+        functools.update_wrapper(wrapper, method)
+        wrapper._instrumented = True
+        setattr(obj, method_name, wrapper)
+    return obj
+
+
+# Methods timed on each service by instrument_services
+DATAFORSEO_METHODS = [
+    "iter_reviews_batch", "fetch_reviews_batch", "search_businesses", "_post_tasks", "_get_task_response"
+]
+ROUTER_METHODS = ["process_review", "process_reviews", "process_review_async"]
+STORE_METHODS = [
+    "get_review_fingerprints", "get_review_payloads", "insert_review", "upsert_rows",
+    "update_reviews", "update_status", "get_recent_responses", "get_reviews", "iter_reviews", "count_reviews",
+    "get_ingestion_states", "save_ingestion_states", "get_salons", "get_salon_names", "upsert_salons",
+    "claim_salons", "renew_salon_leases", "release_salons",
+    "get_pending_tasks", "get_pending_task", "add_pending_tasks", "mark_pending_tasks", "delete_pending_tasks"
+]
+
+
+def instrument_services(dfs_client=None, router=None, db=None):
+    """
+    Times the DataForSEO, router and store entry points (Gemini stages are timed
+    inside the router). Store metrics are labeled by backend, e.g. "sqlite.upsert_rows".
+    """
+    if dfs_client is not None:
+        instrument(dfs_client, "dataforseo", DATAFORSEO_METHODS)
+        instrument(dfs_client.http, "dataforseo.http", ["request"])
+    if router is not None:
+        instrument(router, "router", ROUTER_METHODS)
+    if db is not None:
+        instrument(db, getattr(db, "backend", None) or "store", STORE_METHODS)
+
+
+# Global registry for easy access
+metrics = MetricsRegistry()
@@ -0,0 +1,90 @@
+from queue import Queue
+import threading
+
+# Sentinel passed down the queues once a stage has no more items
+STOP = object()
+
+
+class Pipeline:
+    """
+    Minimal threaded pipeline: a source feeds stages connected by bounded queues.
+
+    Each stage runs its function in one or more worker threads. Bounded queues
+    give backpressure, so a slow stage throttles the ones before it instead of
+    buffering everything in memory. `stop()` asks the source to stop producing;
+    items already queued still drain through every stage.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self.stop_event = threading.Event()
+        self._threads = []
+
+    def queue(self) -> Queue:
+        return Queue(maxsize=self.queue_size)
+
+    def add_source(self, produce, out_q: Queue, name: str = "source"):
+        """
+        `produce(emit, stop_event)` calls emit(item) for every item and should
+        return early once stop_event is set.
+        """
+        def run():
+            try:
+                produce(out_q.put, self.stop_event)
+            except Exception as e:
+                print(f"Pipeline {name} error: {e}")
+            finally:
+                out_q.put(STOP)
+
+        self._threads.append(threading.Thread(target=run, name=name, daemon=True))
+
+    def add_stage(self, handle, in_q: Queue, out_q: Queue = None,
+                  workers: int = 1, name: str = "stage"):
+        """
+        `handle(item)` is called for every item. Its return value is passed to
+        out_q (None is dropped). Errors are logged and the item is skipped.
+        """
+        remaining = [workers]
+        lock = threading.Lock()
+
+        def run():
+            while True:
+                item = in_q.get()
+                if item is STOP:
+                    # Let sibling workers see the sentinel too; the last one passes it on
+                    in_q.put(STOP)
+                    with lock:
+                        remaining[0] -= 1
+                        last = remaining[0] == 0
+                    if last and out_q is not None:
+                        out_q.put(STOP)
+                    return
+                try:
+                    result = handle(item)
+                except Exception as e:
+                    print(f"Pipeline {name} error: {e}")
+                    continue
+                if result is not None and out_q is not None:
+                    out_q.put(result)
+
+        for i in range(workers):
+            self._threads.append(threading.Thread(target=run, name=f"{name}-{i}", daemon=True))
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def join(self):
+        """Blocks until every stage has drained."""
+        for thread in self._threads:
+            # Join with a timeout so Ctrl+C still reaches the main thread
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+
+    def run(self):
+        """Starts every stage and blocks until everything has drained."""
+        self.start()
+        self.join()
+
+    def stop(self):
+        self.stop_event.set()
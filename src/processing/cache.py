@@ -0,0 +1,94 @@
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+DEFAULT_PATH = os.path.join(BASE_DIR, '.cache', 'llm_cache.sqlite3')
+
+
+class ResponseCache:
+    """
+    Persistent, content-addressed cache of Gemini responses, stored in a local SQLite file.
+
+    Entries are keyed on a hash of (model, stage, rendered prompt, request config), so
+    editing a template in config/prompts.json only invalidates the stages that use it.
+    Entries older than `ttl_seconds` are ignored, and the least recently used
+    entries are evicted once the cache grows past `max_entries`.
+    """
+
+    # How many writes between eviction passes
+    EVICT_EVERY = 100
+
+    def __init__(self, path: str = None, ttl_seconds: float = 30 * 86400, max_entries: int = 50000):
+        self.path = os.path.abspath(path or DEFAULT_PATH)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                stage TEXT,
+                response TEXT,
+                created_at REAL,
+                last_used REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, stage: str, prompt: str, config: dict = None) -> str:
+        material = json.dumps([model, stage, prompt, config], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str):
+        """Returns the cached response text, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, stage: str, response: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, stage, response, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, stage, response, now, now)
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._evict(now)
+
+    def _evict(self, now: float):
+        """Drops expired entries, then the least recently used ones above max_entries."""
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
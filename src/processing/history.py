@@ -0,0 +1,63 @@
+import time
+import threading
+from collections import deque
+from config import settings
+
+
+class HistoryProvider:
+    """
+    Rolling window of recent draft responses used to fill {context_history}.
+
+    Each scope (a CID, or None for the whole table) is loaded from the DB, then
+    kept current in memory as new drafts are produced. After `ttl` seconds the
+    scope is reloaded, so drafts written by other workers show up too.
+    """
+
+    def __init__(self, db, limit: int = 5, per_salon: bool = None, ttl: float = None):
+        self.db = db
+        self.limit = limit
+        self.per_salon = settings.HISTORY_PER_SALON if per_salon is None else per_salon
+        self.ttl = settings.HISTORY_TTL if ttl is None else ttl
+        self._buffers = {}
+        self._loaded_at = {}
+        # Drafts recorded since the scope was last loaded; they may not be flushed
+        # to the DB yet, so a reload keeps the ones it doesn't see
+        self._recorded = {}
+        self._lock = threading.Lock()
+
+    def get(self, cid: str = None) -> list[str]:
+        """Returns the recent drafts for this scope, newest first."""
+        return list(self._buffer(cid))
+
+    def record(self, draft: str, cid: str = None):
+        """Adds a freshly produced draft to the window."""
+        if not draft:
+            return
+        scope = cid if self.per_salon else None
+        self._buffer(cid)
+        with self._lock:
+            self._buffers[scope].appendleft(draft)
+            self._recorded.setdefault(scope, deque(maxlen=self.limit)).append(draft)
+
+    def _buffer(self, cid: str = None) -> deque:
+        scope = cid if self.per_salon else None
+        with self._lock:
+            buffer = self._buffers.get(scope)
+            fresh = not self.ttl or time.monotonic() - self._loaded_at.get(scope, 0) < self.ttl
+        if buffer is not None and fresh:
+            return buffer
+
+        # Loaded outside the lock; a duplicate load on a race is harmless
+        drafts = self.db.get_recent_responses(limit=self.limit, cid=scope)
+        with self._lock:
+            self._loaded_at[scope] = time.monotonic()
+            if buffer is not None and not drafts:
+                # A failed reload returns nothing; keep what we had
+                return self._buffers[scope]
+            unsaved = [d for d in self._recorded.pop(scope, ()) if d not in drafts]
+            buffer = deque(drafts, maxlen=self.limit)
+            buffer.extendleft(unsaved)
+            self._buffers[scope] = buffer
+            if unsaved:
+                self._recorded[scope] = deque(unsaved, maxlen=self.limit)
+            return buffer
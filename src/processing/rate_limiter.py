@@ -0,0 +1,97 @@
+import time
+import random
+import asyncio
+import threading
+from config import settings
+
+
+class RateLimitExhausted(Exception):
+    """Raised when a call is still rate limited after every retry."""
+
+
+class TokenBucketLimiter:
+    """
+    Process-wide token bucket for Gemini calls, limiting both requests and
+    tokens per minute. Callers reserve capacity up front and sleep for the
+    returned wait, so concurrent threads and coroutines share one budget.
+    A 429 pauses every caller via `penalize`.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.rpm = max(1, requests_per_minute)
+        self.tpm = max(1, tokens_per_minute)
+        self._requests = float(self.rpm)
+        self._tokens = float(self.tpm)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int = 0) -> float:
+        """Takes one request and `tokens` from the buckets. Returns seconds to wait first."""
+        tokens = min(tokens, self.tpm)
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._updated = now
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+            # Buckets may go negative; the debt is what the caller waits out
+            self._requests -= 1
+            self._tokens -= tokens
+            wait = max(0.0, -self._requests * 60 / self.rpm, -self._tokens * 60 / self.tpm)
+            return max(wait, self._blocked_until - now)
+
+    def acquire(self, tokens: int = 0):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def settle(self, delta_tokens: int):
+        """Corrects a reservation once the real token usage is known."""
+        with self._lock:
+            self._tokens -= delta_tokens
+
+    def penalize(self, seconds: float):
+        """Blocks all callers for `seconds` (after the API told us to back off)."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    True for a Gemini 429 / RESOURCE_EXHAUSTED, judged by the status the SDK
+    attaches to its APIError (not the message text, which may quote anything).
+    """
+    code = getattr(error, 'code', None)
+    if code is None:
+        code = getattr(error, 'status_code', None)
+    return code == 429 or getattr(error, 'status', None) == 'RESOURCE_EXHAUSTED'
+
+
+def backoff_delay(attempt: int, base: float = 2.0, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(base, min(cap, base * (2 ** attempt)))
+
+
+def estimate_tokens(prompt: str, output_tokens: int = 256) -> int:
+    # ~4 characters per token is close enough for budgeting
+    return len(prompt) // 4 + output_tokens
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> TokenBucketLimiter:
+    """Returns the shared limiter, built from settings on first use."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = TokenBucketLimiter(settings.GEMINI_RPM, settings.GEMINI_TPM)
+        return _limiter
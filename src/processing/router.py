@@ -1,14 +1,121 @@
 import os
 import json
+import time
+import asyncio
+import weakref
 from google import genai
 from config import settings
+from src.metrics import metrics
+from src.processing.cache import ResponseCache
+from src.processing.fast_path import FastPathClassifier, has_owner_answer
+from src.processing.rate_limiter import (
+    RateLimitExhausted, get_limiter, is_rate_limit_error, backoff_delay, estimate_tokens
+)
+
+MODEL = 'gemini-flash-latest'
+# Drafts kept as {context_history} while a batch runs (matches HistoryProvider's window)
+DRAFT_HISTORY_LIMIT = 5
+
+
+class StageFailed(Exception):
+    """
+    A Gemini stage failed for a reason other than rate limiting (API error,
+    unparseable output). The whole review fails with it, so callers skip saving
+    it and retry later instead of storing placeholder text as ANALYZED.
+    """
+
+# Where each stage's output lives in the analysis dict
+STAGE_KEYS = {
+    "scout": "scout",
+    "translate": "vietnamese_summary",
+    "consult": "consult",
+    "draft": "draft_response"
+}
+
+CATEGORIES = ["Service Quality", "Cleanliness", "Price", "Staff Attitude", "Wait Time", "Other"]
+
+# Structured output for batch mode: one object per review, keyed by a short per-batch id
+SCOUT_BATCH_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "id": {"type": "STRING"},
+            "sentiment_score": {"type": "INTEGER"},
+            "risk_flag": {"type": "BOOLEAN"},
+            "category": {"type": "STRING", "enum": CATEGORIES}
+        },
+        "required": ["id", "sentiment_score", "risk_flag", "category"]
+    }
+}
+
+TRANSLATE_BATCH_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "id": {"type": "STRING"},
+            "vietnamese_summary": {"type": "STRING"}
+        },
+        "required": ["id", "vietnamese_summary"]
+    }
+}
+
+# Structured output for fused mode: every stage's result in one response
+FUSED_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "sentiment_score": {"type": "INTEGER"},
+        "risk_flag": {"type": "BOOLEAN"},
+        "category": {"type": "STRING", "enum": CATEGORIES},
+        "vietnamese_summary": {"type": "STRING"},
+        "consult": {
+            "type": "OBJECT",
+            "nullable": True,
+            "properties": {
+                "root_cause": {"type": "STRING"},
+                "recommended_action": {"type": "STRING"}
+            }
+        },
+        "draft_response": {"type": "STRING"}
+    },
+    "required": ["sentiment_score", "risk_flag", "category", "vietnamese_summary", "draft_response"]
+}
 
 class IntelligenceRouter:
-    def __init__(self):
-        if not settings.GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY is not set in environment variables.")
-        
-        self.client = genai.Client(api_key=settings.GEMINI_API_KEY)
+    def __init__(self, client=None):
+        # A client can be injected (e.g. the offline fakes in bench/)
+        if client is None:
+            if not settings.GEMINI_API_KEY:
+                raise ValueError("GEMINI_API_KEY is not set in environment variables.")
+            client = genai.Client(api_key=settings.GEMINI_API_KEY)
+        self.client = client
+        # staged: one call per stage. fused: one call for everything.
+        # shadow: staged result is returned, fused result is attached for comparison.
+        self.mode = settings.ROUTER_MODE
+        # Reviews packed into one scout/translate request (1 disables batching)
+        self.batch_size = settings.ROUTER_BATCH_SIZE
+        # Dedicated loop for the sync batch wrapper, so the async client's
+        # connections are always used from the same event loop
+        self._loop = None
+        # Drafts in flight at once; a draft only sees drafts that finished before it started.
+        # One semaphore per event loop, since an asyncio.Semaphore is bound to the loop it first waits on
+        self._draft_slots = weakref.WeakKeyDictionary()
+
+        # Handles star-only and very short 5-star reviews without Gemini
+        self.fast_path = FastPathClassifier() if settings.FAST_PATH_ENABLED else None
+
+        # Shared with every other router in the process
+        self.limiter = get_limiter()
+
+        # Persistent response cache, so unchanged prompts are never billed twice
+        self.cache = None
+        if settings.LLM_CACHE_ENABLED:
+            self.cache = ResponseCache(
+                path=settings.LLM_CACHE_PATH,
+                ttl_seconds=settings.LLM_CACHE_TTL_DAYS * 86400,
+                max_entries=settings.LLM_CACHE_MAX_ENTRIES
+            )
         
         # Load prompts configuration
         try:
@@ -20,102 +127,444 @@ class IntelligenceRouter:
             print(f"Warning: Could not load prompts.json: {e}")
             self.prompts = {}
 
-    def process_review(self, review_data: dict, history: list[str] = None) -> dict:
+    def process_review(self, review_data: dict, history: list[str] = None,
+                       stages: set = None, previous: dict = None) -> dict:
         """
         Main entry point for processing a review.
         Orchestrates the analysis pipeline using Gemini.
+
+        `stages` limits which stages are re-run (e.g. {"draft"}); the rest are
+        taken from `previous`, an earlier analysis of the same review.
         """
+        fast = self._classify_fast(review_data, history, stages, previous)
+        if fast:
+            return fast
+
+        if stages is not None:
+            return self._process_staged(review_data, history, stages, previous)
+
+        if self.mode == "fused":
+            fused = self._fused(review_data, history)
+            if fused:
+                return self._drop_answered_draft(fused, review_data)
+            # Fused call failed, fall back to the staged pipeline
+
+        analysis = self._process_staged(review_data, history)
+        if self.mode == "shadow" and analysis:
+            analysis["shadow"] = self._compare(analysis, self._fused(review_data, history))
+        return analysis
+
+    async def process_review_async(self, review_data: dict, history: list[str] = None,
+                                   stages: set = None, previous: dict = None) -> dict:
+        """Async variant of process_review."""
+        fast = self._classify_fast(review_data, history, stages, previous)
+        if fast:
+            return fast
+
+        if stages is not None:
+            return await self._process_staged_async(review_data, history, stages, previous)
+
+        if self.mode == "fused":
+            fused = await self._fused_async(review_data, history)
+            if fused:
+                return self._drop_answered_draft(fused, review_data)
+
+        if self.mode == "shadow":
+            analysis, fused = await asyncio.gather(
+                self._process_staged_async(review_data, history),
+                self._fused_async(review_data, history)
+            )
+            if analysis:
+                analysis["shadow"] = self._compare(analysis, fused)
+            return analysis
+
+        return await self._process_staged_async(review_data, history)
+
+    def _process_staged(self, review_data: dict, history: list[str] = None,
+                        stages: set = None, previous: dict = None) -> dict:
+        previous = previous or {}
         try:
             # 1. Scout: Analyze sentiment and risk
-            scout_result = self._scout(review_data)
+            if self._should_run("scout", stages, previous):
+                scout_result = self._scout(review_data)
+            else:
+                scout_result = previous['scout']
             
             # 2. Translate: Summarize in Vietnamese
-            vietnamese_summary = self._translate(review_data, scout_result)
+            if self._should_run("translate", stages, previous):
+                vietnamese_summary = self._translate(review_data, scout_result)
+            else:
+                vietnamese_summary = previous['vietnamese_summary']
             
             # 3. Consult: Deep dive if risky (Optional optimization: only run if risk=True)
             consult_result = {}
             if scout_result.get('risk_flag'):
-                consult_result = self._consult(review_data)
+                if self._should_run("consult", stages, previous):
+                    consult_result = self._consult(review_data)
+                else:
+                    consult_result = previous['consult']
 
-            # 4. Draft: Create a response
-            draft_response = self._draft(review_data, scout_result, history)
+            # 4. Draft: Create a response (unless the owner already replied)
+            if has_owner_answer(review_data):
+                draft_response = None
+            elif self._should_run("draft", stages, previous):
+                draft_response = self._draft(review_data, scout_result, history)
+            else:
+                draft_response = previous['draft_response']
 
-            return {
-                "scout": scout_result,
-                "vietnamese_summary": vietnamese_summary,
-                "consult": consult_result,
-                "draft_response": draft_response,
-                "processed_at": "now()" # Placeholder for timestamp
-            }
+            return self._result(scout_result, vietnamese_summary, consult_result, draft_response)
         except Exception as e:
             print(f"Error processing review {review_data.get('review_id')}: {e}")
             return {}
 
-    def _scout(self, review_data: dict) -> dict:
+    async def _process_staged_async(self, review_data: dict, history: list[str] = None,
+                                    stages: set = None, previous: dict = None) -> dict:
         """
-        Step 1: Quick analysis of sentiment, risk, and category.
+        Translate, consult and draft only depend on the scout result,
+        so they run concurrently once scout is done.
         """
-        text = review_data.get('original_text', '')
-        rating = review_data.get('rating', 0)
-        
-        # Load prompt from config or fallback
-        prompt_template = self.prompts.get('scout', "Analyze this review: {text}")
-        prompt = prompt_template.format(text=text, rating=rating)
-        
+        previous = previous or {}
+
+        async def reuse(key):
+            return previous[key]
+
         try:
-            response = self.client.models.generate_content(
-                model='gemini-flash-latest',
-                contents=prompt,
-                config={'response_mime_type': 'application/json'}
+            if self._should_run("scout", stages, previous):
+                scout_result = await self._run_stage_async("scout", self._scout_prompt(review_data), json_mode=True)
+            else:
+                scout_result = previous['scout']
+
+            # Only build the coroutines we are going to await
+            if self._should_run("translate", stages, previous):
+                translate_call = self._run_stage_async("translate", self._translate_prompt(review_data, scout_result))
+            else:
+                translate_call = reuse('vietnamese_summary')
+
+            if not scout_result.get('risk_flag'):
+                consult_call = self._no_result()
+            elif self._should_run("consult", stages, previous):
+                consult_call = self._run_stage_async("consult", self._consult_prompt(review_data), json_mode=True)
+            else:
+                consult_call = reuse('consult')
+
+            if has_owner_answer(review_data):
+                draft_call = self._no_draft()
+            elif self._should_run("draft", stages, previous):
+                draft_call = self._draft_async(review_data, scout_result, history)
+            else:
+                draft_call = reuse('draft_response')
+
+            vietnamese_summary, consult_result, draft_response = await asyncio.gather(
+                translate_call, consult_call, draft_call
             )
-            return json.loads(response.text)
+            return self._result(scout_result, vietnamese_summary, consult_result, draft_response)
         except Exception as e:
-            print(f"Scout Error: {e}")
-            return {"sentiment_score": 0, "risk_flag": False, "category": "Other"}
+            print(f"Error processing review {review_data.get('review_id')}: {e}")
+            return {}
+
+    def _classify_fast(self, review_data: dict, history: list[str] = None,
+                       stages: set = None, previous: dict = None):
+        """
+        Local fast-path result, or None. Skipped only for partial re-runs that
+        keep an earlier scout result, since the fast path replaces every stage.
+        """
+        if not self.fast_path:
+            return None
+        if stages is not None and previous and "scout" not in stages:
+            return None
+        fast = self.fast_path.classify(review_data, history)
+        if fast:
+            metrics.incr("router.fast_path")
+        return fast
+
+    def _should_run(self, stage: str, stages: set, previous: dict) -> bool:
+        """A stage runs if it was selected, or if there is no earlier result to reuse."""
+        return stages is None or stage in stages or not previous.get(STAGE_KEYS[stage])
+
+    async def _no_result(self):
+        return {}
+
+    async def _no_draft(self):
+        return None
+
+    async def _draft_async(self, review_data: dict, scout_result: dict, history: list[str] = None) -> str:
+        """Builds the prompt only once a draft slot is free, so it sees the drafts finished meanwhile."""
+        loop = asyncio.get_running_loop()
+        slots = self._draft_slots.get(loop)
+        if slots is None:
+            slots = self._draft_slots[loop] = asyncio.Semaphore(settings.ROUTER_DRAFT_CONCURRENCY)
+        async with slots:
+            return await self._run_stage_async("draft", self._draft_prompt(review_data, scout_result, history))
+
+    @staticmethod
+    def _remember(history: list[str], analysis: dict):
+        """Adds a finished draft to the batch's live history, newest first."""
+        draft = (analysis or {}).get('draft_response')
+        if draft:
+            history.insert(0, draft)
+            del history[DRAFT_HISTORY_LIMIT:]
+
+    def _drop_answered_draft(self, analysis: dict, review_data: dict) -> dict:
+        if has_owner_answer(review_data):
+            analysis['draft_response'] = None
+        return analysis
+
+    async def process_reviews_async(self, reviews: list[dict], history: list[str] = None,
+                                    concurrency: int = None, stages: list = None,
+                                    previous: list = None) -> list[dict]:
+        """
+        Analyzes many reviews in parallel, at most `concurrency` at a time.
+        Results are returned in the same order as `reviews`.
+
+        `stages` and `previous`, when given, are per-review lists passed on to
+        process_review_async to re-run only part of an earlier analysis.
+
+        `history` is copied and kept current as drafts finish, so each review's
+        draft sees the ones written before it in the same batch.
+        """
+        semaphore = asyncio.Semaphore(concurrency or settings.ROUTER_CONCURRENCY)
+        history = list(history or [])
+
+        if self.batch_size > 1 and self.mode == "staged" and stages is None:
+            return await self._process_reviews_batched_async(reviews, history, semaphore)
+
+        stages = stages or [None] * len(reviews)
+        previous = previous or [None] * len(reviews)
+
+        async def run(review_data, review_stages, review_previous):
+            async with semaphore:
+                analysis = await self.process_review_async(review_data, history, review_stages, review_previous)
+            self._remember(history, analysis)
+            return analysis
+
+        return await asyncio.gather(*(run(r, s, p) for r, s, p in zip(reviews, stages, previous)))
+
+    async def _process_reviews_batched_async(self, reviews: list[dict], history: list[str],
+                                             semaphore: asyncio.Semaphore) -> list[dict]:
+        """
+        Batch mode: scout and translate run as one structured request per
+        `batch_size` reviews; consult and draft still run per review.
+        """
+        results = [None] * len(reviews)
+        remaining = []
+        for i, review_data in enumerate(reviews):
+            fast = self._classify_fast(review_data, history)
+            if fast:
+                results[i] = fast
+                self._remember(history, fast)
+            else:
+                remaining.append(i)
+
+        async def run(indexes):
+            async with semaphore:
+                analyses = await self._process_batch_async([reviews[i] for i in indexes], history)
+            for i, analysis in zip(indexes, analyses):
+                results[i] = analysis
+
+        chunks = [remaining[i:i + self.batch_size] for i in range(0, len(remaining), self.batch_size)]
+        await asyncio.gather(*(run(chunk) for chunk in chunks))
+        return results
+
+    async def _process_batch_async(self, reviews: list[dict], history: list[str] = None) -> list[dict]:
+        # Short per-batch ids: cheaper than echoing long review IDs and harder to mangle
+        refs = {str(i + 1): review_data for i, review_data in enumerate(reviews)}
+
+        # 1. Scout the whole batch, then re-run any review the model left out
+        scouts = await self._batch_stage_async(
+            "scout_batch", refs,
+            lambda ref, r: {"id": ref, "rating": r.get('rating', 0), "text": r.get('original_text', '')},
+            SCOUT_BATCH_SCHEMA, ("sentiment_score", "risk_flag", "category")
+        )
+        missing = [ref for ref in refs if ref not in scouts]
+        if missing:
+            print(f"Scout batch missed {len(missing)} of {len(refs)} reviews, re-running individually...")
+            for ref, scout_result in zip(missing, await asyncio.gather(*(
+                self._single_stage_async("scout", self._scout_prompt(refs[ref]), json_mode=True) for ref in missing
+            ))):
+                if scout_result is not None:
+                    scouts[ref] = scout_result
+
+        # 2. Translate the scouted reviews the same way
+        scouted = {ref: refs[ref] for ref in refs if ref in scouts}
+        summaries = await self._batch_stage_async(
+            "translate_batch", scouted,
+            lambda ref, r: {"id": ref, "category": scouts[ref].get('category'), "text": r.get('original_text', '')},
+            TRANSLATE_BATCH_SCHEMA, ("vietnamese_summary",)
+        )
+        summaries = {ref: value["vietnamese_summary"] for ref, value in summaries.items()}
+        missing = [ref for ref in scouted if not summaries.get(ref)]
+        if missing:
+            print(f"Translate batch missed {len(missing)} of {len(scouted)} reviews, re-running individually...")
+            for ref, summary in zip(missing, await asyncio.gather(*(
+                self._single_stage_async("translate", self._translate_prompt(refs[ref], scouts[ref])) for ref in missing
+            ))):
+                if summary is not None:
+                    summaries[ref] = summary
+
+        # 3. Consult and draft per review, reusing the batched scout/translate results
+        async def finish(ref):
+            if ref not in scouts or ref not in summaries:
+                return {}
+            previous = {"scout": scouts[ref], "vietnamese_summary": summaries[ref]}
+            analysis = await self._process_staged_async(refs[ref], history, {"consult", "draft"}, previous)
+            self._remember(history, analysis)
+            return analysis
+
+        return await asyncio.gather(*(finish(ref) for ref in refs))
+
+    async def _batch_stage_async(self, stage: str, refs: dict, item, schema: dict, fields: tuple) -> dict:
+        """Runs one batched request. Returns {ref: result} for the refs that came back complete."""
+        if not refs:
+            return {}
+        payload = json.dumps([item(ref, r) for ref, r in refs.items()], ensure_ascii=False)
+        prompt_template = self.prompts.get(stage, "Analyze these reviews: {reviews}")
+        try:
+            output = await self._run_stage_async(stage, prompt_template.format(reviews=payload),
+                                                 json_mode=True, schema=schema)
+        except (RateLimitExhausted, StageFailed) as e:
+            print(f"{stage} Error: {e}")
+            return {}
+
+        results = {}
+        for entry in output if isinstance(output, list) else []:
+            ref = str(entry.get('id')) if isinstance(entry, dict) else None
+            if ref in refs and all(entry.get(f) is not None for f in fields):
+                results[ref] = {f: entry[f] for f in fields}
+        return results
+
+    async def _single_stage_async(self, stage: str, prompt: str, json_mode: bool = False):
+        """One stage for one review; None if it failed or is still rate limited."""
+        try:
+            return await self._run_stage_async(stage, prompt, json_mode=json_mode)
+        except (RateLimitExhausted, StageFailed) as e:
+            print(f"{stage.title()} Error: {e}")
+            return None
+
+    def process_reviews(self, reviews: list[dict], history: list[str] = None,
+                        concurrency: int = None, stages: list = None, previous: list = None) -> list[dict]:
+        """Blocking wrapper around process_reviews_async for sync callers."""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(self.process_reviews_async(reviews, history, concurrency, stages, previous))
+
+    def _fused(self, review_data: dict, history: list[str] = None) -> dict:
+        """
+        All four stages in a single schema-constrained call.
+        Returns {} on failure so callers can fall back to the staged pipeline.
+        """
+        try:
+            output = self._run_stage("fused", self._fused_prompt(review_data, history),
+                                     json_mode=True, schema=FUSED_SCHEMA)
+        except (RateLimitExhausted, StageFailed) as e:
+            print(f"Fused Error: {e}")
+            return {}
+        return self._fused_result(output)
+
+    async def _fused_async(self, review_data: dict, history: list[str] = None) -> dict:
+        try:
+            output = await self._run_stage_async("fused", self._fused_prompt(review_data, history),
+                                                 json_mode=True, schema=FUSED_SCHEMA)
+        except (RateLimitExhausted, StageFailed) as e:
+            print(f"Fused Error: {e}")
+            return {}
+        return self._fused_result(output)
+
+    def _fused_result(self, output: dict) -> dict:
+        """Reshapes a fused response into the same dict the staged pipeline returns."""
+        if not output or not output.get('draft_response'):
+            return {}
+        scout_result = {
+            "sentiment_score": output.get('sentiment_score'),
+            "risk_flag": bool(output.get('risk_flag')),
+            "category": output.get('category')
+        }
+        consult_result = (output.get('consult') or {}) if scout_result['risk_flag'] else {}
+        return self._result(
+            scout_result,
+            (output.get('vietnamese_summary') or '').strip(),
+            consult_result,
+            output['draft_response'].strip()
+        )
+
+    def _compare(self, staged: dict, fused: dict) -> dict:
+        """Summarizes how far a fused result is from the staged one (shadow mode)."""
+        if not fused:
+            print("Shadow: fused call failed.")
+            return {"fused_ok": False}
+
+        staged_scout, fused_scout = staged.get('scout', {}), fused.get('scout', {})
+        try:
+            sentiment_delta = abs((staged_scout.get('sentiment_score') or 0) - (fused_scout.get('sentiment_score') or 0))
+        except TypeError:
+            sentiment_delta = None
+        comparison = {
+            "fused_ok": True,
+            "sentiment_delta": sentiment_delta,
+            "risk_flag_match": bool(staged_scout.get('risk_flag')) == bool(fused_scout.get('risk_flag')),
+            "category_match": staged_scout.get('category') == fused_scout.get('category'),
+            "fused": fused
+        }
+        print(f"Shadow: sentiment delta {sentiment_delta}, "
+              f"risk match {comparison['risk_flag_match']}, category match {comparison['category_match']}")
+        return comparison
+
+    def _result(self, scout_result, vietnamese_summary, consult_result, draft_response) -> dict:
+        return {
+            "scout": scout_result,
+            "vietnamese_summary": vietnamese_summary,
+            "consult": consult_result,
+            "draft_response": draft_response,
+            "processed_at": "now()" # Placeholder for timestamp
+        }
+
+    def _scout(self, review_data: dict) -> dict:
+        """
+        Step 1: Quick analysis of sentiment, risk, and category.
+        """
+        return self._run_stage("scout", self._scout_prompt(review_data), json_mode=True)
 
     def _translate(self, review_data: dict, scout_result: dict) -> str:
         """
         Step 2: Summarize the review in Vietnamese for the owner.
         """
-        text = review_data.get('original_text', '')
-        category = scout_result.get('category')
-        
-        prompt_template = self.prompts.get('translate', "Summarize in Vietnamese: {text}")
-        prompt = prompt_template.format(text=text, category=category)
-        
-        try:
-            response = self.client.models.generate_content(
-                model='gemini-flash-latest',
-                contents=prompt
-            )
-            return response.text.strip()
-        except Exception as e:
-             print(f"Translate Error: {e}")
-             return "Lỗi dịch thuật."
+        return self._run_stage("translate", self._translate_prompt(review_data, scout_result))
 
     def _consult(self, review_data: dict) -> dict:
         """
         Step 3: Deep dive analysis for identifying root cause and strategy.
         """
-        text = review_data.get('original_text', '')
-        
-        prompt_template = self.prompts.get('consult', "Analyze this review: {text}")
-        prompt = prompt_template.format(text=text)
-        
-        try:
-            response = self.client.models.generate_content(
-                model='gemini-flash-latest',
-                contents=prompt,
-                config={'response_mime_type': 'application/json'}
-            )
-            return json.loads(response.text)
-        except Exception:
-            return {}
+        return self._run_stage("consult", self._consult_prompt(review_data), json_mode=True)
 
     def _draft(self, review_data: dict, scout_result: dict, history: list[str] = None) -> str:
         """
         Step 4: Draft a polite, professional response.
         """
+        return self._run_stage("draft", self._draft_prompt(review_data, scout_result, history))
+
+    # --- Prompt builders (shared by the sync and async paths) ---
+
+    def _scout_prompt(self, review_data: dict) -> str:
+        text = review_data.get('original_text', '')
+        rating = review_data.get('rating', 0)
+        
+        # Load prompt from config or fallback
+        prompt_template = self.prompts.get('scout', "Analyze this review: {text}")
+        return prompt_template.format(text=text, rating=rating)
+
+    def _translate_prompt(self, review_data: dict, scout_result: dict) -> str:
+        text = review_data.get('original_text', '')
+        category = scout_result.get('category')
+        
+        prompt_template = self.prompts.get('translate', "Summarize in Vietnamese: {text}")
+        return prompt_template.format(text=text, category=category)
+
+    def _consult_prompt(self, review_data: dict) -> str:
+        text = review_data.get('original_text', '')
+        
+        prompt_template = self.prompts.get('consult', "Analyze this review: {text}")
+        return prompt_template.format(text=text)
+
+    def _draft_prompt(self, review_data: dict, scout_result: dict, history: list[str] = None) -> str:
         text = review_data.get('original_text', '')
         author = review_data.get('author_name', 'client')
         category = scout_result.get('category')
@@ -132,7 +581,7 @@ class IntelligenceRouter:
         history_str = "\n".join([f"- {h}" for h in (history or [])]) if history else "None."
 
         prompt_template = self.prompts.get('draft', "Write a response to: {text}")
-        prompt = prompt_template.format(
+        return prompt_template.format(
             text=text, 
             author=author, 
             category=category, 
@@ -140,12 +589,138 @@ class IntelligenceRouter:
             emoji_instruction=emoji_instruction,
             context_history=history_str
         )
-        
+
+    def _fused_prompt(self, review_data: dict, history: list[str] = None) -> str:
+        history_str = "\n".join([f"- {h}" for h in (history or [])]) if history else "None."
+
+        prompt_template = self.prompts.get('fused', "Analyze and reply to this review: {text}")
+        return prompt_template.format(
+            text=review_data.get('original_text', ''),
+            rating=review_data.get('rating', 0),
+            author=review_data.get('author_name', 'client'),
+            salon_name=review_data.get('salon_name', 'our salon'),
+            context_history=history_str
+        )
+
+    # --- Gemini calls ---
+
+    def _run_stage(self, stage: str, prompt: str, json_mode: bool = False, schema: dict = None):
+        config = self._config(json_mode, schema)
+        cache_key = self._cache_key(stage, prompt, config)
         try:
-            response = self.client.models.generate_content(
-                model='gemini-flash-latest',
-                contents=prompt
-            )
-            return response.text.strip()
-        except Exception:
-            return "Thank you for your feedback."
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return self._parse(cached, json_mode)
+
+            text = self._generate(stage, prompt, config)
+            result = self._parse(text, json_mode)
+            # Only cache responses that parsed
+            self._cache_set(cache_key, stage, text)
+            return result
+        except RateLimitExhausted:
+            # Don't hide rate limits behind placeholder text; the caller skips the review
+            raise
+        except Exception as e:
+            print(f"{stage.title()} Error: {e}")
+            raise StageFailed(f"{stage} failed: {e}") from e
+
+    async def _run_stage_async(self, stage: str, prompt: str, json_mode: bool = False, schema: dict = None):
+        config = self._config(json_mode, schema)
+        cache_key = self._cache_key(stage, prompt, config)
+        try:
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return self._parse(cached, json_mode)
+
+            text = await self._generate_async(stage, prompt, config)
+            result = self._parse(text, json_mode)
+            self._cache_set(cache_key, stage, text)
+            return result
+        except RateLimitExhausted:
+            raise
+        except Exception as e:
+            print(f"{stage.title()} Error: {e}")
+            raise StageFailed(f"{stage} failed: {e}") from e
+
+    def _generate(self, stage: str, prompt: str, config: dict) -> str:
+        """Calls Gemini through the shared rate limiter, retrying on rate-limit errors."""
+        tokens = estimate_tokens(prompt)
+        for attempt in range(settings.GEMINI_MAX_RETRIES + 1):
+            self.limiter.acquire(tokens)
+            start = time.perf_counter()
+            try:
+                response = self.client.models.generate_content(
+                    model=MODEL,
+                    contents=prompt,
+                    config=config
+                )
+            except Exception as e:
+                metrics.observe(f"gemini.{stage}", time.perf_counter() - start, error=True)
+                if not is_rate_limit_error(e):
+                    raise
+                self._on_rate_limit(stage, attempt, e)
+                continue
+            metrics.observe(f"gemini.{stage}", time.perf_counter() - start)
+            self._settle(stage, response, tokens)
+            return response.text
+        raise RateLimitExhausted(f"{stage} still rate limited after {settings.GEMINI_MAX_RETRIES} retries")
+
+    async def _generate_async(self, stage: str, prompt: str, config: dict) -> str:
+        tokens = estimate_tokens(prompt)
+        for attempt in range(settings.GEMINI_MAX_RETRIES + 1):
+            await self.limiter.acquire_async(tokens)
+            start = time.perf_counter()
+            try:
+                response = await self.client.aio.models.generate_content(
+                    model=MODEL,
+                    contents=prompt,
+                    config=config
+                )
+            except Exception as e:
+                metrics.observe(f"gemini.{stage}", time.perf_counter() - start, error=True)
+                if not is_rate_limit_error(e):
+                    raise
+                self._on_rate_limit(stage, attempt, e)
+                continue
+            metrics.observe(f"gemini.{stage}", time.perf_counter() - start)
+            self._settle(stage, response, tokens)
+            return response.text
+        raise RateLimitExhausted(f"{stage} still rate limited after {settings.GEMINI_MAX_RETRIES} retries")
+
+    def _on_rate_limit(self, stage: str, attempt: int, error: Exception):
+        # Pause every caller, not just this one; the next acquire waits it out
+        delay = backoff_delay(attempt)
+        metrics.incr(f"gemini.{stage}.rate_limited")
+        print(f"{stage.title()} rate limited ({error}). Backing off {delay:.1f}s...")
+        self.limiter.penalize(delay)
+
+    def _settle(self, stage: str, response, reserved_tokens: int):
+        usage = getattr(response, 'usage_metadata', None)
+        metrics.add_usage(stage, usage)
+        total = getattr(usage, 'total_token_count', None) if usage else None
+        if total:
+            self.limiter.settle(total - reserved_tokens)
+
+    def _cache_key(self, stage: str, prompt: str, config: dict):
+        return ResponseCache.make_key(MODEL, stage, prompt, config) if self.cache else None
+
+    def _cache_get(self, key):
+        cached = self.cache.get(key) if self.cache else None
+        if cached is not None:
+            metrics.incr("gemini.cache_hit")
+        return cached
+
+    def _cache_set(self, key, stage: str, text: str):
+        if self.cache:
+            self.cache.set(key, stage, text)
+
+    def _config(self, json_mode: bool, schema: dict = None):
+        if not json_mode:
+            return None
+        config = {'response_mime_type': 'application/json'}
+        if schema:
+            config['response_schema'] = schema
+        return config
+
+    def _parse(self, text: str, json_mode: bool):
+        return json.loads(text) if json_mode else text.strip()